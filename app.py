@@ -24,6 +24,7 @@ from flask import (
     redirect, send_from_directory
 )
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from bson import ObjectId
 from datetime import datetime
 import importlib
@@ -34,19 +35,29 @@ import logging
 from utils.timezone import to_ist
 from config.settings import settings
 
-# Database
-from database.connection import get_collection, get_db
+# Database (lazy — nothing connects until the first query in each worker)
+from database.connection import get_collection, check_ready
 
 # Tracking API
-from api.ads.ad_tracking_api import ads_tracking_bp
+from api.ads.ad_tracking_api import ads_tracking_bp, click_redirect_bp
 
-# Debug print (safe for prod)
-print(f"✅ MongoDB Connected: {get_db().name}")
+# Per-request MongoDB profiling
+from middleware.query_profiler import register_query_profiler
+
+# Prometheus metrics (/metrics)
+from utils.metrics import register_metrics
+
+# Structured request logging
+from utils.logging import init_logging, register_request_logging
+
+# Fingerprinted static assets (asset_url() in templates)
+from utils.assets import register_assets
 
 # ------------------------------------------------------------
-# Logger
+# Logger (queue-backed JSON lines; the writer thread starts lazily
+# in each worker, so this is safe before the gunicorn fork)
 # ------------------------------------------------------------
-logging.basicConfig(level=logging.INFO)
+init_logging()
 logger = logging.getLogger("dcorp.app")
 
 
@@ -100,9 +111,25 @@ def create_app():
     app.config["SECRET_KEY"] = settings.SECRET_KEY
     app.config["DCORP_API_URL"] = settings.DCORP_API_URL
 
+    # Behind nginx: restore the client IP / scheme (utils/client_ip.py)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=settings.PROXY_FIX_HOPS, x_proto=settings.PROXY_FIX_HOPS)
+
     # CORS
     CORS(app)
 
+    # Sampled MongoDB command counts / timings → slow-request log
+    # (+ Server-Timing for debug / admin requests)
+    register_query_profiler(app)
+
+    # Request histograms, auction/billing/pool metrics → /metrics
+    register_metrics(app)
+
+    # One sampled JSON line per request (X-Request-ID)
+    register_request_logging(app)
+
+    # Hashed CSS/JS from scripts/build_assets.py → immutable caching
+    register_assets(app, debug=settings.DEBUG)
+
     # ------------------------------------------
     # Inject logged-in user into templates
     # ------------------------------------------
@@ -171,6 +198,10 @@ def create_app():
     app.register_blueprint(ads_tracking_bp)
     logger.info("Registered ads_tracking_bp at /api/ads/track")
 
+    # Signed click redirects (/c/<token> → 302 to the advertiser)
+    app.register_blueprint(click_redirect_bp)
+    logger.info("Registered click_redirect_bp at /c")
+
     # ------------------------------------------------------
     # Admin API Blueprints
     # ------------------------------------------------------
@@ -237,6 +268,21 @@ def create_app():
         session.clear()
         return redirect("/")
 
+    # ------------------------------------------------------
+    # Health Probes
+    # /healthz → process is up (never touches MongoDB)
+    # /readyz  → this worker can reach MongoDB
+    # ------------------------------------------------------
+    @app.route("/healthz")
+    def healthz():
+        return {"status": "ok"}, 200
+
+    @app.route("/readyz")
+    def readyz():
+        checks = check_ready(("default", "serving", "tracking"))
+        ready = all(checks.values())
+        return {"status": "ready" if ready else "unavailable", "mongo": checks}, (200 if ready else 503)
+
     # ------------------------------------------------------
     # 404 Handler
     # ------------------------------------------------------
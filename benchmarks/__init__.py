@@ -0,0 +1,41 @@
+"""
+DCorp performance benchmarks
+----------------------------
+
+    benchmarks/seed.py       → synthetic campaigns, creatives & events
+    benchmarks/load_test.py  → concurrent load against slot + tracking APIs
+    benchmarks/auction_bench.py → pure-Python auction micro-benchmarks
+    benchmarks/replay.py     → offline auction replay over logged traffic
+
+Run from the project root, e.g.:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load_test --mongomock --requests 5000
+
+Importing this package puts src/ on sys.path and fills in placeholder
+values for the settings that are mandatory in production, so the
+benchmarks run without a .env file. Real values always win.
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+for path in (SRC_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+BENCH_ENV = {
+    "FLASK_SECRET_KEY": "bench-secret",
+    "JWT_SECRET_KEY": "bench-jwt-secret",
+    "PUBLIC_BASE_URL": "http://localhost:5000",
+    "DCORP_API_URL": "http://localhost:5000",
+    "MONGO_USER": "bench",
+    "MONGO_PASS": "bench",
+    "MONGO_CLUSTER": "localhost",
+    "MONGO_DB": "dcorp_bench",
+}
+
+for key, value in BENCH_ENV.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,206 @@
+"""
+Auction micro-benchmarks (pure Python, no MongoDB)
+--------------------------------------------------
+
+Times the in-memory part of bidding_engine.get_winning_ad on synthetic
+candidate sets of 10 → 100k campaigns per slot:
+
+    • eligibility filtering (status + remaining budget)
+    • campaign ↔ creative join
+    • winner selection: full sort vs max() vs heap top-k
+    • ranking keys: bid vs eCPM vs Thompson-sampled eCPM
+    • payload / URL building (build_full_url)
+
+pytest-benchmark (CI):
+    pip install -r benchmarks/requirements.txt
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+
+Quick standalone run (no pytest):
+    python -m benchmarks.auction_bench
+"""
+
+import random
+import time
+
+import pytest
+from bson import ObjectId
+
+from benchmarks import BENCH_ENV
+from services.ads.bidding_engine import (
+    funded_campaigns,
+    index_creatives,
+    pair_candidates,
+    select_winner,
+    select_top_k,
+    bid_of,
+    ecpm_of,
+    thompson_ecpm_of,
+    build_ad_payload,
+    build_full_url,
+)
+
+SIZES = (10, 100, 1_000, 10_000, 100_000)
+BASE_URL = BENCH_ENV["DCORP_API_URL"]
+
+_cache = {}
+
+
+# -----------------------------------------------------
+# Synthetic candidates
+# -----------------------------------------------------
+def make_candidates(n: int, rng_seed: int = 7):
+    """
+    n campaigns on one slot: ~80% approved, ~10% out of budget,
+    ~5% without an approved creative. Cached per size.
+    """
+    if n in _cache:
+        return _cache[n]
+
+    rng = random.Random(rng_seed)
+    campaigns, creatives = [], []
+
+    for i in range(n):
+        oid = ObjectId()
+        budget = round(rng.uniform(10, 1000), 2)
+        campaigns.append({
+            "_id": oid,
+            "slot_id": "home_banner",
+            "status": "approved" if rng.random() < 0.8 else "paused",
+            "creative_status": "approved",
+            "bidding_type": "CPC",
+            "bid_amount": round(rng.uniform(0.1, 50), 2),
+            "budget": 0.0 if rng.random() < 0.1 else budget,
+            "spend": round(budget * rng.random(), 2),
+        })
+        if rng.random() < 0.95:
+            creatives.append({
+                "campaign_id": str(oid),
+                "image_url": f"/static/uploads/{oid}.png",
+                "redirect_url": f"https://example.com/{i}",
+                "headline": f"Ad {i}",
+                "status": "approved",
+            })
+
+    _cache[n] = (campaigns, creatives)
+    return _cache[n]
+
+
+def eligible_pairs(n: int):
+    campaigns, creatives = make_candidates(n)
+    approved = [c for c in campaigns if c["status"] == "approved"]
+    return pair_candidates(funded_campaigns(approved), index_creatives(creatives))
+
+
+# -----------------------------------------------------
+# Benchmarks (pytest-benchmark `benchmark` fixture)
+# -----------------------------------------------------
+@pytest.mark.parametrize("n", SIZES)
+def bench_filter_status_and_budget(benchmark, n):
+    campaigns, _ = make_candidates(n)
+    benchmark(lambda: funded_campaigns(c for c in campaigns if c["status"] == "approved"))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_join_creatives(benchmark, n):
+    campaigns, creatives = make_candidates(n)
+    benchmark(lambda: pair_candidates(campaigns, index_creatives(creatives)))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_select_full_sort(benchmark, n):
+    pairs = eligible_pairs(n)
+    benchmark(lambda: sorted(pairs, key=bid_of, reverse=True)[0])
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_select_winner(benchmark, n):
+    pairs = eligible_pairs(n)
+    benchmark(select_winner, pairs)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_select_winner_ecpm(benchmark, n):
+    pairs = eligible_pairs(n)
+    benchmark(select_winner, pairs, None, ecpm_of)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_select_winner_thompson(benchmark, n):
+    pairs = eligible_pairs(n)
+    benchmark(select_winner, pairs, None, thompson_ecpm_of)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_select_top_5_heap(benchmark, n):
+    pairs = eligible_pairs(n)
+    benchmark(select_top_k, pairs, 5)
+
+
+@pytest.mark.parametrize("n", SIZES)
+def bench_full_auction(benchmark, n):
+    campaigns, creatives = make_candidates(n)
+
+    def auction():
+        approved = (c for c in campaigns if c["status"] == "approved")
+        pairs = pair_candidates(funded_campaigns(approved), index_creatives(creatives))
+        winner = select_winner(pairs)
+        return build_ad_payload(*winner, "home_banner", base_url=BASE_URL) if winner else None
+
+    benchmark(auction)
+
+
+def bench_build_full_url(benchmark):
+    paths = [f"uploads/{i}.png" for i in range(1000)]
+    benchmark(lambda: [build_full_url(p, BASE_URL) for p in paths])
+
+
+# -----------------------------------------------------
+# Standalone runner
+# -----------------------------------------------------
+class _Timer:
+    """Minimal stand-in for the pytest-benchmark fixture."""
+
+    def __init__(self, min_time=0.2):
+        self.min_time = min_time
+        self.per_call = 0.0
+
+    def __call__(self, fn, *args):
+        calls, start = 0, time.perf_counter()
+        while True:
+            fn(*args)
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.min_time:
+                break
+        self.per_call = elapsed / calls
+
+
+def main():
+    benches = [
+        bench_filter_status_and_budget,
+        bench_join_creatives,
+        bench_select_full_sort,
+        bench_select_winner,
+        bench_select_winner_ecpm,
+        bench_select_winner_thompson,
+        bench_select_top_5_heap,
+        bench_full_auction,
+    ]
+
+    print(f"{'benchmark':<34}" + "".join(f"{n:>12,}" for n in SIZES))
+    for bench in benches:
+        row = []
+        for n in SIZES:
+            timer = _Timer()
+            bench(timer, n)
+            row.append(f"{timer.per_call * 1e6:>10.1f}us")
+        print(f"{bench.__name__:<34}" + "".join(f"{cell:>12}" for cell in row))
+
+    timer = _Timer()
+    bench_build_full_url(timer)
+    print(f"{'bench_build_full_url (x1000)':<34}{timer.per_call * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Load test for ad delivery & tracking
+------------------------------------
+
+Drives the hot endpoints with a concurrent load generator:
+    GET  /api/ads/slot/<slot_id>
+    POST /api/ads/track/impression
+    POST /api/ads/track/click
+
+and reports, per endpoint: p50 / p95 / p99 / mean latency, throughput,
+error count and MongoDB commands per request.
+
+Requests come from --viewers simulated viewers, each with its own
+X-Forwarded-For address and User-Agent, so the event filter (duplicate
+events, click rate per IP) sees realistic traffic instead of one client.
+The share of tracking events it flagged is reported as "suspicious": a
+high ratio means the run measured the filter's cheap path, not billing.
+X-Forwarded-For is only trusted from the proxy hop (utils/client_ip.py),
+so against --base-url point at gunicorn / uvicorn directly, not nginx.
+
+Targets:
+    --mongomock               in-process Flask app on mongomock (no server)
+    --mongo-uri URI           in-process Flask app on a real mongod
+                              (enables Mongo ops/request via CommandListener)
+    --base-url URL            a running server (Flask or src/asgi.py);
+                              pass --mongo-uri too so it can be seeded
+
+Examples:
+    python -m benchmarks.load_test --mongomock --requests 5000 --concurrency 16
+    python -m benchmarks.load_test --mongo-uri mongodb://localhost:27017 \\
+        --output bench_output.json
+    python -m benchmarks.load_test --mongo-uri mongodb://localhost:27017 \\
+        --baseline bench_output.json
+
+Ops/request is only available in-process on a real mongod: mongomock
+does not emit command events and a remote server's commands are not
+visible to this process.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import monitoring
+
+from benchmarks import BENCH_ENV
+from benchmarks.seed import seed, slot_ids
+
+ENDPOINTS = ("slot", "impression", "click")
+
+
+# -----------------------------------------------------
+# Mongo command counter (per thread → per request)
+# -----------------------------------------------------
+class CommandCounter(monitoring.CommandListener):
+    """
+    Counts commands issued by the current thread. pymongo publishes
+    command events synchronously on the calling thread, so the delta
+    around one request is exactly that request's commands.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def current(self) -> int:
+        return getattr(self._local, "count", 0)
+
+    def started(self, event):
+        self._local.count = self.current() + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# -----------------------------------------------------
+# Targets
+# -----------------------------------------------------
+class InProcessTarget:
+    """Flask app via test_client (one client per worker thread)."""
+
+    def __init__(self):
+        from app import create_app
+
+        self.app = create_app()
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def get(self, path, headers=None):
+        return self._client().get(path, headers=headers).status_code
+
+    def post(self, path, payload, headers=None):
+        return self._client().post(path, json=payload, headers=headers).status_code
+
+
+class HttpTarget:
+    """A running server (gunicorn, uvicorn, nginx)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def _send(self, req):
+        try:
+            with urllib.request.urlopen(req, timeout=10) as res:
+                res.read()
+                return res.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path, headers=None):
+        return self._send(urllib.request.Request(self.base_url + path, headers=headers or {}))
+
+    def post(self, path, payload, headers=None):
+        return self._send(urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json", **(headers or {})},
+            method="POST",
+        ))
+
+
+# -----------------------------------------------------
+# Request plan
+# -----------------------------------------------------
+USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_{v} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7; rv:{v}.0) Gecko/20100101 Firefox/{v}.0",
+)
+
+
+def build_viewers(count, rng, first=0):
+    """One header set (X-Forwarded-For + User-Agent) per simulated viewer."""
+    viewers = []
+    for i in range(first, first + max(1, count)):
+        ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        ua = rng.choice(USER_AGENTS).format(v=rng.randint(100, 130))
+        viewers.append({"X-Forwarded-For": ip, "User-Agent": ua})
+    return viewers
+
+
+def build_plan(campaign_ids, total, mix, rng, viewers):
+    """
+    Returns a shuffled list of (endpoint, slot_id, campaign_id, headers).
+    mix = (slot_weight, impression_weight, click_weight)
+    """
+    slots = [s for s in slot_ids() if campaign_ids.get(s)]
+    plan = []
+
+    for endpoint in rng.choices(ENDPOINTS, weights=mix, k=total):
+        slot_id = rng.choice(slots)
+        plan.append((endpoint, slot_id, rng.choice(campaign_ids[slot_id]), rng.choice(viewers)))
+
+    return plan
+
+
+def send(target, op):
+    endpoint, slot_id, campaign_id, headers = op
+
+    if endpoint == "slot":
+        return target.get(f"/api/ads/slot/{slot_id}", headers)
+
+    return target.post(
+        f"/api/ads/track/{endpoint}",
+        {"campaign_id": campaign_id, "slot_id": slot_id},
+        headers,
+    )
+
+
+# -----------------------------------------------------
+# Event filter outcome
+# -----------------------------------------------------
+TRACKING_COLLECTIONS = {"impression": "ads_impressions", "click": "ads_clicks"}
+
+
+def count_events(db):
+    """{kind: (events, suspicious events)} in the tracking collections."""
+    counts = {}
+    for kind, name in TRACKING_COLLECTIONS.items():
+        col = db[name]
+        counts[kind] = (
+            col.count_documents({}),
+            col.count_documents({"suspicious": {"$exists": True}}),
+        )
+    return counts
+
+
+def suspicious_report(before, after):
+    """Events written during the run and the share the filter flagged."""
+    report = {}
+    for kind in TRACKING_COLLECTIONS:
+        events = after[kind][0] - before[kind][0]
+        flagged = after[kind][1] - before[kind][1]
+        report[kind] = {
+            "events": events,
+            "suspicious": flagged,
+            "suspicious_ratio": round(flagged / events, 4) if events else 0.0,
+        }
+    return report
+
+
+# -----------------------------------------------------
+# Runner
+# -----------------------------------------------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run(target, plan, concurrency, counter=None):
+    samples = defaultdict(list)
+    ops = defaultdict(int)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def timed(op):
+        before = counter.current() if counter else 0
+        start = time.perf_counter()
+        try:
+            status = send(target, op)
+        except Exception:
+            status = 599
+        elapsed = (time.perf_counter() - start) * 1000.0
+        used = (counter.current() - before) if counter else 0
+
+        with lock:
+            samples[op[0]].append(elapsed)
+            ops[op[0]] += used
+            if status >= 400:
+                errors[op[0]] += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, plan))
+    wall = time.perf_counter() - wall_start
+
+    report = {"wall_seconds": round(wall, 3), "endpoints": {}}
+
+    for endpoint in ENDPOINTS:
+        values = sorted(samples.get(endpoint, []))
+        if not values:
+            continue
+
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "throughput_rps": round(len(values) / wall, 1) if wall else 0.0,
+            "mongo_ops_per_request": (
+                round(ops[endpoint] / len(values), 2) if counter else None
+            ),
+        }
+
+    report["total_rps"] = round(len(plan) / wall, 1) if wall else 0.0
+    return report
+
+
+def print_report(report, baseline=None):
+    header = f"{'endpoint':<11}{'reqs':>7}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'ops/req':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for endpoint, row in report["endpoints"].items():
+        ops = row["mongo_ops_per_request"]
+        print(
+            f"{endpoint:<11}{row['requests']:>7}{row['errors']:>6}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+            f"{row['throughput_rps']:>9.1f}{(f'{ops:.2f}' if ops is not None else 'n/a'):>9}"
+        )
+
+        base = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if base:
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if base[key]:
+                    deltas.append(f"{key[:-3]} {(row[key] - base[key]) / base[key] * 100:+.1f}%")
+            print(f"{'':<11}vs baseline: {', '.join(deltas)}")
+
+    print(f"\nTotal: {report['total_rps']} req/s over {report['wall_seconds']}s")
+
+    for kind, row in (report.get("suspicious") or {}).items():
+        print(
+            f"{kind:<11}{row['suspicious']} of {row['events']} events flagged suspicious "
+            f"({row['suspicious_ratio'] * 100:.1f}%)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ad delivery/tracking load test")
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--mongomock", action="store_true")
+    target_group.add_argument("--base-url")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--db", default=BENCH_ENV["MONGO_DB"])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="70,25,5", help="slot,impression,click weights")
+    parser.add_argument("--viewers", type=int, default=1000, help="simulated viewers (IP + UA each)")
+    parser.add_argument("--campaigns-per-slot", type=int, default=100)
+    parser.add_argument("--creatives-per-campaign", type=int, default=1)
+    parser.add_argument("--events-per-campaign", type=int, default=20)
+    parser.add_argument("--no-seed", action="store_true", help="reuse existing data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="compare against a previous JSON report")
+    args = parser.parse_args()
+
+    if not args.mongomock and not args.mongo_uri:
+        parser.error("--mongo-uri is required unless --mongomock is used")
+
+    counter = None
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        counter = CommandCounter() if not args.base_url else None
+        client = MongoClient(args.mongo_uri, event_listeners=[counter] if counter else [])
+
+    db = client[args.db]
+
+    if args.no_seed:
+        campaign_ids = defaultdict(list)
+        for c in db.campaigns.find({"status": "approved"}, {"slot_id": 1}):
+            campaign_ids[c["slot_id"]].append(str(c["_id"]))
+    else:
+        seeded = seed(
+            db,
+            campaigns_per_slot=args.campaigns_per_slot,
+            creatives_per_campaign=args.creatives_per_campaign,
+            events_per_campaign=args.events_per_campaign,
+            rng_seed=args.seed,
+        )
+        campaign_ids = seeded["campaign_ids"]
+        print(f"[OK] Seeded: {seeded['counts']}")
+
+    if args.base_url:
+        target = HttpTarget(args.base_url)
+    else:
+        from database.connection import use_client
+        use_client(client, args.db)
+        target = InProcessTarget()
+
+    mix = [float(x) for x in args.mix.split(",")]
+    rng = random.Random(args.seed)
+    plan = build_plan(campaign_ids, args.requests, mix, rng, build_viewers(args.viewers, rng))
+
+    # Warm-up (imports, pools, caches) outside the measured window, from
+    # its own viewers so the measured events are not flagged as repeats
+    warmup = build_plan(campaign_ids, min(50, len(plan)), mix, rng, build_viewers(50, rng, first=args.viewers))
+    run(target, warmup, args.concurrency)
+
+    before = count_events(db)
+    report = run(target, plan, args.concurrency, counter)
+    report["suspicious"] = suspicious_report(before, count_events(db))
+    report["config"] = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "viewers": args.viewers,
+        "campaigns_per_slot": args.campaigns_per_slot,
+        "target": args.base_url or ("mongomock" if args.mongomock else "in-process"),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Report written → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
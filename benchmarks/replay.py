@@ -0,0 +1,476 @@
+"""
+Offline auction replay simulator
+--------------------------------
+
+Replays historical ad opportunities (ads_impressions) through alternative
+ranking policies and reports, per policy:
+
+    • revenue (expected: CPC → bid × CTR, CPM → bid / 1000)
+    • fill rate (opportunities with at least one funded candidate)
+    • per-campaign impressions / spend, and the difference to a baseline
+
+Every logged impression is one auction on its slot. Candidates are the
+campaigns of that slot; CTR "truth" for counterfactual winners is each
+campaign's observed CTR in the replay window (clicks / impressions,
+smoothed with the CTR_PRIOR_* Beta prior).
+
+Vectorised with NumPy: events are streamed in time-ordered batches, and
+each batch × slot is scored as one (events × candidates) matrix. Budgets
+are re-checked between batches, so --batch-size is also the budget
+granularity. Targeting, schedules, pacing and frequency caps are not
+simulated.
+
+Campaigns are the ones the live auction can pick (status "approved", as
+in bidding_engine.eligible_campaigns_query). Their `budget` field is the
+*remaining* budget, so the Mongo source adds back the ad_spend
+transactions logged since --since: the replay starts from the budget
+each campaign had when the window opened. A campaigns.ndjson file must
+carry that window-start budget itself.
+
+Policies mirror bidding_engine.ranking_key modes ("bid", "ecpm",
+"epsilon", "thompson"); add more with @register_policy. --check-parity
+verifies the deterministic ones pick the same winners as
+bidding_engine.select_winner.
+
+Sources:
+    --mongo-uri URI [--db NAME] --since 2026-01-01 [--until 2026-02-01]
+    --campaigns c.ndjson --impressions i.ndjson[.gz] --clicks k.ndjson[.gz]
+        (one JSON document per line; timestamp as ISO string or epoch;
+         impressions must be in time order)
+
+Examples:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.replay --mongo-uri mongodb://localhost:27017 \\
+        --since 2026-01-01 --policies bid,ecpm,thompson --baseline logged
+    python -m benchmarks.replay --campaigns c.ndjson --impressions i.ndjson.gz \\
+        --clicks k.ndjson.gz --output replay.json
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks import BENCH_ENV
+from config.settings import settings
+
+DEFAULT_BATCH = 200_000
+
+
+# -----------------------------------------------------
+# Event sources
+# -----------------------------------------------------
+def _epoch(value) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return _epoch(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    return 0.0
+
+
+def _read_ndjson(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class FileSource:
+    def __init__(self, campaigns, impressions, clicks):
+        self.paths = {"campaigns": campaigns, "impressions": impressions, "clicks": clicks}
+
+    def campaigns(self):
+        return list(_read_ndjson(self.paths["campaigns"]))
+
+    def events(self, kind: str):
+        return _read_ndjson(self.paths[kind])
+
+
+class MongoSource:
+    COLLECTIONS = {"impressions": "ads_impressions", "clicks": "ads_clicks"}
+
+    def __init__(self, db, since: datetime, until: datetime = None):
+        self.db = db
+        self.window = {"$gte": since}
+        if until is not None:
+            self.window["$lt"] = until
+
+    def campaigns(self):
+        docs = list(self.db.campaigns.find({"status": "approved"}, {
+            "slot_id": 1, "bid_amount": 1, "bidding_type": 1,
+            "budget": 1, "impressions": 1, "clicks": 1,
+        }))
+
+        # Remaining budget now + what was spent since the window opened
+        spent = {
+            row["_id"]: float(row["spent"] or 0)
+            for row in self.db.transactions.aggregate([
+                {"$match": {
+                    "transaction_type": "ad_spend",
+                    "created_at": {"$gte": self.window["$gte"]},
+                    "campaign_id": {"$in": [str(d["_id"]) for d in docs]},
+                }},
+                {"$group": {"_id": "$campaign_id", "spent": {"$sum": "$amount"}}},
+            ])
+        }
+        for doc in docs:
+            doc["budget"] = float(doc.get("budget") or 0) + spent.get(str(doc["_id"]), 0.0)
+
+        return docs
+
+    def events(self, kind: str):
+        return self.db[self.COLLECTIONS[kind]].find(
+            {"timestamp": self.window},
+            {"_id": 0, "campaign_id": 1, "slot_id": 1, "timestamp": 1},
+            batch_size=10_000,
+        ).sort("timestamp", 1)
+
+
+def event_batches(docs, campaign_index: dict, slot_index: dict, campaign_slot, batch_size: int):
+    """
+    Yields (timestamps, slot codes, logged campaign indices) arrays.
+    Unknown campaigns → -1; events without slot_id use the campaign's slot.
+    """
+    ts, slots, logged = [], [], []
+
+    for doc in docs:
+        c = campaign_index.get(str(doc.get("campaign_id")), -1)
+        slot = slot_index.get(doc.get("slot_id"), -1)
+        if slot < 0 and c >= 0:
+            slot = campaign_slot[c]
+
+        ts.append(_epoch(doc.get("timestamp")))
+        slots.append(slot)
+        logged.append(c)
+
+        if len(ts) >= batch_size:
+            yield np.array(ts), np.array(slots, dtype=np.int32), np.array(logged, dtype=np.int64)
+            ts, slots, logged = [], [], []
+
+    if ts:
+        yield np.array(ts), np.array(slots, dtype=np.int32), np.array(logged, dtype=np.int64)
+
+
+# -----------------------------------------------------
+# Campaign table
+# -----------------------------------------------------
+class CampaignTable:
+    """Column arrays over every campaign, indexed 0..n-1."""
+
+    def __init__(self, docs: list):
+        self.docs = docs
+        self.ids = [str(d["_id"]) for d in docs]
+        self.index = {cid: i for i, cid in enumerate(self.ids)}
+
+        slot_names = sorted({d.get("slot_id") for d in docs if d.get("slot_id")})
+        self.slot_index = {name: i for i, name in enumerate(slot_names)}
+        self.slot_names = slot_names
+
+        def col(key):
+            return np.array([float(d.get(key) or 0) for d in docs])
+
+        self.slot = np.array([self.slot_index.get(d.get("slot_id"), -1) for d in docs], dtype=np.int32)
+        self.bid = col("bid_amount")
+        self.budget = col("budget")
+        self.is_cpm = np.array([(d.get("bidding_type") or "CPC").upper() == "CPM" for d in docs])
+
+        # Posterior the live ranker sees (ctr_estimator uses the same counters)
+        prior_a = settings.CTR_PRIOR_MEAN * settings.CTR_PRIOR_STRENGTH
+        prior_b = (1 - settings.CTR_PRIOR_MEAN) * settings.CTR_PRIOR_STRENGTH
+        impressions = col("impressions")
+        clicks = np.minimum(col("clicks"), impressions)
+        self.alpha = prior_a + clicks
+        self.beta = prior_b + impressions - clicks
+        self.ctr_mean = self.alpha / (self.alpha + self.beta)
+
+        # Filled in from the replay window by observe_window()
+        self.true_ctr = self.ctr_mean.copy()
+        self.logged_impressions = np.zeros(len(docs))
+        self.logged_clicks = np.zeros(len(docs))
+
+        self.candidates = {
+            s: np.flatnonzero(self.slot == s) for s in range(len(slot_names))
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def observe_window(self, impressions: np.ndarray, clicks: np.ndarray):
+        """Per-campaign event counts of the replay window → CTR truth."""
+        prior_a = settings.CTR_PRIOR_MEAN * settings.CTR_PRIOR_STRENGTH
+        self.logged_impressions = impressions
+        self.logged_clicks = np.minimum(clicks, impressions)
+        self.true_ctr = (prior_a + self.logged_clicks) / (settings.CTR_PRIOR_STRENGTH + impressions)
+
+    def expected_cost(self, winners: np.ndarray) -> np.ndarray:
+        """Expected spend of one impression won by each campaign index."""
+        return np.where(
+            self.is_cpm[winners],
+            self.bid[winners] / 1000.0,
+            self.bid[winners] * self.true_ctr[winners],
+        )
+
+
+def count_events(docs, table: CampaignTable, batch_size: int) -> np.ndarray:
+    counts = np.zeros(len(table))
+    for _, _, logged in event_batches(docs, table.index, table.slot_index, table.slot, batch_size):
+        known = logged[logged >= 0]
+        counts += np.bincount(known, minlength=len(table))
+    return counts
+
+
+# -----------------------------------------------------
+# Policies: (table, candidates, n_events, rng) → scores[n_events, k]
+# -----------------------------------------------------
+POLICIES = {}
+
+
+def register_policy(name: str):
+    def wrap(fn):
+        POLICIES[name] = fn
+        return fn
+    return wrap
+
+
+def _ecpm(table, cand, ctr):
+    return np.where(table.is_cpm[cand], table.bid[cand], table.bid[cand] * ctr * 1000.0)
+
+
+@register_policy("bid")
+def policy_bid(table, cand, n, rng):
+    return np.broadcast_to(table.bid[cand], (n, len(cand)))
+
+
+@register_policy("ecpm")
+def policy_ecpm(table, cand, n, rng):
+    return np.broadcast_to(_ecpm(table, cand, table.ctr_mean[cand]), (n, len(cand)))
+
+
+@register_policy("epsilon")
+def policy_epsilon(table, cand, n, rng):
+    scores = np.array(policy_ecpm(table, cand, n, rng))
+    explore = rng.random(n) < settings.RANKING_EPSILON
+    scores[explore] = rng.random((int(explore.sum()), len(cand)))
+    return scores
+
+
+@register_policy("thompson")
+def policy_thompson(table, cand, n, rng):
+    ctr = rng.beta(table.alpha[cand], table.beta[cand], size=(n, len(cand)))
+    return _ecpm(table, cand, ctr)
+
+
+# -----------------------------------------------------
+# Replay
+# -----------------------------------------------------
+class PolicyResult:
+    def __init__(self, name: str, n_campaigns: int):
+        self.name = name
+        self.opportunities = 0
+        self.filled = 0
+        self.wins = np.zeros(n_campaigns)
+        self.spend = np.zeros(n_campaigns)
+
+    @property
+    def revenue(self) -> float:
+        return float(self.spend.sum())
+
+    @property
+    def fill_rate(self) -> float:
+        return self.filled / self.opportunities if self.opportunities else 0.0
+
+
+def replay_batch(table: CampaignTable, policy, result: PolicyResult, slots: np.ndarray, rng):
+    result.opportunities += len(slots)
+    exhausted = result.spend >= table.budget
+
+    for slot in np.unique(slots):
+        if slot < 0:
+            continue
+
+        cand = table.candidates[slot]
+        cand = cand[~exhausted[cand]]
+        n = int((slots == slot).sum())
+        if not len(cand):
+            continue
+
+        winners = cand[np.argmax(policy(table, cand, n, rng), axis=1)]
+        result.filled += n
+        result.wins += np.bincount(winners, minlength=len(table))
+        result.spend += np.bincount(winners, weights=table.expected_cost(winners), minlength=len(table))
+
+
+def logged_result(table: CampaignTable) -> PolicyResult:
+    """What actually happened (billing rules applied to the logged events)."""
+    result = PolicyResult("logged", len(table))
+    result.wins = table.logged_impressions
+    result.spend = np.where(
+        table.is_cpm,
+        table.bid * table.logged_impressions / 1000.0,
+        table.bid * table.logged_clicks,
+    )
+    result.opportunities = int(table.logged_impressions.sum())
+    result.filled = result.opportunities
+    return result
+
+
+def run_replay(source, policies: list, batch_size: int = DEFAULT_BATCH, seed: int = 7) -> dict:
+    table = CampaignTable(source.campaigns())
+
+    table.observe_window(
+        count_events(source.events("impressions"), table, batch_size),
+        count_events(source.events("clicks"), table, batch_size),
+    )
+
+    results = {name: PolicyResult(name, len(table)) for name in policies}
+    rngs = {name: np.random.default_rng(seed) for name in policies}
+
+    started = time.perf_counter()
+    batches = event_batches(source.events("impressions"), table.index, table.slot_index, table.slot, batch_size)
+    for _, slots, _ in batches:
+        for name in policies:
+            replay_batch(table, POLICIES[name], results[name], slots, rngs[name])
+
+    results["logged"] = logged_result(table)
+    return {"table": table, "results": results, "seconds": time.perf_counter() - started}
+
+
+# -----------------------------------------------------
+# Parity with bidding_engine
+# -----------------------------------------------------
+def check_parity(table: CampaignTable, samples: int = 200) -> dict:
+    """
+    Winners of the vectorised "bid" / "ecpm" policies vs
+    bidding_engine.select_winner on the same candidates.
+    Returns {policy: mismatches}.
+    """
+    from services.ads.bidding_engine import select_winner, bid_of, ecpm_of
+
+    keys = {"bid": bid_of, "ecpm": ecpm_of}
+    rng = np.random.default_rng(0)
+    mismatches = {name: 0 for name in keys}
+
+    for slot, cand in table.candidates.items():
+        if not len(cand):
+            continue
+
+        pairs = [(table.docs[i], {}) for i in cand]
+        for name, key in keys.items():
+            vector_winner = cand[np.argmax(POLICIES[name](table, cand, 1, rng)[0])]
+            engine_winner = select_winner(pairs, key=key)[0]
+            if table.ids[vector_winner] != str(engine_winner["_id"]):
+                mismatches[name] += 1
+
+        samples -= 1
+        if samples <= 0:
+            break
+
+    return mismatches
+
+
+# -----------------------------------------------------
+# Report
+# -----------------------------------------------------
+def build_report(run: dict, baseline: str, top: int = 10) -> dict:
+    table, results = run["table"], run["results"]
+    base = results[baseline]
+
+    report = {"seconds": round(run["seconds"], 2), "baseline": baseline, "policies": {}}
+
+    for name, result in results.items():
+        delta = result.spend - base.spend
+        order = np.argsort(-np.abs(delta))[:top]
+
+        report["policies"][name] = {
+            "opportunities": result.opportunities,
+            "fill_rate": round(result.fill_rate, 4),
+            "revenue": round(result.revenue, 2),
+            "revenue_vs_baseline": round(result.revenue - base.revenue, 2),
+            "top_spend_changes": [
+                {
+                    "campaign_id": table.ids[i],
+                    "spend": round(float(result.spend[i]), 2),
+                    "baseline_spend": round(float(base.spend[i]), 2),
+                    "impressions": int(result.wins[i]),
+                }
+                for i in order if delta[i] != 0
+            ],
+        }
+
+    return report
+
+
+def print_report(report: dict):
+    print(f"\nreplay took {report['seconds']}s — baseline: {report['baseline']}\n")
+    print(f"{'policy':<12}{'opportunities':>15}{'fill rate':>12}{'revenue':>14}{'Δ revenue':>14}")
+    for name, row in report["policies"].items():
+        print(
+            f"{name:<12}{row['opportunities']:>15,}{row['fill_rate'] * 100:>11.2f}%"
+            f"{row['revenue']:>14,.2f}{row['revenue_vs_baseline']:>+14,.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline auction replay")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--db", default=BENCH_ENV["MONGO_DB"])
+    parser.add_argument("--since", help="ISO date (Mongo source)")
+    parser.add_argument("--until", help="ISO date (Mongo source)")
+    parser.add_argument("--campaigns")
+    parser.add_argument("--impressions")
+    parser.add_argument("--clicks")
+    parser.add_argument("--policies", default="bid,ecpm,epsilon,thompson")
+    parser.add_argument("--baseline", default="logged", help="policy name or 'logged'")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--check-parity", action="store_true")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+
+        if not args.since:
+            parser.error("--since is required with --mongo-uri")
+        source = MongoSource(
+            MongoClient(args.mongo_uri)[args.db],
+            datetime.fromisoformat(args.since),
+            datetime.fromisoformat(args.until) if args.until else None,
+        )
+    elif args.campaigns and args.impressions and args.clicks:
+        source = FileSource(args.campaigns, args.impressions, args.clicks)
+    else:
+        parser.error("use --mongo-uri or --campaigns/--impressions/--clicks")
+
+    policies = [p.strip() for p in args.policies.split(",") if p.strip()]
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown:
+        parser.error(f"unknown policies: {unknown} (available: {sorted(POLICIES)})")
+    if args.baseline != "logged" and args.baseline not in policies:
+        parser.error("--baseline must be 'logged' or one of --policies")
+
+    run = run_replay(source, policies, batch_size=args.batch_size, seed=args.seed)
+
+    if args.check_parity:
+        print(f"parity mismatches vs bidding_engine: {check_parity(run['table'])}")
+
+    report = build_report(run, args.baseline)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nreport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Synthetic data seeder for benchmarks
+------------------------------------
+
+Creates approved, funded campaigns (one approved creative each, plus
+optional extra creatives) on every slot in services.ads.ad_slots.AD_SLOTS,
+and back-fills historical impression/click events.
+
+Run standalone against a local MongoDB:
+    python -m benchmarks.seed --mongo-uri mongodb://localhost:27017 \\
+        --campaigns-per-slot 200 --events-per-campaign 50
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks import BENCH_ENV  # noqa: F401 — bootstraps sys.path/env
+from services.ads.ad_slots import AD_SLOTS
+from utils.user_agent import ua_fields
+
+BENCH_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Mobile Safari/537.36",
+)
+
+SEEDED_COLLECTIONS = ("campaigns", "ad_creatives", "ads_impressions", "ads_clicks", "transactions")
+
+
+def slot_ids():
+    return [slot["id"] for slot in AD_SLOTS.values()]
+
+
+def seed(db, campaigns_per_slot=100, creatives_per_campaign=1,
+         events_per_campaign=20, click_rate=0.05, rng_seed=42, drop=True):
+    """
+    Seeds `db` and returns {"campaign_ids": {slot_id: [ids]}, "counts": {...}}.
+    """
+    rng = random.Random(rng_seed)
+    now = datetime.utcnow()
+
+    if drop:
+        for name in SEEDED_COLLECTIONS:
+            db[name].delete_many({})
+
+    campaigns, creatives, impressions, clicks = [], [], [], []
+    campaign_ids = {}
+
+    for slot_id in slot_ids():
+        campaign_ids[slot_id] = []
+
+        for i in range(campaigns_per_slot):
+            oid = ObjectId()
+            cid = str(oid)
+            budget = round(rng.uniform(50, 5000), 2)
+            spend = round(budget * rng.uniform(0, 0.9), 2)
+
+            campaigns.append({
+                "_id": oid,
+                "user_id": f"bench-user-{i % 50}",
+                "title": f"Bench {slot_id} #{i}",
+                "slot_id": slot_id,
+                "bidding_type": rng.choice(("CPC", "CPM")),
+                "bid_amount": round(rng.uniform(0.5, 25), 2),
+                "budget": budget,
+                "spend": spend,
+                "impressions": 0,
+                "clicks": 0,
+                "status": "approved",
+                "creative_status": "approved",
+                "created_at": now - timedelta(days=rng.randint(0, 30)),
+            })
+            campaign_ids[slot_id].append(cid)
+
+            for n in range(max(1, creatives_per_campaign)):
+                creatives.append({
+                    "campaign_id": cid,
+                    "slot_id": slot_id,
+                    "image_url": f"/static/uploads/bench_{cid}_{n}.png",
+                    "redirect_url": f"https://example.com/{cid}",
+                    "headline": f"Bench headline {i}",
+                    # only the first creative is live; the rest exercise the join
+                    "status": "approved" if n == 0 else "pending",
+                    "created_at": now,
+                })
+
+            for _ in range(events_per_campaign):
+                event = {
+                    "campaign_id": cid,
+                    "slot_id": slot_id,
+                    "timestamp": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+                    "ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}",
+                    **ua_fields(rng.choice(BENCH_USER_AGENTS)),
+                }
+                impressions.append(event)
+                if rng.random() < click_rate:
+                    clicks.append(dict(event))
+
+    for name, docs in (("campaigns", campaigns), ("ad_creatives", creatives),
+                       ("ads_impressions", impressions), ("ads_clicks", clicks)):
+        if docs:
+            db[name].insert_many(docs)
+
+    return {
+        "campaign_ids": campaign_ids,
+        "counts": {
+            "campaigns": len(campaigns),
+            "creatives": len(creatives),
+            "impressions": len(impressions),
+            "clicks": len(clicks),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed benchmark data")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default=BENCH_ENV["MONGO_DB"])
+    parser.add_argument("--campaigns-per-slot", type=int, default=100)
+    parser.add_argument("--creatives-per-campaign", type=int, default=1)
+    parser.add_argument("--events-per-campaign", type=int, default=20)
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+
+    result = seed(
+        MongoClient(args.mongo_uri)[args.db],
+        campaigns_per_slot=args.campaigns_per_slot,
+        creatives_per_campaign=args.creatives_per_campaign,
+        events_per_campaign=args.events_per_campaign,
+    )
+    print(f"[OK] Seeded {args.db}: {result['counts']}")
+
+
+if __name__ == "__main__":
+    main()
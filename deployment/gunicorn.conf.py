@@ -0,0 +1,70 @@
+"""
+Gunicorn configuration for DCorp
+
+Used by supervisor:
+    gunicorn -c deployment/gunicorn.conf.py src.wsgi:app
+
+MongoDB clients are created lazily per process (database/connection.py).
+The post_fork hook below guarantees that a worker never reuses a client
+the master may have created while importing the app (preload_app).
+"""
+
+import os
+import shutil
+import sys
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+
+# Import the app once in the master; workers fork with modules loaded
+# but without any open MongoDB sockets.
+preload_app = True
+
+
+def on_starting(server):
+    """Start every deploy with an empty Prometheus multi-process dir."""
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """Give every worker its own MongoDB connection pools."""
+    connection = sys.modules.get("database.connection")
+    if connection is not None:
+        connection.reset_connections()
+
+
+def worker_exit(server, worker):
+    """Stop background refreshers, close MongoDB pools, flush the log queue."""
+    pacing = sys.modules.get("services.ads.pacing")
+    if pacing is not None:
+        pacing.pacing_controller.stop()
+
+    schedule = sys.modules.get("services.ads.schedule")
+    if schedule is not None:
+        schedule.schedule_sweeper.stop()
+
+    budget = sys.modules.get("services.ads.budget_sweeper")
+    if budget is not None:
+        budget.budget_sweeper.stop()
+
+    ctr = sys.modules.get("services.ads.ctr_estimator")
+    if ctr is not None:
+        ctr.ctr_estimator.stop()
+
+    connection = sys.modules.get("database.connection")
+    if connection is not None:
+        connection.close_connections()
+
+    app_logging = sys.modules.get("utils.logging")
+    if app_logging is not None:
+        app_logging.shutdown_logging()
+
+
+def child_exit(server, worker):
+    """Drop the dead worker's live gauges from /metrics."""
+    metrics = sys.modules.get("utils.metrics")
+    if metrics is not None:
+        metrics.mark_process_dead(worker.pid)
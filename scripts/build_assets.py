@@ -0,0 +1,113 @@
+"""
+Static Asset Build
+
+Fingerprints the stylesheets and scripts under src/static so nginx can
+cache them forever:
+
+    src/static/css/theme.css  →  src/static/dist/css/theme.3f2a9c1b0d.css
+                                                        (+ .gz, + .br)
+
+and writes src/static/dist/manifest.json ({"css/theme.css": "dist/css/…"}),
+which the `asset_url()` template helper (utils/assets.py) resolves.
+
+Relative url(...) references inside CSS are rewritten to absolute
+/static/ paths so they survive the move into dist/.
+
+.br files need the `Brotli` package; without it only .gz is written.
+
+Run (at deploy time, after any CSS/JS change):
+    python scripts/build_assets.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # optional: .gz only
+    brotli = None
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT_DIR, "src", "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+
+SOURCE_DIRS = ("css", "js")
+HASH_LENGTH = 10
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)(?!data:|https?:|//|/)([^'")]+)\1\s*\)""")
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def rewrite_css_urls(css: bytes, rel_path: str) -> bytes:
+    """url(../img/x.png) in css/theme.css → url(/static/img/x.png)"""
+    base = posixpath.dirname(rel_path)
+
+    def absolute(match):
+        target = posixpath.normpath(posixpath.join(base, match.group(2)))
+        return f"url({match.group(1)}/static/{target}{match.group(1)})"
+
+    return CSS_URL.sub(absolute, css.decode("utf-8")).encode("utf-8")
+
+
+def write_compressed(path: str, data: bytes):
+    # mtime=0 keeps builds byte-for-byte reproducible
+    with open(path + ".gz", "wb") as out:
+        out.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+    if brotli is not None:
+        with open(path + ".br", "wb") as out:
+            out.write(brotli.compress(data, quality=11))
+
+
+def build():
+    print("\n=== Building Static Assets ===\n")
+
+    # Old fingerprints are removed: the manifest only points at this build
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+
+    manifest = {}
+
+    for source_dir in SOURCE_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(STATIC_DIR, source_dir)):
+            for filename in sorted(filenames):
+                src = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(src, STATIC_DIR).replace(os.sep, "/")
+
+                with open(src, "rb") as f:
+                    data = f.read()
+
+                if filename.endswith(".css"):
+                    data = rewrite_css_urls(data, rel_path)
+
+                stem, ext = posixpath.splitext(rel_path)
+                hashed = f"dist/{stem}.{fingerprint(data)}{ext}"
+
+                out_path = os.path.join(STATIC_DIR, hashed)
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                with open(out_path, "wb") as out:
+                    out.write(data)
+                write_compressed(out_path, data)
+
+                manifest[rel_path] = hashed
+                print(f"[OK] {rel_path} → {hashed}")
+
+    with open(os.path.join(DIST_DIR, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if brotli is None:
+        print("\n[WARN] Brotli not installed: wrote .gz siblings only")
+
+    print(f"\n=== {len(manifest)} assets → src/static/dist/manifest.json ===\n")
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,140 @@
+"""
+Creative Storage Migration
+
+Moves legacy uploads (UPLOAD_FOLDER/<uuid4>_<filename>, plus any variants
+written next to them) into the content-addressed creative store and
+rebuilds the creative_blobs reference counts.
+
+    - every ad_creatives document gets `content_hash` and store URLs
+    - identical images collapse into one blob
+    - images that were never processed get their variants rendered
+    - campaigns.image_url follows its creative
+
+Run:
+    python scripts/migrate_creatives.py               # migrate, keep old files
+    python scripts/migrate_creatives.py --dry-run     # report only
+    python scripts/migrate_creatives.py --delete-old  # remove migrated uploads
+"""
+
+import argparse
+import os
+
+from bson import ObjectId
+
+from config.settings import settings
+from database.connection import get_collection
+from services.ads.creative_pipeline import creative_fields, process_creative, rendition_key
+from services.ads.creative_store import hash_stream, put_bytes, store_file, normalize_ext
+
+
+LEGACY_PREFIX = "/static/uploads/"
+
+
+def legacy_path(url):
+    if not url or not url.startswith(LEGACY_PREFIX):
+        return None
+    return os.path.join(settings.UPLOAD_FOLDER, url[len(LEGACY_PREFIX):])
+
+
+def file_digest(path):
+    with open(path, "rb") as stream:
+        return hash_stream(stream)
+
+
+def migrate_variants(variants, owner):
+    """Copies legacy variant files into blob `owner`. Returns the new list."""
+    migrated = []
+    for variant in variants:
+        path = legacy_path(variant.get("url"))
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            url = put_bytes(f.read(), normalize_ext(path), owner)
+        migrated.append({**variant, "url": url})
+    return migrated
+
+
+def migrate(dry_run=False, delete_old=False):
+    creatives_col = get_collection("ad_creatives")
+    campaigns_col = get_collection("campaigns")
+    blobs_col = get_collection("creative_blobs")
+
+    print("\n=== Migrating Creatives To Content-Addressed Storage ===\n")
+
+    digests, old_paths = set(), set()
+    migrated = missing = 0
+
+    for creative in creatives_col.find({"content_hash": {"$exists": False}}):
+        old_url = creative.get("image_url")
+        src_path = legacy_path(old_url)
+        if not src_path:
+            continue  # default / external image
+
+        if not os.path.exists(src_path):
+            print(f"[MISSING] {creative['_id']}: {old_url}")
+            missing += 1
+            continue
+
+        campaign_id = creative.get("campaign_id")
+        slot_id = creative.get("slot_id")
+        if not slot_id and ObjectId.is_valid(campaign_id or ""):
+            camp = campaigns_col.find_one({"_id": ObjectId(campaign_id)}, {"slot_id": 1}) or {}
+            slot_id = camp.get("slot_id")
+
+        old_variants = creative.get("variants") or []
+        old_paths.add(src_path)
+        old_paths.update(filter(None, (legacy_path(v.get("url")) for v in old_variants)))
+        digests.add(file_digest(src_path))
+        migrated += 1
+
+        if dry_run:
+            continue
+
+        # Processed uploads kept only their fallback variant as image_url;
+        # that file becomes the blob's source
+        blob = store_file(src_path)
+        key = rendition_key(slot_id)
+
+        variants = migrate_variants(old_variants, blob["_id"]) if old_variants else None
+        if variants:
+            blobs_col.update_one(
+                {"_id": blob["_id"], f"renditions.{key}": {"$exists": False}},
+                {"$set": {f"renditions.{key}": variants}},
+            )
+            blob = blobs_col.find_one({"_id": blob["_id"]})
+
+        fields = creative_fields(blob, slot_id)
+        creatives_col.update_one({"_id": creative["_id"]}, {"$set": fields})
+
+        if ObjectId.is_valid(campaign_id or ""):
+            campaigns_col.update_one(
+                {"_id": ObjectId(campaign_id), "image_url": old_url},
+                {"$set": {"image_url": fields["image_url"]}},
+            )
+
+            if key not in (blob.get("renditions") or {}):
+                # Never processed (or variants lost): render + strip metadata now
+                process_creative(blob["_id"], slot_id, campaign_id)
+
+    print(f"[OK] creatives migrated: {migrated} → {len(digests)} distinct images")
+    if missing:
+        print(f"[WARN] creatives with missing files: {missing}")
+
+    if delete_old and not dry_run:
+        for path in old_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        print(f"[OK] removed {len(old_paths)} legacy upload files")
+
+    print("\n=== Creative Migration Completed ===\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move uploads into the content-addressed creative store")
+    parser.add_argument("--dry-run", action="store_true", help="report only, change nothing")
+    parser.add_argument("--delete-old", action="store_true", help="remove legacy upload files afterwards")
+    args = parser.parse_args()
+
+    migrate(dry_run=args.dry_run, delete_old=args.delete_old)
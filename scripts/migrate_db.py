@@ -56,6 +56,12 @@ def migrate():
     campaigns.create_index([("status", 1)])
     print("[OK] campaigns: index on status")
 
+    campaigns.create_index([("status", 1), ("end_date", 1)])
+    print("[OK] campaigns: index on status + end_date (schedule sweeper)")
+
+    campaigns.create_index([("status", 1), ("budget", 1)])
+    print("[OK] campaigns: index on status + budget (budget sweeper)")
+
     # ------------------------------
     # ADS COLLECTION
     # ------------------------------
@@ -87,6 +93,34 @@ def migrate():
     # TTL example (optional):
     # analytics.create_index("timestamp", expireAfterSeconds=90*24*3600)
 
+    # ------------------------------
+    # AD CREATIVES COLLECTION
+    # ------------------------------
+    ad_creatives = db.get_collection("ad_creatives")
+
+    ad_creatives.create_index([("campaign_id", 1), ("content_hash", 1)])
+    print("[OK] ad_creatives: index on campaign_id + content_hash (creative store)")
+
+    # ------------------------------
+    # TRACKING EVENTS (idempotent event ids)
+    # ------------------------------
+    # Without these, retried events are counted and billed twice
+    for name, prefix in (("ads_impressions", "imp"), ("ads_clicks", "click"), ("ads_conversions", "conv")):
+        db.get_collection(name).create_index(
+            [("event_id", 1)],
+            unique=True,
+            name=f"{prefix}_event_id_unique",
+            partialFilterExpression={"event_id": {"$exists": True}},
+        )
+        print(f"[OK] {name}: unique index on event_id")
+
+    db.get_collection("ads_conversions").create_index(
+        [("attribution", 1), ("received_at", 1)],
+        name="conv_pending_received",
+        partialFilterExpression={"attribution": "pending"},
+    )
+    print("[OK] ads_conversions: index on pending attribution + received_at")
+
     # ------------------------------
     # TRANSACTIONS COLLECTION
     # ------------------------------
@@ -98,6 +132,9 @@ def migrate():
     transactions.create_index([("type", 1)])
     print("[OK] transactions: index on type")
 
+    transactions.create_index([("transaction_type", 1), ("created_at", -1), ("campaign_id", 1)])
+    print("[OK] transactions: index on transaction_type + created_at + campaign_id (pacing)")
+
     print("\n=== Migration Completed Successfully ===\n")
 
 
@@ -0,0 +1,50 @@
+"""
+Conversion Attribution Worker
+
+Keeps the in-memory click index of services/ads/attribution.py warm and
+attributes pending conversions every ATTRIBUTION_INTERVAL_SECONDS
+(immediately again while a full batch is waiting).
+
+Run exactly one instance (see deployment/supervisor.conf):
+    python scripts/run_attribution.py           # loop
+    python scripts/run_attribution.py --once    # single pass (cron / backfill)
+"""
+
+import argparse
+import time
+
+from config.settings import settings
+from services.ads.attribution import AttributionJob
+from utils.logging import app_logger, init_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attribute conversions to clicks")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    args = parser.parse_args()
+
+    # Same async file / console handlers as the web workers
+    init_logging()
+
+    job = AttributionJob()
+
+    while True:
+        try:
+            result = job.run_once()
+        except Exception as e:
+            app_logger.error(f"[ATTRIBUTION ERROR] {e}", exc_info=True)
+            result = None
+
+        if args.once:
+            print(f"[OK] {result}")
+            return
+
+        # A full batch means more conversions are waiting
+        if result and result["pending"] >= settings.ATTRIBUTION_BATCH_SIZE:
+            continue
+
+        time.sleep(settings.ATTRIBUTION_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from datetime import datetime
 from database.connection import get_collection
+from services.ads.edge_cache import purge_creatives
 
 # Blueprint: matches app.py registration
 admin_ads_bp = Blueprint("admin_ads_bp", __name__, url_prefix="/api/admin/ads")
@@ -80,6 +81,7 @@ def approve_creative(creative_id):
             }
         }
     )
+    purge_creatives([cid])
 
     return jsonify({"ok": True, "creative_id": creative_id, "status": "approved"}), 200
 
@@ -103,6 +105,7 @@ def reject_creative(creative_id):
             }
         }
     )
+    purge_creatives([cid])
 
     return jsonify({"ok": True, "creative_id": creative_id, "status": "rejected"}), 200
 
@@ -126,6 +129,7 @@ def pause_creative(creative_id):
             }
         }
     )
+    purge_creatives([cid])
 
     return jsonify({"ok": True, "creative_id": creative_id, "status": "paused"}), 200
 
@@ -149,6 +153,7 @@ def activate_creative(creative_id):
             }
         }
     )
+    purge_creatives([cid])
 
     return jsonify({"ok": True, "creative_id": creative_id, "status": "approved"}), 200
 
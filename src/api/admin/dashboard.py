@@ -40,8 +40,8 @@ def dashboard_page():
 
     try:
         # ------------------ REAL Ad Tracking ------------------
-        impressions = get_collection("ads_impressions").count_documents({})
-        clicks = get_collection("ads_clicks").count_documents({})
+        impressions = get_collection("ads_impressions", profile="analytics").count_documents({})
+        clicks = get_collection("ads_clicks", profile="analytics").count_documents({})
         ctr = (clicks / impressions * 100) if impressions > 0 else 0
 
         # ------------------ Users & Roles ------------------
@@ -106,8 +106,8 @@ def dashboard_api():
 
     try:
         # ---------- Impressions & Clicks ----------
-        impressions = get_collection("ads_impressions").count_documents({})
-        clicks = get_collection("ads_clicks").count_documents({})
+        impressions = get_collection("ads_impressions", profile="analytics").count_documents({})
+        clicks = get_collection("ads_clicks", profile="analytics").count_documents({})
         ctr = round((clicks / impressions * 100), 2) if impressions > 0 else 0
 
         # ---------- Users ----------
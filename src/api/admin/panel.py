@@ -23,6 +23,7 @@ from config.settings import settings
 from utils.timezone import to_ist
 from utils.campaign_health import compute_campaign_health
 from utils.campaign_pacing import compute_pacing
+from services.ads.edge_cache import purge_campaigns
 
 import csv
 import math
@@ -88,12 +89,12 @@ def index():
         return redirect(url_for("admin_panel.login"))
 
     try:
-        campaigns = get_collection("campaigns")
-        users = get_collection("users")
-        tx = get_collection("transactions")
+        campaigns = get_collection("campaigns", profile="analytics")
+        users = get_collection("users", profile="analytics")
+        tx = get_collection("transactions", profile="analytics")
 
-        impressions = get_collection("ads_impressions").count_documents({})
-        clicks = get_collection("ads_clicks").count_documents({})
+        impressions = get_collection("ads_impressions", profile="analytics").count_documents({})
+        clicks = get_collection("ads_clicks", profile="analytics").count_documents({})
 
         stats = {
             "total_campaigns": campaigns.count_documents({}),
@@ -178,9 +179,9 @@ def users():
         return redirect(url_for("admin_panel.login"))
 
     try:
-        users_col = get_collection("users")
-        campaigns_col = get_collection("campaigns")
-        tx_col = get_collection("transactions")
+        users_col = get_collection("users", profile="analytics")
+        campaigns_col = get_collection("campaigns", profile="analytics")
+        tx_col = get_collection("transactions", profile="analytics")
 
         users = list(users_col.find().sort("created_at", -1))
 
@@ -352,8 +353,8 @@ def campaign_performance(cid):
 
     try:
         campaigns = get_collection("campaigns")
-        impressions_col = get_collection("ads_impressions")
-        clicks_col = get_collection("ads_clicks")
+        impressions_col = get_collection("ads_impressions", profile="analytics")
+        clicks_col = get_collection("ads_clicks", profile="analytics")
 
         c = campaigns.find_one({"_id": safe_oid(cid)})
         if not c:
@@ -420,6 +421,7 @@ def approve_campaign(cid):
             {"campaign_id": str(cid)},
             {"$set": {"status": "approved", "approved_at": now}}
         )
+        purge_campaigns([cid])
 
         flash("Campaign approved.", "success")
         return redirect(url_for("admin_panel.view_campaign", cid=cid))
@@ -470,6 +472,7 @@ def reject_campaign(cid):
             {"campaign_id": str(cid)},
             {"$set": {"status": "rejected", "rejection_reason": reason}}
         )
+        purge_campaigns([cid])
 
         flash("Campaign rejected & refunded.", "warning")
         return redirect(url_for("admin_panel.view_campaign", cid=cid))
@@ -490,9 +493,9 @@ def transactions():
         return redirect(url_for("admin_panel.login"))
 
     try:
-        tx_col = get_collection("transactions")
-        users_col = get_collection("users")
-        camp_col = get_collection("campaigns")
+        tx_col = get_collection("transactions", profile="analytics")
+        users_col = get_collection("users", profile="analytics")
+        camp_col = get_collection("campaigns", profile="analytics")
 
         q = (request.args.get("q") or "").strip()
         tx_type = request.args.get("type", "").strip()
@@ -668,6 +671,7 @@ def pause_campaign(cid):
             {"_id": safe_oid(cid)},
             {"$set": {"status": "paused"}}
         )
+        purge_campaigns([cid])
 
         flash("Campaign paused.", "warning")
         return redirect(url_for("admin_panel.view_campaign", cid=cid))
@@ -688,6 +692,7 @@ def resume_campaign(cid):
             {"_id": safe_oid(cid)},
             {"$set": {"status": "approved"}}
         )
+        purge_campaigns([cid])
 
         flash("Campaign resumed.", "success")
         return redirect(url_for("admin_panel.view_campaign", cid=cid))
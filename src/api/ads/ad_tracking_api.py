@@ -1,7 +1,25 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, redirect, Response
 from database.connection import get_collection
-from bson import ObjectId
-from datetime import datetime
+from services.ads.bidding_engine import tracking_urls
+from services.ads.tracking_service import (
+    parse_tracked_event,
+    parse_impression_token,
+    parse_click_token,
+    parse_decision_token,
+    event_id,
+    make_conversion_doc,
+    decode_batch,
+    plan_batch,
+    record_impression_steps,
+    record_click_steps,
+    record_conversion_steps,
+    ingest_batch_steps,
+    run_steps,
+    BatchError,
+    TRANSPARENT_GIF,
+)
+from config.settings import settings
+from utils.client_ip import client_ip
 
 ads_tracking_bp = Blueprint(
     "ads_tracking_bp",
@@ -9,15 +27,43 @@ ads_tracking_bp = Blueprint(
     url_prefix="/api/ads/track"
 )
 
+# Signed click redirects: /c/<token> (short, no prefix)
+click_redirect_bp = Blueprint("click_redirect_bp", __name__)
+
 
 # ---------------------------------------------------------
-# Utility: Safe ObjectId conversion
+# Recording (shared by JSON, pixel, beacon and redirect)
 # ---------------------------------------------------------
-def safe_oid(val):
-    try:
-        return ObjectId(val)
-    except Exception:
-        return None
+def record_impression(campaign_id, cid, slot_id, event_id=None):
+    run_steps(record_impression_steps(
+        campaign_id, cid, slot_id, client_ip(request), request.headers.get("User-Agent"), event_id,
+    ), get_collection)
+
+
+def record_click(campaign_id, cid, slot_id, event_id=None) -> bool:
+    """Logs + bills a click. False if the campaign does not exist."""
+    return run_steps(record_click_steps(
+        campaign_id, cid, slot_id, client_ip(request), request.headers.get("User-Agent"),
+        request.args.get("viewer_id") or request.headers.get("X-Viewer-ID"), event_id,
+    ), get_collection)
+
+
+def record_pixel_impression(token):
+    """Pixel / beacon: ?t=<impression token>. Raises ValueError."""
+    campaign_id, cid, slot_id = parse_impression_token(token)
+    record_impression(campaign_id, cid, slot_id, event_id("impression", token))
+
+
+def record_conversion(params: dict):
+    """Stores a pending conversion (attributed later). Raises ValueError."""
+    params.setdefault("viewer_id", request.headers.get("X-Viewer-ID"))
+    doc = make_conversion_doc(params, client_ip(request), request.headers.get("User-Agent"))
+    run_steps(record_conversion_steps(doc), get_collection)
+
+
+def ingest_batch(plan: dict):
+    """Writes a planned batch: one bulk write per collection."""
+    return run_steps(ingest_batch_steps(plan), get_collection)
 
 
 # ---------------------------------------------------------
@@ -28,40 +74,65 @@ def track_impression():
     try:
         data = request.get_json(silent=True) or {}
 
-        campaign_id = data.get("campaign_id")
-        slot_id = data.get("slot_id")
+        try:
+            # Signed token, or bare ids + optional client event_id
+            campaign_id, cid, slot_id, eid = parse_tracked_event("impression", data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if not campaign_id:
-            return jsonify({"error": "campaign_id missing"}), 400
+        record_impression(campaign_id, cid, slot_id, eid)
+        return jsonify({"status": "ok"}), 200
 
-        cid = safe_oid(campaign_id)
-        if not cid:
-            return jsonify({"error": "invalid campaign_id"}), 400
+    except Exception as e:
+        current_app.logger.error(f"[IMPRESSION ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
 
-        impressions = get_collection("ads_impressions")
-        campaigns = get_collection("campaigns")
 
-        # Track event
-        impressions.insert_one({
-            "campaign_id": campaign_id,
-            "slot_id": slot_id,
-            "timestamp": datetime.utcnow(),
-            "ip": request.remote_addr,
-            "ua": request.headers.get("User-Agent"),
-        })
+# ---------------------------------------------------------
+# IMPRESSION PIXEL (GET, no preflight)
+# ---------------------------------------------------------
+@ads_tracking_bp.get("/impression.gif")
+def impression_pixel():
+    try:
+        record_pixel_impression(request.args.get("t"))
+    except ValueError:
+        pass  # bad / expired token: still answer with the pixel
+    except Exception as e:
+        current_app.logger.error(f"[IMPRESSION PIXEL ERROR] {e}", exc_info=True)
 
-        # Increment counters safely
-        campaigns.update_one(
-            {"_id": cid},
-            {"$inc": {"impressions": 1}}
-        )
+    return Response(TRANSPARENT_GIF, mimetype="image/gif", headers={"Cache-Control": "no-store"})
 
-        return jsonify({"status": "ok"}), 200
 
+# ---------------------------------------------------------
+# IMPRESSION BEACON (navigator.sendBeacon, body ignored)
+# ---------------------------------------------------------
+@ads_tracking_bp.post("/beacon")
+def impression_beacon():
+    try:
+        record_pixel_impression(request.args.get("t"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f"[IMPRESSION ERROR] {e}", exc_info=True)
+        current_app.logger.error(f"[IMPRESSION BEACON ERROR] {e}", exc_info=True)
         return jsonify({"error": "server_error"}), 500
 
+    return "", 204
+
+
+# ---------------------------------------------------------
+# TRACKING SESSION (per-serve URLs for an edge-cached decision)
+# ---------------------------------------------------------
+@ads_tracking_bp.get("/session")
+def tracking_session():
+    try:
+        campaign_id, slot_id, redirect_url = parse_decision_token(request.args.get("d"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify(tracking_urls(campaign_id, slot_id, redirect_url))
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
 
 # ---------------------------------------------------------
 # TRACK CLICK + BILLING (CPC)
@@ -71,80 +142,103 @@ def track_click():
     try:
         data = request.get_json(silent=True) or {}
 
-        campaign_id = data.get("campaign_id")
-        slot_id = data.get("slot_id")
+        try:
+            campaign_id, cid, slot_id, eid = parse_tracked_event("click", data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if not campaign_id:
-            return jsonify({"error": "campaign_id missing"}), 400
+        if not record_click(campaign_id, cid, slot_id, eid):
+            return jsonify({"error": "campaign_not_found"}), 404
 
-        cid = safe_oid(campaign_id)
-        if not cid:
-            return jsonify({"error": "invalid campaign_id"}), 400
+        return jsonify({"status": "ok"}), 200
 
-        clicks = get_collection("ads_clicks")
-        campaigns = get_collection("campaigns")
-        transactions = get_collection("transactions")
+    except Exception as e:
+        current_app.logger.error(f"[CLICK ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
 
-        # Log click event
-        clicks.insert_one({
-            "campaign_id": campaign_id,
-            "slot_id": slot_id,
-            "timestamp": datetime.utcnow(),
-            "ip": request.remote_addr,
-            "ua": request.headers.get("User-Agent"),
-        })
 
-        # Fetch campaign
-        campaign = campaigns.find_one({"_id": cid})
-        if not campaign:
-            return jsonify({"error": "campaign_not_found"}), 404
+# ---------------------------------------------------------
+# CONVERSION POSTBACK (server-to-server or page JSON)
+# ---------------------------------------------------------
+@ads_tracking_bp.post("/conversion")
+def track_conversion():
+    try:
+        params = {**request.args.to_dict(), **(request.get_json(silent=True) or {})}
 
-        bidding_type = campaign.get("bidding_type", "CPC").upper()
-        bid = float(campaign.get("bid_amount", 0) or 0)
-        current_budget = float(campaign.get("budget", 0) or 0)
-
-        # Always increment click count
-        campaigns.update_one(
-            {"_id": cid},
-            {"$inc": {"clicks": 1}}
-        )
-
-        # -----------------------------
-        # CPC Billing Logic
-        # -----------------------------
-        if bidding_type == "CPC":
-
-            # Budget sufficient?
-            if current_budget >= bid:
-
-                # Deduct from campaign budget and increase spend
-                campaigns.update_one(
-                    {"_id": cid},
-                    {"$inc": {"spend": bid, "budget": -bid}}
-                )
-
-                # Log a spend transaction (analytics-only)
-                transactions.insert_one({
-                    "user_id": campaign["user_id"],
-                    "campaign_id": campaign_id,
-                    "type": "info",
-                    "transaction_type": "ad_spend",
-                    "amount": bid,
-                    "created_at": datetime.utcnow(),
-                    "reason": f"campaign:{campaign_id}",
-                    "ref_id": f"CPC-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-                    "status": "logged"
-                })
-
-            else:
-                # Budget exhausted → End campaign
-                campaigns.update_one(
-                    {"_id": cid},
-                    {"$set": {"budget": 0, "status": "ended"}}
-                )
+        try:
+            record_conversion(params)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         return jsonify({"status": "ok"}), 200
 
     except Exception as e:
-        current_app.logger.error(f"[CLICK ERROR] {e}", exc_info=True)
+        current_app.logger.error(f"[CONVERSION ERROR] {e}", exc_info=True)
         return jsonify({"error": "server_error"}), 500
+
+
+# ---------------------------------------------------------
+# CONVERSION PIXEL (thank-you page)
+# ---------------------------------------------------------
+@ads_tracking_bp.get("/conversion.gif")
+def conversion_pixel():
+    try:
+        record_conversion(request.args.to_dict())
+    except ValueError:
+        pass  # unknown viewer / bad token: still answer with the pixel
+    except Exception as e:
+        current_app.logger.error(f"[CONVERSION PIXEL ERROR] {e}", exc_info=True)
+
+    return Response(TRANSPARENT_GIF, mimetype="image/gif", headers={"Cache-Control": "no-store"})
+
+
+# ---------------------------------------------------------
+# BATCH UPLOAD (gzip NDJSON / msgpack, per-event tokens)
+# ---------------------------------------------------------
+@ads_tracking_bp.post("/batch")
+def track_batch():
+    if (request.content_length or 0) > settings.TRACKING_BATCH_MAX_BYTES:
+        return jsonify({"error": "batch too large"}), 413
+
+    try:
+        events = decode_batch(request.get_data(cache=False), request.content_type)
+    except BatchError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    try:
+        plan = plan_batch(events, client_ip(request), request.headers.get("User-Agent"))
+        duplicates = ingest_batch(plan)
+
+        return jsonify({
+            "accepted": len(events) - len(plan["rejected"]),
+            "rejected": plan["rejected"],
+            "duplicates": duplicates,
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"[BATCH ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
+
+
+# ---------------------------------------------------------
+# CLICK REDIRECT (record + 302 to the signed redirect_url)
+# ---------------------------------------------------------
+@click_redirect_bp.get("/c/<token>")
+def click_redirect(token):
+    try:
+        campaign_id, cid, slot_id, redirect_url = parse_click_token(token)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        record_click(campaign_id, cid, slot_id, event_id("click", token))
+    except Exception as e:
+        # The visitor still reaches the advertiser
+        current_app.logger.error(f"[CLICK REDIRECT ERROR] {e}", exc_info=True)
+
+    if not redirect_url:
+        return jsonify({"error": "no_redirect_url"}), 404
+
+    response = redirect(redirect_url, code=302)
+    response.headers["Cache-Control"] = "no-store"
+    return response
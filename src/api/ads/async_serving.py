@@ -0,0 +1,417 @@
+"""
+Async Ad Serving App (ASGI)
+---------------------------
+
+Serves the hot ad endpoints on asyncio + motor so one process can keep
+thousands of Mongo round-trips in flight, instead of one per sync
+gunicorn worker.
+
+Same contracts as the Flask app:
+    GET  /api/ads/slot/<slot_id>     → api/ads/routes.get_ad_slot
+    POST /api/ads/track/impression   → api/ads/ad_tracking_api.track_impression
+    POST /api/ads/track/click        → api/ads/ad_tracking_api.track_click
+    GET  /api/ads/track/impression.gif, POST /api/ads/track/beacon,
+    POST /api/ads/track/batch,
+    GET  /c/<token>                  → signed beacon / redirect twins
+
+Auction and billing rules are NOT re-implemented here — they come from
+services.ads.bidding_engine and services.ads.tracking_service.
+
+Run (see src/asgi.py):
+    uvicorn src.asgi:app --host 127.0.0.1 --port 8001
+"""
+
+from quart import Quart, Blueprint, Response, jsonify, redirect, request, current_app
+
+from config.settings import settings
+from database.async_connection import get_async_collection, close_async_connections
+from services.ads.bidding_engine import (
+    eligible_campaigns_query,
+    approved_creatives_query,
+    funded_campaigns,
+    index_creatives,
+    pair_candidates,
+    select_winner,
+    auction_filter,
+    ranking_key,
+    record_serve,
+    build_ad_payload,
+    tracking_urls,
+    image_preferences,
+)
+from services.ads.edge_cache import is_cacheable, etag_for, not_modified, cache_headers
+from services.ads.frequency_cap import viewer_key
+from services.ads.serving_cache import serving_cache
+from services.ads.targeting_engine import request_context
+from services.ads.tracking_service import (
+    parse_tracked_event,
+    parse_impression_token,
+    parse_click_token,
+    parse_decision_token,
+    event_id,
+    make_conversion_doc,
+    decode_batch,
+    plan_batch,
+    record_impression_steps,
+    record_click_steps,
+    record_conversion_steps,
+    ingest_batch_steps,
+    run_steps_async,
+    BatchError,
+    TRANSPARENT_GIF,
+)
+from utils.client_ip import client_ip
+from utils.metrics import observe_auction, register_async_metrics
+from utils.logging import register_async_request_logging
+
+async_ads_bp = Blueprint("async_ads", __name__, url_prefix="/api/ads")
+async_click_bp = Blueprint("async_click", __name__)
+
+
+# =====================================================================
+# AD DELIVERY ENDPOINT (CRITICAL — ZERO BILLING HERE)
+# =====================================================================
+async def load_slot_pairs_async(slot_id: str) -> list:
+    """Async twin of bidding_engine.load_slot_pairs (two round-trips max)."""
+    campaigns_col = get_async_collection("campaigns", profile="serving")
+    creatives_col = get_async_collection("ad_creatives", profile="serving")
+
+    campaigns = funded_campaigns(
+        await campaigns_col.find(eligible_campaigns_query(slot_id)).to_list(length=None)
+    )
+
+    if not campaigns:
+        return []
+
+    creatives = await creatives_col.find(
+        approved_creatives_query([str(c["_id"]) for c in campaigns])
+    ).to_list(length=None)
+
+    return pair_candidates(campaigns, index_creatives(creatives))
+
+
+async def get_winning_ad_async(slot_id: str, viewer=None, context: dict = None,
+                               image_prefs: tuple = (False, None), shared: bool = False):
+    """
+    Async twin of bidding_engine.get_winning_ad (shares the serving cache).
+    """
+    if shared:
+        viewer = None
+
+    snapshot = serving_cache.get(slot_id)
+    if snapshot is None:
+        snapshot = serving_cache.put(slot_id, await load_slot_pairs_async(slot_id))
+
+    eligible = snapshot.candidates(context)
+    winner = select_winner(eligible, skip=auction_filter(viewer), key=ranking_key())
+    observe_auction(slot_id, len(eligible), filled=winner is not None)
+
+    if not winner:
+        return None
+
+    campaign, creative = winner
+    record_serve(viewer, campaign)
+    accept_webp, width = image_prefs
+    return build_ad_payload(
+        campaign, creative, slot_id,
+        base_url=current_app.config["DCORP_API_URL"],
+        accept_webp=accept_webp,
+        width=width,
+        shared=shared,
+    )
+
+
+@async_ads_bp.route("/slot/<slot_id>", methods=["GET"])
+async def get_ad_slot(slot_id):
+    try:
+        slot_id = (slot_id or "").strip()
+
+        if not slot_id:
+            return jsonify({
+                "ad": None,
+                "error": "slot_id is required"
+            }), 400
+
+        viewer = viewer_key(
+            request.args.get("viewer_id") or request.headers.get("X-Viewer-ID"),
+            client_ip(request),
+            request.headers.get("User-Agent"),
+        )
+
+        # Shared (edge-cached) decisions carry no per-serve tracking tokens
+        cacheable = is_cacheable(slot_id, request.args, request.headers)
+
+        ad = await get_winning_ad_async(
+            slot_id,
+            viewer=viewer,
+            context=request_context(request.args, request.headers.get("User-Agent")),
+            image_prefs=image_preferences(request.args, request.headers.get("Accept")),
+            shared=cacheable,
+        )
+
+        if not ad:
+            response = jsonify({
+                "ad": None,
+                "message": "No eligible ads for this slot."
+            })
+        else:
+            response = jsonify({"ad": ad})
+
+        etag = etag_for(ad) if cacheable else None
+        response.headers.update(cache_headers(slot_id, ad, cacheable, etag))
+
+        if cacheable and not_modified(request.headers.get("If-None-Match"), etag):
+            response.status_code = 304
+            response.set_data(b"")
+
+        return response
+
+    except Exception as e:
+        current_app.logger.error(
+            f"[AD SLOT ERROR] slot_id={slot_id}, error={e}",
+            exc_info=True
+        )
+        return jsonify({
+            "ad": None,
+            "error": "internal_server_error"
+        }), 500
+
+
+# ---------------------------------------------------------
+# Recording (shared by JSON, pixel, beacon and redirect)
+# ---------------------------------------------------------
+async def record_impression(campaign_id, cid, slot_id, event_id=None):
+    """Async twin of ad_tracking_api.record_impression (same tracking_service steps)."""
+    await run_steps_async(record_impression_steps(
+        campaign_id, cid, slot_id, client_ip(request), request.headers.get("User-Agent"), event_id,
+    ), get_async_collection)
+
+
+async def record_click(campaign_id, cid, slot_id, event_id=None) -> bool:
+    """Async twin of ad_tracking_api.record_click."""
+    return await run_steps_async(record_click_steps(
+        campaign_id, cid, slot_id, client_ip(request), request.headers.get("User-Agent"),
+        request.args.get("viewer_id") or request.headers.get("X-Viewer-ID"), event_id,
+    ), get_async_collection)
+
+
+async def record_pixel_impression(token):
+    """Async twin of ad_tracking_api.record_pixel_impression."""
+    campaign_id, cid, slot_id = parse_impression_token(token)
+    await record_impression(campaign_id, cid, slot_id, event_id("impression", token))
+
+
+async def record_conversion(params: dict):
+    """Async twin of ad_tracking_api.record_conversion."""
+    params.setdefault("viewer_id", request.headers.get("X-Viewer-ID"))
+    doc = make_conversion_doc(params, client_ip(request), request.headers.get("User-Agent"))
+    await run_steps_async(record_conversion_steps(doc), get_async_collection)
+
+
+async def ingest_batch(plan: dict):
+    """Async twin of ad_tracking_api.ingest_batch."""
+    return await run_steps_async(ingest_batch_steps(plan), get_async_collection)
+
+
+# ---------------------------------------------------------
+# TRACK IMPRESSION
+# ---------------------------------------------------------
+@async_ads_bp.post("/track/impression")
+async def track_impression():
+    try:
+        data = await request.get_json(silent=True) or {}
+
+        try:
+            # Signed token, or bare ids + optional client event_id
+            campaign_id, cid, slot_id, eid = parse_tracked_event("impression", data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        await record_impression(campaign_id, cid, slot_id, eid)
+        return jsonify({"status": "ok"}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"[IMPRESSION ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
+
+
+@async_ads_bp.get("/track/impression.gif")
+async def impression_pixel():
+    try:
+        await record_pixel_impression(request.args.get("t"))
+    except ValueError:
+        pass  # bad / expired token: still answer with the pixel
+    except Exception as e:
+        current_app.logger.error(f"[IMPRESSION PIXEL ERROR] {e}", exc_info=True)
+
+    return Response(TRANSPARENT_GIF, mimetype="image/gif", headers={"Cache-Control": "no-store"})
+
+
+@async_ads_bp.post("/track/beacon")
+async def impression_beacon():
+    try:
+        await record_pixel_impression(request.args.get("t"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"[IMPRESSION BEACON ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
+
+    return "", 204
+
+
+# ---------------------------------------------------------
+# TRACKING SESSION (per-serve URLs for an edge-cached decision)
+# ---------------------------------------------------------
+@async_ads_bp.get("/track/session")
+async def tracking_session():
+    try:
+        campaign_id, slot_id, redirect_url = parse_decision_token(request.args.get("d"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify(tracking_urls(campaign_id, slot_id, redirect_url, base_url=current_app.config["DCORP_API_URL"]))
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+# ---------------------------------------------------------
+# TRACK CLICK + BILLING (CPC)
+# ---------------------------------------------------------
+@async_ads_bp.post("/track/click")
+async def track_click():
+    try:
+        data = await request.get_json(silent=True) or {}
+
+        try:
+            campaign_id, cid, slot_id, eid = parse_tracked_event("click", data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if not await record_click(campaign_id, cid, slot_id, eid):
+            return jsonify({"error": "campaign_not_found"}), 404
+
+        return jsonify({"status": "ok"}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"[CLICK ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
+
+
+# ---------------------------------------------------------
+# CONVERSIONS (postback + thank-you page pixel)
+# ---------------------------------------------------------
+@async_ads_bp.post("/track/conversion")
+async def track_conversion():
+    try:
+        params = {**request.args.to_dict(), **(await request.get_json(silent=True) or {})}
+
+        try:
+            await record_conversion(params)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"status": "ok"}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"[CONVERSION ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
+
+
+@async_ads_bp.get("/track/conversion.gif")
+async def conversion_pixel():
+    try:
+        await record_conversion(request.args.to_dict())
+    except ValueError:
+        pass  # unknown viewer / bad token: still answer with the pixel
+    except Exception as e:
+        current_app.logger.error(f"[CONVERSION PIXEL ERROR] {e}", exc_info=True)
+
+    return Response(TRANSPARENT_GIF, mimetype="image/gif", headers={"Cache-Control": "no-store"})
+
+
+@async_ads_bp.post("/track/batch")
+async def track_batch():
+    if (request.content_length or 0) > settings.TRACKING_BATCH_MAX_BYTES:
+        return jsonify({"error": "batch too large"}), 413
+
+    try:
+        events = decode_batch(await request.get_data(), request.content_type)
+    except BatchError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    try:
+        plan = plan_batch(events, client_ip(request), request.headers.get("User-Agent"))
+        duplicates = await ingest_batch(plan)
+
+        return jsonify({
+            "accepted": len(events) - len(plan["rejected"]),
+            "rejected": plan["rejected"],
+            "duplicates": duplicates,
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"[BATCH ERROR] {e}", exc_info=True)
+        return jsonify({"error": "server_error"}), 500
+
+
+@async_click_bp.get("/c/<token>")
+async def click_redirect(token):
+    try:
+        campaign_id, cid, slot_id, redirect_url = parse_click_token(token)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        await record_click(campaign_id, cid, slot_id, event_id("click", token))
+    except Exception as e:
+        # The visitor still reaches the advertiser
+        current_app.logger.error(f"[CLICK REDIRECT ERROR] {e}", exc_info=True)
+
+    if not redirect_url:
+        return jsonify({"error": "no_redirect_url"}), 404
+
+    response = redirect(redirect_url, code=302)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+# ------------------------------------------------------------
+# Application Factory
+# ------------------------------------------------------------
+def create_serving_app():
+    app = Quart(__name__)
+
+    app.config["SECRET_KEY"] = settings.SECRET_KEY
+    app.config["DCORP_API_URL"] = settings.DCORP_API_URL
+
+    app.register_blueprint(async_ads_bp)
+    app.register_blueprint(async_click_bp)
+
+    # Prometheus request histograms + /metrics
+    register_async_metrics(app)
+
+    # One sampled JSON line per request (X-Request-ID)
+    register_async_request_logging(app)
+
+    # CORS (same open policy as CORS(app) in the Flask app)
+    @app.after_request
+    async def add_cors_headers(response):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        return response
+
+    @app.route("/healthz")
+    async def healthz():
+        return {"status": "ok"}, 200
+
+    @app.errorhandler(404)
+    async def not_found(err):
+        return {"error": "Not Found"}, 404
+
+    @app.after_serving
+    async def shutdown():
+        close_async_connections()
+
+    return app
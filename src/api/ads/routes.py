@@ -1,5 +1,9 @@
 from flask import Blueprint, jsonify, current_app, request
-from services.ads.bidding_engine import get_winning_ad
+from services.ads.bidding_engine import get_winning_ad, image_preferences
+from services.ads.edge_cache import is_cacheable, etag_for, not_modified, cache_headers
+from services.ads.frequency_cap import viewer_key
+from services.ads.targeting_engine import request_context
+from utils.client_ip import client_ip
 
 # Mounted at /api/ads in app.py
 ads_slot_api = Blueprint("ads_slot_api", __name__)
@@ -25,18 +29,45 @@ def get_ad_slot(slot_id):
                 "error": "slot_id is required"
             }), 400
 
+        # Viewer identity for frequency capping:
+        # ?viewer_id= / X-Viewer-ID from the child app, else IP + UA
+        viewer = viewer_key(
+            request.args.get("viewer_id") or request.headers.get("X-Viewer-ID"),
+            client_ip(request),
+            request.headers.get("User-Agent"),
+        )
+
+        # Targeting context: ?device=&location=&category=&age=&gender=
+        context = request_context(request.args, request.headers.get("User-Agent"))
+
+        # Image variant: ?webp=1 / Accept: image/webp, ?width=<css px × dpr>
+        image_prefs = image_preferences(request.args, request.headers.get("Accept"))
+
+        # Non-personalized decisions are shared through the nginx cache,
+        # so they must not carry per-serve tracking tokens
+        cacheable = is_cacheable(slot_id, request.args, request.headers)
+
         # Execute bidding engine
-        ad = get_winning_ad(slot_id)
+        ad = get_winning_ad(slot_id, viewer=viewer, context=context, image_prefs=image_prefs, shared=cacheable)
 
         # No ads available for this slot
         if not ad:
-            return jsonify({
+            response = jsonify({
                 "ad": None,
                 "message": "No eligible ads for this slot."
-            }), 200
+            })
+        else:
+            # Successful ad response
+            response = jsonify({"ad": ad})
+
+        etag = etag_for(ad) if cacheable else None
+        response.headers.update(cache_headers(slot_id, ad, cacheable, etag))
+
+        if cacheable and not_modified(request.headers.get("If-None-Match"), etag):
+            response.status_code = 304
+            response.set_data(b"")
 
-        # Successful ad response
-        return jsonify({"ad": ad}), 200
+        return response
 
     except Exception as e:
         # Log full traceback internally
@@ -5,7 +5,8 @@ Slots define:
 - ID (unique key used across DB & frontend)
 - Human-readable name
 - Type (Banner, Square, Inline, etc.)
-- Recommended dimensions (for advertisers)
+- Recommended dimensions (for advertisers), taken from
+  services/ads/ad_slots.py so the form and upload validation agree
 - Optional fields for future expansion (weight, priority, active status)
 
 This file is imported by:
@@ -14,6 +15,14 @@ This file is imported by:
 - Slot validation middleware
 """
 
+from services.ads.ad_slots import get_slot_dimensions
+
+
+def _dimensions(slot_id: str) -> str:
+    """Display form of the size uploads are validated against: "1920×500"."""
+    return get_slot_dimensions(slot_id).replace("x", "×")
+
+
 # Production-safe static dictionary
 # No dynamic mutations should ever happen at runtime.
 AD_SLOTS = {
@@ -21,7 +30,7 @@ AD_SLOTS = {
         "id": "home_banner",
         "name": "Homepage Banner",
         "type": "Banner",
-        "dimensions": "1920×500",
+        "dimensions": _dimensions("home_banner"),
         "active": True
     },
 
@@ -29,7 +38,7 @@ AD_SLOTS = {
         "id": "featured_banner",
         "name": "Featured Banner",
         "type": "Banner",
-        "dimensions": "1600×450",
+        "dimensions": _dimensions("featured_banner"),
         "active": True
     },
 
@@ -37,7 +46,7 @@ AD_SLOTS = {
         "id": "card_small",
         "name": "Small Card Ad",
         "type": "Square",
-        "dimensions": "1000×1000",
+        "dimensions": _dimensions("card_small"),
         "active": True
     },
 
@@ -45,7 +54,7 @@ AD_SLOTS = {
         "id": "product_inline",
         "name": "Inline Product Ad",
         "type": "Square",
-        "dimensions": "1000×1000",
+        "dimensions": _dimensions("product_inline"),
         "active": True
     },
 
@@ -53,7 +62,7 @@ AD_SLOTS = {
         "id": "product_detail_banner",
         "name": "Product Detail Banner",
         "type": "Banner",
-        "dimensions": "1920×450",
+        "dimensions": _dimensions("product_detail_banner"),
         "active": True
     },
 
@@ -61,7 +70,7 @@ AD_SLOTS = {
         "id": "login_page_ad",
         "name": "Login Page Ad",
         "type": "Display",
-        "dimensions": "1080×650",
+        "dimensions": _dimensions("login_page_ad"),
         "active": True
     },
 }
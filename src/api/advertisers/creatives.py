@@ -1,8 +1,9 @@
 # src/api/advertisers/creatives.py
-from flask import Blueprint, request, jsonify, current_app
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify
 from database.connection import get_collection
-import os, uuid, datetime
+from services.ads.creative_pipeline import CreativeError, validate_upload, creative_fields, process_creative_async
+from services.ads.creative_store import store_upload
+import datetime
 from .utils import get_body, safe_oid
 
 creatives_bp = Blueprint(
@@ -16,10 +17,6 @@ ALLOWED_EXT = {"png", "jpg", "jpeg", "webp"}
 def allowed(filename):
     return "." in filename and filename.split(".")[-1].lower() in ALLOWED_EXT
 
-def ensure_folder():
-    folder = os.path.join(current_app.root_path, "src/static/uploads")
-    os.makedirs(folder, exist_ok=True)
-    return folder
 
 @creatives_bp.route("/creative/upload", methods=["POST"])
 def upload_creative():
@@ -36,20 +33,26 @@ def upload_creative():
     if not allowed(file.filename):
         return jsonify({"ok": False, "error": "Invalid image format"}), 400
 
-    folder = ensure_folder()
-    unique = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-    file.save(os.path.join(folder, unique))
+    campaign = get_collection("campaigns").find_one({"_id": campaign_id}, {"slot_id": 1}) or {}
+    slot_id = campaign.get("slot_id")
 
-    image_url = f"/static/uploads/{unique}"
+    try:
+        validate_upload(file, slot_id)
+    except CreativeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    blob = store_upload(file)
+    image = creative_fields(blob, slot_id)
 
     doc = {
         "campaign_id": str(campaign_id),
-        "image_url": image_url,
+        **image,
         "status": "pending",    # admin must approve
         "created_at": datetime.datetime.utcnow(),
         "updated_at": None
     }
 
     get_collection("ad_creatives").insert_one(doc)
+    process_creative_async(blob["_id"], slot_id, str(campaign_id))
 
-    return jsonify({"ok": True, "image_url": image_url})
+    return jsonify({"ok": True, "image_url": image["image_url"]})
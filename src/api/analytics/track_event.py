@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify
 from bson.objectid import ObjectId
 from datetime import datetime
+from utils.client_ip import client_ip
 from ..ads.billing.update_balance import charge_for_event
 
 analytics_bp = Blueprint("analytics", __name__, url_prefix="/api/analytics")
@@ -32,7 +33,7 @@ def track():
         "creative_id": ObjectId(creative_id) if creative_id else None,
         "slot": slot,
         "event": event,
-        "ip": request.remote_addr,
+        "ip": client_ip(request),
         "ua": request.headers.get("User-Agent"),
         "ts": datetime.utcnow()
     }
@@ -3,9 +3,11 @@
 from flask import Blueprint, request, render_template, redirect, url_for, flash, session, current_app
 from database.connection import get_collection
 from bson import ObjectId
-import uuid, os, datetime
-from werkzeug.utils import secure_filename
+import uuid, datetime
 from api.ads.slot_definitions import AD_SLOTS
+from services.ads.creative_pipeline import CreativeError, validate_upload, creative_fields, process_creative_async
+from services.ads.creative_store import store_upload, release
+from services.ads.edge_cache import purge_slots, purge_campaigns
 from config.settings import settings
 from urllib.parse import urlparse
 
@@ -29,16 +31,6 @@ def _valid_mime(file):
     return file.mimetype.lower().startswith("image/")
 
 
-def _ensure_upload_folder():
-    """
-    Production-safe upload folder.
-    Respects UPLOAD_FOLDER from .env
-    """
-    folder = os.path.join(current_app.root_path, settings.UPLOAD_FOLDER)
-    os.makedirs(folder, exist_ok=True)
-    return folder
-
-
 def _safe_oid(val):
     try:
         return ObjectId(val)
@@ -229,13 +221,16 @@ def create_campaign():
         flash("Invalid image format!", "danger")
         return redirect(url_for("campaign.create_campaign_page"))
 
-    # save image
-    folder = _ensure_upload_folder()
-    filename = secure_filename(file.filename)
-    unique = f"{uuid.uuid4().hex}_{filename}"
-    file_path = os.path.join(folder, unique)
-    file.save(file_path)
-    image_url = f"/static/uploads/{unique}"
+    try:
+        validate_upload(file, slot_id)
+    except CreativeError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("campaign.create_campaign_page"))
+
+    # save image (content-addressed: identical uploads share one file)
+    blob = store_upload(file)
+    image = creative_fields(blob, slot_id)
+    image_url = image["image_url"]
 
     campaign_doc = {
         "user_id": user_id,
@@ -265,7 +260,7 @@ def create_campaign():
     creatives_col.insert_one({
         "campaign_id": campaign_id,
         "slot_id": slot_id,
-        "image_url": image_url,
+        **image,
         "redirect_url": redirect_url,
         "headline": headline,
         "status": "pending",
@@ -273,6 +268,9 @@ def create_campaign():
         "updated_at": datetime.datetime.utcnow()
     })
 
+    # WebP + fallback variants are generated off the request thread
+    process_creative_async(blob["_id"], slot_id, campaign_id)
+
     # deduct budget
     tx_col.insert_one({
         "user_id": user_id,
@@ -318,8 +316,15 @@ def delete_campaign(cid):
                 "created_at": datetime.datetime.utcnow()
             })
 
+    # Each creative holds one reference on its stored image
+    for creative in creatives_col.find({"campaign_id": str(cid)}, {"content_hash": 1}):
+        release(creative.get("content_hash"))
+
     campaigns_col.delete_one({"_id": _safe_oid(cid)})
-    creatives_col.delete_one({"campaign_id": str(cid)})
+    creatives_col.delete_many({"campaign_id": str(cid)})
+
+    if camp:
+        purge_slots([camp.get("slot_id")])
 
     flash("Campaign deletedSuccessfully.", "success")
     return redirect(url_for("campaign.campaigns_list"))
@@ -410,6 +415,17 @@ def edit_campaign_submit(cid):
 
     can_edit_core = (campaign_status == "pending")
 
+    # Validate a replacement image before anything is written
+    file = request.files.get("ad_image")
+    creative_slot = (slot_id if can_edit_core and slot_id else None) or campaign.get("slot_id")
+
+    if file and file.filename and _allowed(file.filename) and _valid_mime(file):
+        try:
+            validate_upload(file, creative_slot)
+        except CreativeError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("campaign.edit_campaign_page", cid=cid))
+
     update_data = {
         "headline": headline,
         "description": description,
@@ -463,21 +479,16 @@ def edit_campaign_submit(cid):
     # CREATIVE UPDATE
     # --------------------------------------
     creative = creatives_col.find_one({"campaign_id": str(cid)})
-    file = request.files.get("ad_image")
 
     if file and file.filename and _allowed(file.filename) and _valid_mime(file):
-        folder = _ensure_upload_folder()
-        filename = secure_filename(file.filename)
-        unique = f"{uuid.uuid4().hex}_{filename}"
-        file_path = os.path.join(folder, unique)
-        file.save(file_path)
-        image_url = f"/static/uploads/{unique}"
+        blob = store_upload(file)
+        image = creative_fields(blob, creative_slot)
 
         if creative:
             creatives_col.update_one(
                 {"campaign_id": str(cid)},
                 {"$set": {
-                    "image_url": image_url,
+                    **image,
                     "redirect_url": redirect_url,
                     "headline": headline,
                     "status": "pending",
@@ -490,7 +501,7 @@ def edit_campaign_submit(cid):
             creatives_col.insert_one({
                 "campaign_id": str(cid),
                 "slot_id": camp_doc.get("slot_id") if camp_doc else None,
-                "image_url": image_url,
+                **image,
                 "redirect_url": redirect_url,
                 "headline": headline,
                 "status": "pending",
@@ -498,6 +509,12 @@ def edit_campaign_submit(cid):
                 "updated_at": datetime.datetime.utcnow()
             })
 
+        # The replaced image loses this creative's reference
+        if creative:
+            release(creative.get("content_hash"))
+
+        process_creative_async(blob["_id"], creative_slot, str(cid))
+
     else:
         if creative:
             creatives_col.update_one(
@@ -522,5 +539,8 @@ def edit_campaign_submit(cid):
                     "updated_at": datetime.datetime.utcnow()
                 })
 
+    # Bid, budget, schedule or creative may have changed the slot's auction
+    purge_campaigns([cid])
+
     flash("Campaign updated successfully.", "success")
     return redirect(url_for("campaign.campaigns_list"))
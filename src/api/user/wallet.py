@@ -6,6 +6,7 @@ from flask import (
 )
 from database.connection import get_collection
 from bson import ObjectId
+from services.ads.budget_sweeper import sweep_exhausted_campaigns
 import datetime
 import uuid
 
@@ -87,17 +88,10 @@ def calculate_balance(user_id):
 # Auto-pause campaigns when THEIR budget <= 0
 # ----------------------------------------------------
 def enforce_campaign_budget_limits(user_id):
-    campaigns = get_collection("campaigns")
-
+    # Same rule as the background budget sweeper, scoped to this user,
+    # but paused (not ended) so a top-up can resume them
     try:
-        campaigns.update_many(
-            {
-                "user_id": user_id,
-                "budget": {"$lte": 0},
-                "status": {"$in": ["approved", "running"]},
-            },
-            {"$set": {"status": "paused"}},
-        )
+        sweep_exhausted_campaigns(user_id=user_id, status="paused")
     except Exception as e:
         current_app.logger.error(f"[WALLET] Budget enforcement failed: {e}")
 
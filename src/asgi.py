@@ -0,0 +1,16 @@
+"""
+ASGI Entrypoint for the Ad Serving App
+
+Runs next to the Flask admin app (src/wsgi.py) and only serves the
+ad delivery + tracking endpoints:
+    uvicorn src.asgi:app --host 127.0.0.1 --port 8001
+
+This file must expose the ASGI `app` object created by create_serving_app().
+"""
+
+import app as _bootstrap  # noqa: F401 — loads .env and puts src/ on sys.path
+
+from api.ads.async_serving import create_serving_app
+
+# Create application
+app = create_serving_app()
@@ -12,6 +12,29 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _mongo_profile(name: str, **defaults) -> dict:
+    """
+    Builds one MongoDB client profile.
+    Every value can be overridden with MONGO_<NAME>_<OPTION>, e.g.
+    MONGO_ANALYTICS_MAX_POOL_SIZE=5 or MONGO_TRACKING_WRITE_CONCERN=1.
+    """
+    prefix = f"MONGO_{name.upper()}_"
+
+    def env(key, default):
+        return os.getenv(prefix + key, default)
+
+    return {
+        "max_pool_size": int(env("MAX_POOL_SIZE", defaults["max_pool_size"])),
+        "min_pool_size": int(env("MIN_POOL_SIZE", defaults["min_pool_size"])),
+        "connect_timeout_ms": int(env("CONNECT_TIMEOUT_MS", defaults["connect_timeout_ms"])),
+        "socket_timeout_ms": int(env("SOCKET_TIMEOUT_MS", defaults["socket_timeout_ms"])),
+        "server_selection_timeout_ms": int(env("SERVER_SELECTION_TIMEOUT_MS", defaults["server_selection_timeout_ms"])),
+        "read_preference": env("READ_PREFERENCE", defaults["read_preference"]),
+        "write_concern": env("WRITE_CONCERN", defaults["write_concern"]),
+        "compressors": env("COMPRESSORS", defaults["compressors"]),
+    }
+
+
 class Settings:
     # ---------------------------------------------------------------
     # 0. DEBUG MODE
@@ -46,6 +69,10 @@ class Settings:
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "src/static/uploads")
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+    # Content-addressed creatives (served as /static/creatives/…, immutable)
+    CREATIVE_STORE_FOLDER = os.getenv("CREATIVE_STORE_FOLDER", "src/static/creatives")
+    os.makedirs(CREATIVE_STORE_FOLDER, exist_ok=True)
+
 
     # ---------------------------------------------------------------
     # 4. MONGO DB CONNECTION
@@ -93,4 +120,220 @@ class Settings:
     JWT_REFRESH_EXPIRE_MINUTES = int(os.getenv("JWT_REFRESH_EXPIRE_MINUTES", 43200))  # 30 days
 
 
+    # ---------------------------------------------------------------
+    # 7. MONGO CLIENT PROFILES (one connection pool per workload)
+    # ---------------------------------------------------------------
+    # serving   → ad decisions: small pool of short, latency-critical reads
+    # tracking  → raw impression/click writes: w=1, no majority round-trip
+    # analytics → admin reports & aggregations: long timeouts, secondaries
+    # default   → everything else (dashboards, CRUD, auth)
+    MONGO_CLIENT_PROFILES = {
+        "default": _mongo_profile(
+            "default",
+            max_pool_size=20, min_pool_size=2,
+            connect_timeout_ms=5000, socket_timeout_ms=10000,
+            server_selection_timeout_ms=5000,
+            read_preference="primary", write_concern="majority",
+            compressors="",
+        ),
+        "serving": _mongo_profile(
+            "serving",
+            max_pool_size=50, min_pool_size=5,
+            connect_timeout_ms=2000, socket_timeout_ms=2000,
+            server_selection_timeout_ms=2000,
+            read_preference="primaryPreferred", write_concern="majority",
+            compressors="",
+        ),
+        "tracking": _mongo_profile(
+            "tracking",
+            max_pool_size=30, min_pool_size=2,
+            connect_timeout_ms=2000, socket_timeout_ms=3000,
+            server_selection_timeout_ms=2000,
+            read_preference="primary", write_concern="1",
+            compressors="",
+        ),
+        "analytics": _mongo_profile(
+            "analytics",
+            max_pool_size=10, min_pool_size=0,
+            connect_timeout_ms=5000, socket_timeout_ms=60000,
+            server_selection_timeout_ms=5000,
+            read_preference="secondaryPreferred", write_concern="majority",
+            compressors="zlib",
+        ),
+    }
+
+
+    # ---------------------------------------------------------------
+    # 8. QUERY PROFILING (per-request MongoDB budgets)
+    # ---------------------------------------------------------------
+    # Off by default: encoding every command costs CPU on the hot path
+    QUERY_PROFILER_ENABLED = os.getenv("QUERY_PROFILER_ENABLED", "false").strip().lower() == "true"
+    # Share of requests profiled; debug / admin requests always are
+    QUERY_PROFILER_SAMPLE_RATE = float(os.getenv("QUERY_PROFILER_SAMPLE_RATE", 0.01))
+
+    # Requests over ANY budget are logged with their command shapes
+    QUERY_BUDGET_COMMANDS = int(os.getenv("QUERY_BUDGET_COMMANDS", 20))
+    QUERY_BUDGET_DB_MS = float(os.getenv("QUERY_BUDGET_DB_MS", 150))
+    QUERY_BUDGET_REQUEST_MS = float(os.getenv("QUERY_BUDGET_REQUEST_MS", 500))
+
+
+    # ---------------------------------------------------------------
+    # 9. LOGGING (async JSON lines, sampling)
+    # ---------------------------------------------------------------
+    # Files are shared by every worker; rotation is logrotate's job
+    # (deployment/logrotate.conf), never the app's
+    LOG_DIR = os.getenv("LOG_DIR", os.path.join(os.getcwd(), "logs"))
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+
+    # Request-log sampling per path prefix, e.g. "/api/ads/track=0.01,/api/ads/slot=0.05"
+    # Errors (>= 500) and requests slower than LOG_SLOW_REQUEST_MS are always logged.
+    LOG_SAMPLE_RATES = {
+        prefix.strip(): float(rate)
+        for prefix, rate in (
+            pair.split("=", 1)
+            for pair in os.getenv("LOG_SAMPLE_RATES", "/api/ads/track=0.01,/api/ads/slot=0.05").split(",")
+            if "=" in pair
+        )
+    }
+    LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", 1000))
+
+
+    # ---------------------------------------------------------------
+    # 10. FREQUENCY CAPPING (per viewer, per campaign)
+    # ---------------------------------------------------------------
+    # 0 disables capping; campaigns may override with "frequency_cap"
+    FREQ_CAP_IMPRESSIONS = int(os.getenv("FREQ_CAP_IMPRESSIONS", 3))
+    FREQ_CAP_WINDOW_SECONDS = int(os.getenv("FREQ_CAP_WINDOW_SECONDS", 3600))
+    FREQ_CAP_MAX_KEYS = int(os.getenv("FREQ_CAP_MAX_KEYS", 500000))
+
+
+    # ---------------------------------------------------------------
+    # 11. SERVING CACHE (per-slot auction snapshots + targeting index)
+    # ---------------------------------------------------------------
+    # Max age of a slot snapshot before it is reloaded from MongoDB
+    SERVING_CACHE_TTL_SECONDS = float(os.getenv("SERVING_CACHE_TTL_SECONDS", 10))
+
+
+    # ---------------------------------------------------------------
+    # 12. USER-AGENT CLASSIFICATION
+    # ---------------------------------------------------------------
+    # Distinct UA strings kept in the per-process LRU
+    UA_CACHE_SIZE = int(os.getenv("UA_CACHE_SIZE", 4096))
+
+
+    # ---------------------------------------------------------------
+    # 13. BUDGET PACING (daily_budget spread over the day)
+    # ---------------------------------------------------------------
+    PACING_ENABLED = os.getenv("PACING_ENABLED", "true").strip().lower() == "true"
+    PACING_INTERVAL_SECONDS = float(os.getenv("PACING_INTERVAL_SECONDS", 60))
+
+    # Serve probability bounds and max growth per interval
+    PACING_MIN_THROTTLE = float(os.getenv("PACING_MIN_THROTTLE", 0.02))
+    PACING_MAX_STEP = float(os.getenv("PACING_MAX_STEP", 1.5))
+
+
+    # ---------------------------------------------------------------
+    # 14. CAMPAIGN SCHEDULE (start_date / end_date)
+    # ---------------------------------------------------------------
+    # How often ended campaigns are bulk-marked "ended" in MongoDB
+    SCHEDULE_SWEEP_INTERVAL_SECONDS = float(os.getenv("SCHEDULE_SWEEP_INTERVAL_SECONDS", 300))
+
+
+    # ---------------------------------------------------------------
+    # 15. BUDGET SWEEPER (exhausted campaigns leave the auction)
+    # ---------------------------------------------------------------
+    BUDGET_SWEEP_INTERVAL_SECONDS = float(os.getenv("BUDGET_SWEEP_INTERVAL_SECONDS", 5))
+
+
+    # ---------------------------------------------------------------
+    # 16. RANKING (bid | ecpm | epsilon | thompson)
+    # ---------------------------------------------------------------
+    # "bid" is the historical behaviour; opt into ecpm after a replay
+    # (benchmarks/replay.py) has measured the effect
+    RANKING_MODE = os.getenv("RANKING_MODE", "bid").strip().lower()
+    RANKING_EPSILON = float(os.getenv("RANKING_EPSILON", 0.05))
+
+    # Beta prior for CTR: mean and weight in pseudo-impressions
+    CTR_PRIOR_MEAN = float(os.getenv("CTR_PRIOR_MEAN", 0.01))
+    CTR_PRIOR_STRENGTH = float(os.getenv("CTR_PRIOR_STRENGTH", 200))
+    CTR_REFRESH_SECONDS = float(os.getenv("CTR_REFRESH_SECONDS", 60))
+
+    if RANKING_MODE not in ("bid", "ecpm", "epsilon", "thompson"):
+        raise ValueError("❌ Invalid RANKING_MODE (bid | ecpm | epsilon | thompson)")
+
+
+    # ---------------------------------------------------------------
+    # 17. CREATIVE IMAGE PIPELINE (variants per slot size)
+    # ---------------------------------------------------------------
+    # Variant scales relative to the slot dimensions, e.g. "1,0.5"
+    CREATIVE_SCALES = [
+        float(scale) for scale in os.getenv("CREATIVE_SCALES", "1,0.5").split(",") if scale.strip()
+    ]
+    CREATIVE_ASPECT_TOLERANCE = float(os.getenv("CREATIVE_ASPECT_TOLERANCE", 0.05))
+    CREATIVE_WEBP_QUALITY = int(os.getenv("CREATIVE_WEBP_QUALITY", 80))
+    CREATIVE_JPEG_QUALITY = int(os.getenv("CREATIVE_JPEG_QUALITY", 85))
+    CREATIVE_WORKERS = int(os.getenv("CREATIVE_WORKERS", 2))
+
+
+    # ---------------------------------------------------------------
+    # 18. EDGE CACHE (nginx proxy_cache in front of /api/ads/slot/)
+    # ---------------------------------------------------------------
+    # Shared-cache lifetime of non-personalized decisions; 0 disables
+    EDGE_CACHE_TTL_SECONDS = int(os.getenv("EDGE_CACHE_TTL_SECONDS", 5))
+    # PURGE target, slot id appended, e.g. http://127.0.0.1/purge/ads/slot/
+    # Needs ngx_cache_purge (deployment/nginx.conf); unset → no purging:
+    # approvals / pauses / status changes reach the edge only after the TTL
+    EDGE_PURGE_URL = os.getenv("EDGE_PURGE_URL", "")
+    EDGE_PURGE_TIMEOUT_SECONDS = float(os.getenv("EDGE_PURGE_TIMEOUT_SECONDS", 2))
+
+
+    # ---------------------------------------------------------------
+    # 19. TRACKING BEACONS (signed pixel / sendBeacon / click URLs)
+    # ---------------------------------------------------------------
+    # Signed with SECRET_KEY; older tokens are ignored
+    TRACKING_TOKEN_MAX_AGE_SECONDS = int(os.getenv("TRACKING_TOKEN_MAX_AGE_SECONDS", 86400))
+
+
+    # ---------------------------------------------------------------
+    # 20. TRACKING BATCH UPLOADS (POST /api/ads/track/batch)
+    # ---------------------------------------------------------------
+    TRACKING_BATCH_MAX_EVENTS = int(os.getenv("TRACKING_BATCH_MAX_EVENTS", 1000))
+    # Limit on the decompressed body (gzip bombs are cut off here)
+    TRACKING_BATCH_MAX_BYTES = int(os.getenv("TRACKING_BATCH_MAX_BYTES", 1048576))
+
+
+    # ---------------------------------------------------------------
+    # 21. EVENT FILTER (duplicate events + click rate per IP)
+    # ---------------------------------------------------------------
+    # Suspicious events are logged with a "suspicious" reason, never billed
+    EVENT_FILTER_ENABLED = os.getenv("EVENT_FILTER_ENABLED", "true").strip().lower() == "true"
+    # Same (ip, ua, campaign) event within this window is a duplicate
+    EVENT_DEDUP_WINDOW_SECONDS = float(os.getenv("EVENT_DEDUP_WINDOW_SECONDS", 30))
+    EVENT_DEDUP_MAX_KEYS = int(os.getenv("EVENT_DEDUP_MAX_KEYS", 1000000))
+    # Token bucket per IP for clicks: sustained rate + burst
+    CLICK_RATE_PER_SECOND = float(os.getenv("CLICK_RATE_PER_SECOND", 0.2))
+    CLICK_RATE_BURST = float(os.getenv("CLICK_RATE_BURST", 5))
+
+
+    # ---------------------------------------------------------------
+    # 22. CONVERSION ATTRIBUTION (scripts/run_attribution.py)
+    # ---------------------------------------------------------------
+    # Last click by the same viewer within this window gets the conversion
+    ATTRIBUTION_LOOKBACK_SECONDS = int(os.getenv("ATTRIBUTION_LOOKBACK_SECONDS", 7 * 24 * 3600))
+    ATTRIBUTION_INTERVAL_SECONDS = float(os.getenv("ATTRIBUTION_INTERVAL_SECONDS", 60))
+    # Conversions wait this long so batch-uploaded clicks can land first
+    ATTRIBUTION_DELAY_SECONDS = int(os.getenv("ATTRIBUTION_DELAY_SECONDS", 120))
+    ATTRIBUTION_BATCH_SIZE = int(os.getenv("ATTRIBUTION_BATCH_SIZE", 5000))
+    # Bounds the in-memory click index per viewer
+    ATTRIBUTION_MAX_CLICKS_PER_VIEWER = int(os.getenv("ATTRIBUTION_MAX_CLICKS_PER_VIEWER", 20))
+
+
+    # ---------------------------------------------------------------
+    # 23. REVERSE PROXY (client IP behind nginx, utils/client_ip.py)
+    # ---------------------------------------------------------------
+    # Proxies in front of gunicorn whose X-Forwarded-* headers are trusted
+    # (1 = nginx only); the serving app trusts 127.0.0.1 via uvicorn flags
+    PROXY_FIX_HOPS = int(os.getenv("PROXY_FIX_HOPS", 1))
+
+
 settings = Settings()
@@ -11,6 +11,7 @@ Handles:
 from datetime import datetime
 from bson import ObjectId
 from database.connection import get_collection
+from services.ads.creative_store import release
 
 
 # -----------------------------------------------------
@@ -127,5 +128,10 @@ def delete_creative(creative_id: str) -> bool:
     if not oid:
         return False
 
-    res = CREATIVE_COL().delete_one({"_id": oid})
-    return res.deleted_count > 0
+    # The creative holds one reference on its stored image
+    doc = CREATIVE_COL().find_one_and_delete({"_id": oid}, {"content_hash": 1})
+    if not doc:
+        return False
+
+    release(doc.get("content_hash"))
+    return True
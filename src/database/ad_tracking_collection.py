@@ -11,6 +11,7 @@ Handles:
 
 from database.connection import get_collection
 from datetime import datetime
+from utils.user_agent import ua_fields
 
 
 # -----------------------------------------------------
@@ -36,7 +37,9 @@ def serialize_event(doc):
 
         # Metadata
         "ip": doc.get("ip"),
-        "ua": doc.get("ua"),             # User-Agent for device/OS analysis
+        "device": doc.get("device"),     # utils.user_agent.DeviceClass
+        "os": doc.get("os"),             # utils.user_agent.OSFamily
+        "browser": doc.get("browser"),   # utils.user_agent.BrowserFamily
 
         # Timestamp
         "timestamp": doc.get("timestamp"),
@@ -68,7 +71,7 @@ def log_event(event_type: str, campaign_id: str, slot_id=None, ad_id=None, ip=No
         "slot_id": slot_id,
         "ad_id": ad_id,
         "ip": ip,
-        "ua": ua,
+        **ua_fields(ua),
     }
 
     return serialize_event(_insert(doc))
@@ -14,6 +14,10 @@ from database.connection import get_collection
 from pymongo import ASCENDING, DESCENDING, HASHED
 
 
+# Events without an id (older clients) are not deduplicated
+EVENT_ID_PRESENT = {"event_id": {"$exists": True}}
+
+
 def create_indexes():
     print("\n🛠 Creating MongoDB Indexes for Ads System…\n")
 
@@ -70,9 +74,16 @@ def create_indexes():
     # IP analytics (optional, hashed is efficient)
     imps.create_index([("ip", HASHED)], name="imp_ip_lookup")
 
+    # Per-device / OS reporting (UA codes, see utils/user_agent.py)
+    imps.create_index([("campaign_id", ASCENDING), ("device", ASCENDING), ("timestamp", DESCENDING)], name="imp_campaign_device_time")
+    imps.create_index([("os", ASCENDING), ("browser", ASCENDING)], name="imp_os_browser")
+
     # Time-based queries
     imps.create_index([("timestamp", DESCENDING)], name="imp_time_desc")
 
+    # Idempotent tracking: a retried event id is rejected (DuplicateKeyError)
+    imps.create_index([("event_id", ASCENDING)], unique=True, name="imp_event_id_unique", partialFilterExpression=EVENT_ID_PRESENT)
+
 
     # ---------------------------------------------------------
     # 5. CLICKS LOG
@@ -83,11 +94,30 @@ def create_indexes():
     clicks.create_index([("slot_id", ASCENDING), ("timestamp", DESCENDING)], name="click_slot_time")
 
     clicks.create_index([("ip", HASHED)], name="click_ip_lookup")
+    clicks.create_index([("campaign_id", ASCENDING), ("device", ASCENDING), ("timestamp", DESCENDING)], name="click_campaign_device_time")
+    clicks.create_index([("os", ASCENDING), ("browser", ASCENDING)], name="click_os_browser")
     clicks.create_index([("timestamp", DESCENDING)], name="click_time_desc")
+    clicks.create_index([("event_id", ASCENDING)], unique=True, name="click_event_id_unique", partialFilterExpression=EVENT_ID_PRESENT)
+
+
+    # ---------------------------------------------------------
+    # 6. CONVERSIONS LOG
+    # ---------------------------------------------------------
+    conversions = get_collection("ads_conversions")
+
+    conversions.create_index([("campaign_id", ASCENDING), ("timestamp", DESCENDING)], name="conv_campaign_time")
+    conversions.create_index([("event_id", ASCENDING)], unique=True, name="conv_event_id_unique", partialFilterExpression=EVENT_ID_PRESENT)
+
+    # Attribution job: pending conversions, oldest first
+    conversions.create_index(
+        [("attribution", ASCENDING), ("received_at", ASCENDING)],
+        name="conv_pending_received",
+        partialFilterExpression={"attribution": "pending"},
+    )
 
 
     # ---------------------------------------------------------
-    # 6. AD TRACKING (optional merged tracking collection)
+    # 7. AD TRACKING (optional merged tracking collection)
     # ---------------------------------------------------------
     tracking = get_collection("ad_tracking")
 
@@ -95,5 +125,6 @@ def create_indexes():
     tracking.create_index([("campaign_id", ASCENDING)], name="track_campaign_lookup")
     tracking.create_index([("slot_id", ASCENDING)], name="track_slot_lookup")
     tracking.create_index([("timestamp", DESCENDING)], name="track_time_desc")
+    tracking.create_index([("event", ASCENDING), ("device", ASCENDING)], name="track_event_device")
 
     print("\n✅ MongoDB Ads Indexes Created Successfully!\n")
@@ -0,0 +1,62 @@
+"""
+Async MongoDB Connection Handler (motor)
+----------------------------------------
+
+asyncio counterpart of database/connection.py for the ASGI serving app.
+
+• Same client profiles & options as the sync handler (settings.py)
+• One AsyncIOMotorClient per profile, created lazily per process
+• Provides get_async_db() and get_async_collection() helpers
+"""
+
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.settings import settings
+from database.connection import DEFAULT_PROFILE, client_options
+
+_clients = {}
+_databases = {}
+_owner_pid = None
+
+
+def reset_async_connections():
+    """Drops every motor client handle owned by this process."""
+    global _owner_pid
+
+    _clients.clear()
+    _databases.clear()
+    _owner_pid = os.getpid()
+
+
+def close_async_connections():
+    """Closes this process's motor clients (app shutdown)."""
+    if _owner_pid == os.getpid():
+        for client in _clients.values():
+            client.close()
+
+    reset_async_connections()
+
+
+def get_async_db(profile: str = DEFAULT_PROFILE):
+    """
+    Returns the motor database handle for a client profile.
+    Must be called from inside the running event loop.
+    """
+
+    if _owner_pid != os.getpid():
+        reset_async_connections()
+
+    if profile not in _databases:
+        client = AsyncIOMotorClient(settings.MONGO_URI, **client_options(profile))
+        _clients[profile] = client
+        _databases[profile] = client[settings.MONGO_DB]
+
+    return _databases[profile]
+
+
+def get_async_collection(name: str, profile: str = DEFAULT_PROFILE):
+    """
+    Returns a motor collection bound to the given client profile.
+    """
+    return get_async_db(profile)[name]
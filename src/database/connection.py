@@ -2,62 +2,221 @@
 MongoDB Connection Handler for DCorp Backend
 --------------------------------------------
 
-• Creates a single global MongoClient (recommended by MongoDB)
+• Creates one MongoClient per workload profile (recommended by MongoDB)
 • Pulls all credentials from settings.py (which loads .env)
 • Enables connection pooling & safe timeouts
 • Provides get_db() and get_collection() helpers
+• Fork-safe: clients are created lazily, per process (gunicorn workers)
+
+Profiles (configured in settings.MONGO_CLIENT_PROFILES):
+    default   → admin/user CRUD
+    serving   → ad delivery (bidding engine)
+    tracking  → impression/click event writes
+    analytics → reporting queries & aggregations
+
+Each profile owns its connection pool, so a slow admin aggregation can
+never hold the sockets the ad-serving path needs.
+
+Nothing here touches the network at import time. MongoClient connects in
+the background on first use, and handles created before a fork (gunicorn
+master with preload_app) are discarded in the child, so workers never
+share sockets. Use check_ready() for readiness probes.
 """
 
+import os
+
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ConfigurationError
+from pymongo.errors import ConfigurationError, PyMongoError
 from config.settings import settings
 
-_client = None
-_database = None
+DEFAULT_PROFILE = "default"
+
+_clients = {}
+_databases = {}
+_owner_pid = None
+
+# Callables profile -> pymongo listener, attached to every new client
+_listener_factories = []
+
+
+# -----------------------------------------------------
+# Profile → MongoClient options
+# -----------------------------------------------------
+def client_options(profile: str) -> dict:
+    """
+    Translates a settings profile into MongoClient keyword options.
+    Keyword options take precedence over the options in MONGO_URI.
+    """
+    cfg = settings.MONGO_CLIENT_PROFILES.get(profile)
+    if cfg is None:
+        raise ValueError(f"Unknown MongoDB client profile: {profile}")
+
+    write_concern = str(cfg["write_concern"])
+
+    options = {
+        "maxPoolSize": cfg["max_pool_size"],
+        "minPoolSize": cfg["min_pool_size"],
+        "serverSelectionTimeoutMS": cfg["server_selection_timeout_ms"],
+        "connectTimeoutMS": cfg["connect_timeout_ms"],
+        "socketTimeoutMS": cfg["socket_timeout_ms"],
+        "readPreference": cfg["read_preference"],
+        "w": int(write_concern) if write_concern.isdigit() else write_concern,
+        "retryWrites": True,
+        "retryReads": True,
+        "appname": f"dcorp-{profile}",
+    }
+
+    if cfg["compressors"]:
+        options["compressors"] = cfg["compressors"]
+
+    if _listener_factories:
+        options["event_listeners"] = [factory(profile) for factory in _listener_factories]
+
+    return options
 
 
-def get_db():
+def add_client_listener_factory(factory):
     """
-    Returns a singleton MongoDB database connection.
-    Automatically initializes on first call.
+    Registers factory(profile) -> pymongo event listener for every client
+    created afterwards (e.g. per-profile pool metrics). Clients are lazy,
+    so registering during app start-up covers all of them.
     """
+    if factory not in _listener_factories:
+        _listener_factories.append(factory)
 
-    global _client, _database
 
-    if _client is not None:
-        return _database
+# -----------------------------------------------------
+# Per-process lifecycle
+# -----------------------------------------------------
+def reset_connections():
+    """
+    Drops every client handle owned by this process.
+    Called from the gunicorn post_fork hook; get_db() also calls it
+    automatically when it detects it is running in a forked child.
+
+    Inherited clients are only dereferenced, never closed: closing them
+    in the child would tear down sockets the parent still owns.
+    """
+    global _owner_pid
+
+    _clients.clear()
+    _databases.clear()
+    _owner_pid = os.getpid()
+
+
+def close_connections():
+    """
+    Closes this process's clients (worker shutdown / scripts).
+    """
+    if _owner_pid == os.getpid():
+        for client in _clients.values():
+            client.close()
+
+    reset_connections()
+
+
+def use_client(client, database: str = None):
+    """
+    Routes every profile through one externally created client.
+    For benchmarks and one-off tooling (mongomock, a local mongod with
+    command listeners attached) — never used by the app itself.
+    """
+    reset_connections()
+
+    db = client[database or settings.MONGO_DB]
+    for profile in settings.MONGO_CLIENT_PROFILES:
+        _clients[profile] = client
+        _databases[profile] = db
+
+    return db
+
+
+def get_db(profile: str = DEFAULT_PROFILE):
+    """
+    Returns the MongoDB database handle for a client profile.
+    Lazily initializes the profile's client on first call in each process.
+    """
+
+    if _owner_pid != os.getpid():
+        reset_connections()
+
+    if profile in _databases:
+        return _databases[profile]
 
     try:
-        # Create MongoDB client with proper production defaults
-        _client = MongoClient(
-            settings.MONGO_URI,
-            maxPoolSize=20,             # avoid connection explosion
-            minPoolSize=2,              # keep warm connections
-            serverSelectionTimeoutMS=5000,  # fail fast if unreachable
-            connectTimeoutMS=5000,
-            socketTimeoutMS=10000,
-            retryWrites=True,
-            retryReads=True,
-        )
-
-        _database = _client[settings.MONGO_DB]
-
-        # Force connection check
-        _client.admin.command("ping")
-        print(f"✅ MongoDB Connected: {settings.MONGO_DB}")
-
-    except (ConnectionFailure, ConfigurationError) as e:
-        print("\n❌ MongoDB Connection Failed")
+        # No ping here: MongoClient connects in the background, and the
+        # first real operation fails fast via serverSelectionTimeoutMS.
+        client = MongoClient(settings.MONGO_URI, **client_options(profile))
+
+    except ConfigurationError as e:
+        print("\n❌ MongoDB Configuration Invalid")
         print(f"Error: {e}\n")
         raise RuntimeError("Unable to connect to MongoDB") from e
 
-    return _database
+    _clients[profile] = client
+    _databases[profile] = client[settings.MONGO_DB]
+
+    return _databases[profile]
 
 
-def get_collection(name: str):
+def get_collection(name: str, profile: str = DEFAULT_PROFILE):
     """
-    Returns a MongoDB collection from the active database.
+    Returns a MongoDB collection from the active database,
+    bound to the given client profile.
     """
 
-    db = get_db()
+    db = get_db(profile)
     return db[name]
+
+
+# -----------------------------------------------------
+# Lazy collection handle (safe as a module-level global)
+# -----------------------------------------------------
+class LazyCollection:
+    """
+    Stands in for a pymongo Collection and resolves it on every
+    attribute access, so model modules can keep module-level handles
+    without opening a client at import time (i.e. before the fork).
+    """
+
+    def __init__(self, name: str, profile: str = DEFAULT_PROFILE):
+        self._name = name
+        self._profile = profile
+
+    def __getattr__(self, attr):
+        return getattr(get_collection(self._name, self._profile), attr)
+
+    def __getitem__(self, key):
+        return get_collection(self._name, self._profile)[key]
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r}, profile={self._profile!r})"
+
+
+def lazy_collection(name: str, profile: str = DEFAULT_PROFILE) -> LazyCollection:
+    """
+    Returns a collection handle that connects on first use.
+    """
+    return LazyCollection(name, profile)
+
+
+# -----------------------------------------------------
+# Readiness check
+# -----------------------------------------------------
+def check_ready(profiles=(DEFAULT_PROFILE,)) -> dict:
+    """
+    Pings MongoDB through each profile's client.
+
+    Returns:
+        {"default": True, "serving": False, ...}
+    """
+    status = {}
+
+    for profile in profiles:
+        try:
+            get_db(profile).client.admin.command("ping")
+            status[profile] = True
+        except (PyMongoError, RuntimeError):
+            status[profile] = False
+
+    return status
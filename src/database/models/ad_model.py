@@ -10,10 +10,10 @@ Collection name: ad_creatives
 
 from bson import ObjectId
 from datetime import datetime
-from database.connection import get_collection
+from database.connection import lazy_collection
 
 # Use the correct collection name from your system
-ads_col = get_collection("ad_creatives")
+ads_col = lazy_collection("ad_creatives")
 
 
 # ----------------------------------------------------------------------
@@ -10,9 +10,9 @@ Handles:
 
 from bson import ObjectId
 from datetime import datetime
-from database.connection import get_collection
+from database.connection import lazy_collection
 
-advertisers_col = get_collection("advertisers")
+advertisers_col = lazy_collection("advertisers")
 
 
 # -------------------------------------------------------------------
@@ -11,11 +11,11 @@ Tracks:
 Collection: analytics
 """
 
-from database.connection import get_collection
+from database.connection import lazy_collection
 from datetime import datetime
 from bson import ObjectId
 
-analytics_col = get_collection("analytics")
+analytics_col = lazy_collection("analytics", profile="analytics")
 
 VALID_EVENTS = {"impression", "click", "conversion"}
 
@@ -10,9 +10,11 @@ Handles:
 
 from bson import ObjectId
 from datetime import datetime
-from database.connection import get_collection
+from database.connection import lazy_collection
+from services.ads.creative_store import release
 
-campaigns_col = get_collection("campaigns")
+campaigns_col = lazy_collection("campaigns")
+creatives_col = lazy_collection("ad_creatives")
 
 
 # -------------------------------------------------------------------
@@ -182,7 +184,15 @@ def delete_campaign(campaign_id: str):
         return False
 
     result = campaigns_col.delete_one({"_id": oid})
-    return result.deleted_count > 0
+    if not result.deleted_count:
+        return False
+
+    # Each creative holds one reference on its stored image
+    for creative in creatives_col.find({"campaign_id": str(campaign_id)}, {"content_hash": 1}):
+        release(creative.get("content_hash"))
+    creatives_col.delete_many({"campaign_id": str(campaign_id)})
+
+    return True
 
 
 # -------------------------------------------------------------------
@@ -7,9 +7,9 @@ Timeless Threads (TT), VaultPass (VP), etc.
 
 from bson import ObjectId
 from datetime import datetime
-from database.connection import get_collection
+from database.connection import lazy_collection
 
-products_col = get_collection("products")
+products_col = lazy_collection("products")
 
 
 # -----------------------------------------------------
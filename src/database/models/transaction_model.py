@@ -9,13 +9,13 @@ Handles:
 
 from datetime import datetime
 from bson import ObjectId
-from database.connection import get_collection
+from database.connection import lazy_collection
 from config.constants import (
     TRANSACTION_TYPE_CREDIT,
     TRANSACTION_TYPE_DEBIT,
 )
 
-transactions_col = get_collection("transactions")
+transactions_col = lazy_collection("transactions")
 
 
 # -----------------------------------------------------
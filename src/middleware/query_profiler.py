@@ -0,0 +1,185 @@
+"""
+Per-Request MongoDB Query Profiler
+----------------------------------
+
+A pymongo CommandListener that attributes every MongoDB command to the
+Flask request that issued it, then:
+
+    • adds a Server-Timing header (db time, command count, app time) —
+      only in DEBUG or for a logged-in admin, never to the public
+    • logs requests over the command / DB-time / latency budgets from
+      settings.py, with the shapes of the commands they ran
+
+Off unless QUERY_PROFILER_ENABLED=true. Then only a sample of requests
+is profiled (QUERY_PROFILER_SAMPLE_RATE) plus every debug / admin
+request; commands of other requests cost one ContextVar lookup.
+
+Shapes strip values ({"campaign_id": "?"}), so N+1 patterns show up as
+one shape repeated N times.
+
+Registered in create_app() via register_query_profiler(app). The
+listener must be registered before the first MongoClient is created;
+clients are lazy (database/connection.py), so create_app() is early enough.
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+import bson
+from flask import request, session
+from pymongo import monitoring
+
+from config.constants import ROLE_ADMIN
+from config.settings import settings
+
+logger = logging.getLogger("dcorp.queries")
+
+_current = ContextVar("dcorp_query_stats", default=None)
+
+# Keys that carry the "what" of a command (values are redacted)
+_SHAPE_KEYS = ("filter", "query", "pipeline", "updates", "deletes", "q", "u", "sort")
+
+
+# -----------------------------------------------------
+# Per-request accumulator
+# -----------------------------------------------------
+class QueryStats:
+    __slots__ = ("commands", "db_micros", "bytes_out", "bytes_in", "shapes", "started")
+
+    def __init__(self):
+        self.commands = 0
+        self.db_micros = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.shapes = Counter()
+        self.started = time.perf_counter()
+
+    @property
+    def db_ms(self) -> float:
+        return self.db_micros / 1000.0
+
+
+# -----------------------------------------------------
+# Command shape (values redacted)
+# -----------------------------------------------------
+def _redact(value):
+    if isinstance(value, dict):
+        return {k: _redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value[:3]]
+    return "?"
+
+
+def command_shape(command_name: str, command: dict) -> str:
+    collection = command.get(command_name)
+    parts = {k: _redact(command[k]) for k in _SHAPE_KEYS if k in command}
+    return f"{command_name} {collection} {parts}" if parts else f"{command_name} {collection}"
+
+
+# -----------------------------------------------------
+# Listener
+# -----------------------------------------------------
+class QueryProfiler(monitoring.CommandListener):
+    """
+    pymongo publishes command events on the thread that runs the
+    operation, so the request's ContextVar is visible here.
+    """
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+
+        stats.commands += 1
+        stats.bytes_out += len(bson.encode(event.command))
+        stats.shapes[command_shape(event.command_name, event.command)] += 1
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+
+        stats.db_micros += event.duration_micros
+        stats.bytes_in += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+
+        stats.db_micros += event.duration_micros
+
+
+def current_query_stats():
+    """QueryStats of the active request, or None."""
+    return _current.get()
+
+
+# -----------------------------------------------------
+# Flask integration
+# -----------------------------------------------------
+def _is_debug_request() -> bool:
+    """Requests allowed to see Server-Timing."""
+    return settings.DEBUG or session.get("role") == ROLE_ADMIN
+
+
+def register_query_profiler(app):
+    """
+    Registers the listener globally and hooks request start/end.
+    No-op when QUERY_PROFILER_ENABLED=false.
+    """
+
+    if not settings.QUERY_PROFILER_ENABLED:
+        return
+
+    monitoring.register(QueryProfiler())
+
+    @app.before_request
+    def _start_query_stats():
+        debug = _is_debug_request()
+        if not debug and random.random() >= settings.QUERY_PROFILER_SAMPLE_RATE:
+            return
+
+        request.environ["dcorp.query_debug"] = debug
+        request.environ["dcorp.query_token"] = _current.set(QueryStats())
+
+    @app.after_request
+    def _attach_query_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats.started) * 1000.0
+
+        if request.environ.get("dcorp.query_debug"):
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats.db_ms:.1f};desc="{stats.commands} cmds, '
+                f'{stats.bytes_in + stats.bytes_out} B", app;dur={total_ms:.1f}'
+            )
+
+        over_budget = (
+            stats.commands > settings.QUERY_BUDGET_COMMANDS
+            or stats.db_ms > settings.QUERY_BUDGET_DB_MS
+            or total_ms > settings.QUERY_BUDGET_REQUEST_MS
+        )
+
+        if over_budget:
+            top = "; ".join(f"{n}x {shape}" for shape, n in stats.shapes.most_common(5))
+            logger.warning(
+                f"[SLOW REQUEST] {request.method} {request.path} "
+                f"endpoint={request.endpoint} total={total_ms:.1f}ms "
+                f"db={stats.db_ms:.1f}ms commands={stats.commands} "
+                f"bytes_in={stats.bytes_in} bytes_out={stats.bytes_out} | {top}"
+            )
+
+        return response
+
+    @app.teardown_request
+    def _reset_query_stats(exc):
+        token = request.environ.pop("dcorp.query_token", None)
+        if token is not None:
+            _current.reset(token)
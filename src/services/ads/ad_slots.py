@@ -11,6 +11,7 @@ Single source of truth for:
 
 Used by:
     - Creative upload validation
+    - api/ads/slot_definitions.py (campaign forms show these dimensions)
     - Admin slot management
     - Bidding engine
     - Slot seeding into DB
@@ -33,13 +34,13 @@ AD_SLOTS: Dict[str, dict] = {
         "id": "featured_banner",
         "type": "banner",
         "max_ads": 1,
-        "dimensions": "1920x450",
+        "dimensions": "1600x450",
     },
     "CARD_SECTION": {
         "id": "card_small",
         "type": "card",
         "max_ads": 3,
-        "dimensions": "800x1000",
+        "dimensions": "1000x1000",
     },
     "LOGIN_PAGE_AD": {
         "id": "login_page_ad",
@@ -51,7 +52,7 @@ AD_SLOTS: Dict[str, dict] = {
         "id": "product_inline",
         "type": "inline_card",
         "max_ads": 5,
-        "dimensions": "800x1000",
+        "dimensions": "1000x1000",
     },
     "PRODUCT_DETAIL_BANNER": {
         "id": "product_detail_banner",
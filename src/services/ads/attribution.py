@@ -0,0 +1,222 @@
+# src/services/ads/attribution.py
+"""
+Conversion Attribution
+----------------------
+
+Joins pending conversions (ads_conversions, attribution="pending") to
+the viewer's last click within ATTRIBUTION_LOOKBACK_SECONDS and rolls
+the result up into the campaign document:
+
+    conversions        attributed conversions
+    conversion_value   sum of their order values
+    cpa                spend / conversions (refreshed on every rollup)
+
+The join never scans the click log per conversion. Clicks are read
+incrementally (by _id, overlapping the previous read by
+ATTRIBUTION_DELAY_SECONDS for late writers) into an in-memory ClickIndex:
+
+    viewer tag → last ATTRIBUTION_MAX_CLICKS_PER_VIEWER clicks
+                 [(timestamp, campaign_id, click _id)]
+
+so a lookup is one dict probe plus a few comparisons. On start the index
+is rebuilt from one lookback window of clicks (timestamp index).
+
+Conversions posted with a click token (source="token") already know
+their campaign and are attributed without the index. Suspicious clicks
+(event_filter.py) never enter it.
+
+Conversions are only picked up ATTRIBUTION_DELAY_SECONDS after they
+arrive, so clicks uploaded in batches have time to land.
+
+Run exactly one instance (scripts/run_attribution.py, supervisor): the
+rollup increments are not safe against two jobs claiming the same
+conversion.
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.logging import app_logger
+from .tracking_service import safe_oid
+
+
+# -----------------------------------------------------
+# Per-viewer click index
+# -----------------------------------------------------
+class ClickIndex:
+    def __init__(self, lookback_seconds: int, max_per_viewer: int):
+        self.lookback = timedelta(seconds=lookback_seconds)
+        self.max_per_viewer = max_per_viewer
+
+        self._clicks = {}  # viewer → deque[(timestamp, campaign_id, click_id)]
+        self.loaded_until = None  # wall clock of the last load
+
+    def __len__(self):
+        return len(self._clicks)
+
+    def add(self, viewer: str, timestamp: datetime, campaign_id: str, click_id) -> bool:
+        entries = self._clicks.get(viewer)
+        if entries is None:
+            entries = self._clicks[viewer] = deque(maxlen=self.max_per_viewer)
+        elif any(entry[2] == click_id for entry in entries):
+            return False  # re-read by an overlapping load
+        entries.append((timestamp, campaign_id, click_id))
+        return True
+
+    def prune(self, now: datetime):
+        """Drops clicks that can no longer be attributed."""
+        oldest = now - self.lookback
+        for viewer in list(self._clicks):
+            kept = [entry for entry in self._clicks[viewer] if entry[0] >= oldest]
+            if kept:
+                self._clicks[viewer] = deque(kept, maxlen=self.max_per_viewer)
+            else:
+                del self._clicks[viewer]
+
+    def last_click(self, viewer: str, at: datetime, campaign_id: str = None):
+        """
+        Latest (timestamp, campaign_id, click_id) by this viewer within the
+        lookback window before `at`, optionally for one campaign. None if
+        there is none.
+        """
+        oldest = at - self.lookback
+        best = None
+
+        # Batch-uploaded clicks may arrive out of order: check them all
+        for entry in self._clicks.get(viewer, ()):
+            if not oldest <= entry[0] <= at:
+                continue
+            if campaign_id is not None and entry[1] != campaign_id:
+                continue
+            if best is None or entry[0] > best[0]:
+                best = entry
+
+        return best
+
+    def load(self, clicks_col, now: datetime, overlap_seconds: float = 0) -> int:
+        """
+        Reads clicks written since the last load (one lookback window on
+        start). _ids are created by many writers, so the read overlaps
+        the previous one; re-read clicks are skipped.
+        """
+        query = {"viewer": {"$exists": True}, "suspicious": {"$exists": False}}
+        if self.loaded_until is None:
+            query["timestamp"] = {"$gte": now - self.lookback}
+        else:
+            query["_id"] = {"$gte": ObjectId.from_datetime(self.loaded_until - timedelta(seconds=overlap_seconds))}
+
+        count = 0
+        for doc in clicks_col.find(query, {"viewer": 1, "campaign_id": 1, "timestamp": 1}):
+            count += self.add(doc["viewer"], doc["timestamp"], doc["campaign_id"], doc["_id"])
+
+        self.loaded_until = now
+        return count
+
+
+# -----------------------------------------------------
+# Planning (no I/O)
+# -----------------------------------------------------
+def plan_attribution(conversions: list, index: ClickIndex, now: datetime) -> dict:
+    """
+    Returns:
+        {
+            "ops": [UpdateOne, ...],     # one bulk_write on ads_conversions
+            "rollups": {campaign_oid: {"conversions": n, "value": v}},
+            "attributed": n, "unattributed": n,
+        }
+    """
+    plan = {"ops": [], "rollups": {}, "attributed": 0, "unattributed": 0}
+
+    for conversion in conversions:
+        campaign_id, click_id = None, None
+
+        if conversion.get("source") == "token":
+            campaign_id = conversion.get("campaign_id")
+        else:
+            click = index.last_click(conversion.get("viewer"), conversion["timestamp"], conversion.get("campaign_id"))
+            if click is not None:
+                _, campaign_id, click_id = click
+
+        cid = safe_oid(campaign_id) if campaign_id else None
+        if cid is None:
+            plan["unattributed"] += 1
+            update = {"attribution": "unattributed", "attributed_at": now}
+        else:
+            plan["attributed"] += 1
+            update = {"attribution": "attributed", "campaign_id": campaign_id, "click_id": click_id, "attributed_at": now}
+
+            rollup = plan["rollups"].setdefault(cid, {"conversions": 0, "value": 0.0})
+            rollup["conversions"] += 1
+            rollup["value"] += conversion.get("value") or 0
+
+        plan["ops"].append(UpdateOne({"_id": conversion["_id"], "attribution": "pending"}, {"$set": update}))
+
+    return plan
+
+
+def rollup_ops(rollups: dict) -> list:
+    """Campaign updates: add conversions / value, then recompute cpa in the same write."""
+    ops = []
+    for cid, rollup in rollups.items():
+        ops.append(UpdateOne({"_id": cid}, [
+            {"$set": {
+                "conversions": {"$add": [{"$ifNull": ["$conversions", 0]}, rollup["conversions"]]},
+                "conversion_value": {"$add": [{"$ifNull": ["$conversion_value", 0]}, rollup["value"]]},
+            }},
+            {"$set": {
+                "cpa": {"$cond": [
+                    {"$gt": ["$conversions", 0]},
+                    {"$divide": [{"$ifNull": ["$spend", 0]}, "$conversions"]},
+                    None,
+                ]},
+            }},
+        ]))
+    return ops
+
+
+# -----------------------------------------------------
+# Job
+# -----------------------------------------------------
+class AttributionJob:
+    def __init__(self):
+        self.index = ClickIndex(settings.ATTRIBUTION_LOOKBACK_SECONDS, settings.ATTRIBUTION_MAX_CLICKS_PER_VIEWER)
+
+    def run_once(self, now: datetime = None) -> dict:
+        now = now or datetime.utcnow()
+        clicks_col = get_collection("ads_clicks", profile="tracking")
+        conversions_col = get_collection("ads_conversions", profile="tracking")
+
+        loaded = self.index.load(clicks_col, now, overlap_seconds=settings.ATTRIBUTION_DELAY_SECONDS)
+        self.index.prune(now)
+
+        ready = now - timedelta(seconds=settings.ATTRIBUTION_DELAY_SECONDS)
+        pending = list(
+            conversions_col.find({"attribution": "pending", "received_at": {"$lte": ready}})
+            .sort("received_at", 1)
+            .limit(settings.ATTRIBUTION_BATCH_SIZE)
+        )
+        if not pending:
+            return {"clicks_loaded": loaded, "pending": 0, "attributed": 0, "unattributed": 0}
+
+        plan = plan_attribution(pending, self.index, now)
+
+        # Conversions first: a crash before the rollup undercounts, never double counts
+        conversions_col.bulk_write(plan["ops"], ordered=False)
+        if plan["rollups"]:
+            get_collection("campaigns").bulk_write(rollup_ops(plan["rollups"]), ordered=False)
+
+        app_logger.info(
+            f"[ATTRIBUTION] {plan['attributed']} attributed, {plan['unattributed']} unattributed "
+            f"({len(self.index)} viewers indexed)"
+        )
+        return {
+            "clicks_loaded": loaded,
+            "pending": len(pending),
+            "attributed": plan["attributed"],
+            "unattributed": plan["unattributed"],
+        }
@@ -9,25 +9,51 @@ Responsible for selecting the best-performing ad for a given slot.
 Rules:
     - Only approved campaigns AND approved creatives participate.
     - CPC/CPM billing is NOT done here — handled in tracking API.
-    - Sorting: Highest bid wins (simple auction model).
+    - Ranking: RANKING_MODE — "bid" (highest bid, default), "ecpm" (bid × smoothed
+      CTR), "epsilon" (ecpm + random exploration) or "thompson" (bid ×
+      sampled CTR). CTR estimates come from ctr_estimator.
     - Ensures remaining budget before serving.
+    - Targeting (device / location / category / age / gender) is matched
+      in memory against per-slot snapshots (serving_cache).
+    - Campaigns ahead of their daily_budget pace are skipped at random
+      (pacing).
+    - Campaigns only serve between start_date and end_date (schedule).
+
+The auction is split into DB-free building blocks (query builders,
+filtering, selection, payload) so the async serving app can reuse the
+exact same logic with its own driver.
 """
 
+import heapq
+import random
 from datetime import datetime
 from bson import ObjectId
 from flask import current_app
 
+from config.settings import settings
 from database.connection import get_collection
+from utils.metrics import observe_auction
+from .frequency_cap import frequency_capper, campaign_cap
+from .pacing import pacing_controller
+from .budget_sweeper import budget_sweeper
+from .ctr_estimator import ctr_estimator
+from .schedule import not_ended_query, schedule_sweeper
+from .serving_cache import serving_cache
+from .tracking_service import impression_token, click_token, decision_token
 
 
 # -----------------------------------------------------
 # Remaining budget helper
 # -----------------------------------------------------
 def get_remaining_budget(campaign: dict) -> float:
-    """Return remaining spendable budget for a campaign."""
-    budget = float(campaign.get("budget", 0) or 0)
-    spent = float(campaign.get("spend", 0) or 0)
-    return max(0.0, budget - spent)
+    """
+    Return remaining spendable budget for a campaign.
+
+    `budget` already is the remaining balance (billing does
+    $inc {spend: +cost, budget: -cost}); `spend` is only the running
+    total and must not be subtracted again.
+    """
+    return max(0.0, float(campaign.get("budget", 0) or 0))
 
 
 # -----------------------------------------------------
@@ -54,10 +80,10 @@ def deduct_spend(campaign: dict, amount: float, reason: str = "CPM auto-deduct")
     if get_remaining_budget(fresh) < amount:
         return False
 
-    # Deduct spend atomically
+    # Deduct spend atomically (same shape as CPC click billing)
     campaigns_col.update_one(
         {"_id": ObjectId(cid)},
-        {"$inc": {"spend": amount}}
+        {"$inc": {"spend": amount, "budget": -amount}}
     )
 
     # Transaction log (informational only)
@@ -78,10 +104,13 @@ def deduct_spend(campaign: dict, amount: float, reason: str = "CPM auto-deduct")
 # -----------------------------------------------------
 # Build absolute image URL
 # -----------------------------------------------------
-def build_full_url(url_path: str) -> str:
+def build_full_url(url_path: str, base_url: str = None) -> str:
     """
     Ensures creatives always load properly by converting relative paths
     into full URLs using DCORP_API_URL.
+
+    base_url is only needed outside a Flask app context
+    (e.g. the async serving app); otherwise it is read from app config.
     """
 
     if not url_path:
@@ -90,7 +119,7 @@ def build_full_url(url_path: str) -> str:
     if url_path.startswith("http://") or url_path.startswith("https://"):
         return url_path  # Already absolute
 
-    base = current_app.config.get("DCORP_API_URL")
+    base = base_url or current_app.config.get("DCORP_API_URL")
     if not base:
         raise RuntimeError("DCORP_API_URL missing — configure it in .env")
 
@@ -102,85 +131,349 @@ def build_full_url(url_path: str) -> str:
 
 
 # -----------------------------------------------------
-# Main Auction: Pick winning ad
+# Auction building blocks (shared by sync + async serving)
 # -----------------------------------------------------
-def get_winning_ad(slot_id: str):
-    """
-    Selects the highest-bidding eligible ad for a given slot.
+def eligible_campaigns_query(slot_id: str, now: datetime = None) -> dict:
+    """Mongo filter for campaigns allowed to bid on a slot (not yet ended)."""
+    return {
+        "slot_id": slot_id,
+        "status": "approved",
+        "creative_status": "approved",
+        **not_ended_query(now),
+    }
 
-    Eligibility:
-        - Campaign status == approved
-        - Creative status == approved
-        - Remaining budget > 0
 
-    Returns:
-        {
-            "campaign_id": "...",
-            "slot_id": "...",
-            "image_url": "...",
-            "redirect_url": "...",
-            "headline": "...",
-            "bidding_type": "CPC",
-            "bid_amount": 2.5
-        }
-        or None
-    """
+def approved_creatives_query(campaign_ids: list) -> dict:
+    """Mongo filter for the approved creatives of many campaigns at once."""
+    return {
+        "campaign_id": {"$in": campaign_ids},
+        "status": "approved",
+    }
 
-    campaigns_col = get_collection("campaigns")
-    creatives_col = get_collection("ad_creatives")
 
-    # Fetch campaigns eligible for this slot
-    campaigns = list(campaigns_col.find({
-        "slot_id": slot_id,
-        "status": "approved",
-        "creative_status": "approved",
-    }))
+def funded_campaigns(campaigns) -> list:
+    """Drops campaigns without remaining budget."""
+    return [c for c in campaigns if get_remaining_budget(c) > 0]
+
+
+def index_creatives(creatives) -> dict:
+    """Maps campaign_id → first approved creative."""
+    by_campaign = {}
+    for creative in creatives:
+        by_campaign.setdefault(creative.get("campaign_id"), creative)
+    return by_campaign
 
+
+def pair_candidates(campaigns: list, creatives_by_campaign: dict) -> list:
+    """Joins campaigns with their creative, skipping campaigns without one."""
     eligible = []
 
     for campaign in campaigns:
-        cid = str(campaign["_id"])
+        creative = creatives_by_campaign.get(str(campaign["_id"]))
+        if creative:
+            eligible.append((campaign, creative))
 
-        # Ensure remaining budget
-        if get_remaining_budget(campaign) <= 0:
-            continue
+    return eligible
 
-        # Get approved creative for this campaign
-        creative = creatives_col.find_one({
-            "campaign_id": cid,
-            "status": "approved",
-        })
 
-        if not creative:
-            continue
+def bid_of(pair) -> float:
+    """Sort key: the campaign's bid for a (campaign, creative) pair."""
+    return float(pair[0].get("bid_amount", 0) or 0)
 
-        eligible.append((campaign, creative))
 
-    # No ads available
+# -----------------------------------------------------
+# Ranking (score per (campaign, creative) pair)
+# -----------------------------------------------------
+def _ecpm(pair, ctr: float) -> float:
+    """Expected revenue per 1000 impressions."""
+    campaign = pair[0]
+    if (campaign.get("bidding_type") or "CPC").upper() == "CPM":
+        return bid_of(pair)
+    return bid_of(pair) * ctr * 1000.0
+
+
+def ecpm_of(pair) -> float:
+    """eCPM with the posterior-mean CTR."""
+    return _ecpm(pair, ctr_estimator.ctr(pair[0]))
+
+
+def thompson_ecpm_of(pair) -> float:
+    """eCPM with a CTR sampled from the posterior (explores uncertain ads)."""
+    return _ecpm(pair, ctr_estimator.sample(pair[0]))
+
+
+def ranking_key(mode: str = None):
+    """
+    Score function for select_winner. Evaluated once per candidate and
+    auction, so "thompson" draws a fresh sample every request and
+    "epsilon" ranks at random for RANKING_EPSILON of requests.
+    """
+    mode = (mode or settings.RANKING_MODE).lower()
+
+    if mode == "bid":
+        return bid_of
+
+    ctr_estimator.ensure_started()
+
+    if mode == "thompson":
+        return thompson_ecpm_of
+
+    if mode == "epsilon" and random.random() < settings.RANKING_EPSILON:
+        return lambda pair: random.random()
+
+    return ecpm_of
+
+
+def select_winner(eligible: list, skip=None, key=bid_of):
+    """
+    Best score wins (`key`, highest bid by default).
+    `skip(pair) -> bool` excludes candidates (e.g. frequency-capped);
+    the next best candidate then wins.
+    Returns (campaign, creative) or None.
+    """
     if not eligible:
         return None
 
-    # Sort by BID descending — highest bidder wins
-    eligible.sort(
-        key=lambda pair: float(pair[0].get("bid_amount", 0) or 0),
-        reverse=True
+    if skip is None:
+        return max(eligible, key=key)
+
+    # Pop scores best-first: only as many skip checks as capped winners
+    heap = [(-key(pair), i) for i, pair in enumerate(eligible)]
+    heapq.heapify(heap)
+
+    while heap:
+        _, i = heapq.heappop(heap)
+        if not skip(eligible[i]):
+            return eligible[i]
+
+    return None
+
+
+def frequency_cap_filter(viewer):
+    """skip() for select_winner: campaigns this viewer has seen too often."""
+    if viewer is None:
+        return None
+
+    return lambda pair: frequency_capper.is_capped(
+        viewer, str(pair[0]["_id"]), campaign_cap(pair[0])
     )
 
-    campaign, creative = eligible[0]
-    cid = str(campaign["_id"])
 
+def auction_filter(viewer):
+    """
+    skip() for select_winner: budget pacing + frequency cap.
+    Only evaluated for the candidates the auction actually reaches.
+    """
+    pacing_controller.ensure_started()
+    schedule_sweeper.ensure_started()
+    budget_sweeper.ensure_started()
+    capped = frequency_cap_filter(viewer)
+
+    if capped is None:
+        return lambda pair: pacing_controller.is_throttled(pair[0])
+
+    return lambda pair: pacing_controller.is_throttled(pair[0]) or capped(pair)
+
+
+def record_serve(viewer, campaign: dict):
+    """Counts the served ad against the viewer's frequency cap."""
+    if viewer is not None:
+        frequency_capper.record(viewer, str(campaign["_id"]), campaign_cap(campaign))
+
+
+def select_top_k(eligible: list, k: int, key=bid_of) -> list:
+    """
+    The k best scores, best first (multi-ad slots such as product_inline).
+    Heap selection: O(n log k) instead of sorting every candidate.
+    """
+    if k <= 0 or not eligible:
+        return []
+
+    return heapq.nlargest(k, eligible, key=key)
+
+
+def select_variant(variants: list, accept_webp: bool = False, width: int = None):
+    """
+    Best processed image (creative_pipeline) for the client: the smallest
+    variant at least `width` wide (largest without a width), WebP when
+    accepted. None for creatives without variants.
+    """
+    if not variants:
+        return None
+
+    family = [v for v in variants if (v["format"] == "webp") == accept_webp] or variants
+    family = sorted(family, key=lambda v: v["width"])
+
+    if width:
+        for variant in family:
+            if variant["width"] >= width:
+                return variant
+    return family[-1]
+
+
+def variant_srcset(variants: list, webp: bool, base_url: str = None) -> str:
+    """"<url> 960w, <url> 1920w" for one format family."""
+    family = sorted(
+        (v for v in variants or () if (v["format"] == "webp") == webp),
+        key=lambda v: v["width"],
+    )
+    return ", ".join(f"{build_full_url(v['url'], base_url)} {v['width']}w" for v in family)
+
+
+def build_ad_payload(campaign: dict, creative: dict, slot_id: str, base_url: str = None,
+                     accept_webp: bool = False, width: int = None, shared: bool = False) -> dict:
+    """
+    Public ad response for the winning (campaign, creative) pair.
+    image_url is the best processed variant for (accept_webp, width);
+    srcset lists the same format at every size.
+
+    impression_url (GIF pixel), beacon_url (navigator.sendBeacon) and
+    click_url (302 to redirect_url) carry signed tokens, so child apps
+    track with one fire-and-forget request instead of a JSON POST.
+
+    shared=True (edge-cacheable responses) replaces them with
+    tracking_url, which returns fresh per-serve URLs: a cached body
+    must not hand every viewer the same event tokens.
+    """
     bidding_type = (campaign.get("bidding_type") or "CPC").upper()
     bid_amount = float(campaign.get("bid_amount", 0) or 0)
+    campaign_id = str(campaign["_id"])
 
-    # Build final image URL
-    image_url = build_full_url(creative.get("image_url") or "")
+    variants = creative.get("variants")
+    best = select_variant(variants, accept_webp, width)
+    image_url = best["url"] if best else creative.get("image_url") or ""
 
-    return {
-        "campaign_id": cid,
+    payload = {
+        "campaign_id": campaign_id,
         "slot_id": slot_id,
-        "image_url": image_url,
+        "image_url": build_full_url(image_url, base_url),
+        "srcset": variant_srcset(variants, best is not None and best["format"] == "webp", base_url),
+        "width": best["width"] if best else None,
+        "height": best["height"] if best else None,
         "redirect_url": creative.get("redirect_url"),
         "headline": creative.get("headline"),
         "bidding_type": bidding_type,
         "bid_amount": bid_amount,
     }
+
+    if shared:
+        decision = decision_token(campaign_id, slot_id, creative.get("redirect_url"))
+        payload["tracking_url"] = build_full_url(f"/api/ads/track/session?d={decision}", base_url)
+    else:
+        payload.update(tracking_urls(campaign_id, slot_id, creative.get("redirect_url"), base_url))
+
+    return payload
+
+
+def tracking_urls(campaign_id: str, slot_id: str, redirect_url: str, base_url: str = None) -> dict:
+    """Per-serve impression / beacon / click URLs (fresh tokens every call)."""
+    impression = impression_token(campaign_id, slot_id)
+    click = click_token(campaign_id, slot_id, redirect_url)
+
+    return {
+        "impression_url": build_full_url(f"/api/ads/track/impression.gif?t={impression}", base_url),
+        "beacon_url": build_full_url(f"/api/ads/track/beacon?t={impression}", base_url),
+        "click_url": build_full_url(f"/c/{click}", base_url),
+    }
+
+
+def image_preferences(args, accept_header: str = None):
+    """(accept_webp, width) from ?webp=1 / Accept: image/webp and ?width=."""
+    accept_webp = args.get("webp") == "1" or "image/webp" in (accept_header or "")
+
+    try:
+        width = int(args.get("width")) if args.get("width") else None
+    except (TypeError, ValueError):
+        width = None
+
+    return accept_webp, width
+
+
+# -----------------------------------------------------
+# Slot candidates (cached snapshot)
+# -----------------------------------------------------
+def load_slot_pairs(slot_id: str) -> list:
+    """Approved, funded (campaign, creative) pairs of a slot — two queries."""
+    campaigns_col = get_collection("campaigns", profile="serving")
+    creatives_col = get_collection("ad_creatives", profile="serving")
+
+    campaigns = funded_campaigns(campaigns_col.find(eligible_campaigns_query(slot_id)))
+    if not campaigns:
+        return []
+
+    # One round-trip for every creative instead of one per campaign
+    creatives = creatives_col.find(
+        approved_creatives_query([str(c["_id"]) for c in campaigns])
+    )
+
+    return pair_candidates(campaigns, index_creatives(creatives))
+
+
+def slot_snapshot(slot_id: str):
+    """Cached SlotSnapshot for the slot, reloaded after the TTL."""
+    snapshot = serving_cache.get(slot_id)
+    if snapshot is None:
+        snapshot = serving_cache.put(slot_id, load_slot_pairs(slot_id))
+    return snapshot
+
+
+# -----------------------------------------------------
+# Main Auction: Pick winning ad
+# -----------------------------------------------------
+def get_winning_ad(slot_id: str, viewer=None, context: dict = None, image_prefs: tuple = (False, None),
+                   shared: bool = False):
+    """
+    Selects the highest-bidding eligible ad for a given slot.
+
+    Eligibility:
+        - Campaign status == approved
+        - Creative status == approved
+        - Remaining budget > 0
+        - Inside the start_date / end_date window
+        - Campaign targeting accepts the request context
+          (context = targeting_engine.request_context(...), optional)
+        - Viewer under the campaign's frequency cap
+          (viewer = frequency_cap.viewer_key(...), optional)
+        - Passes the campaign's pacing throttle (random serve check)
+
+    image_prefs = image_preferences(...) picks the image variant.
+    shared=True (edge-cacheable) returns tracking_url instead of the
+    three per-serve tracking URLs. A shared decision is made for every
+    anonymous viewer at once, so no frequency cap is checked or counted.
+
+    Returns:
+        {
+            "campaign_id": "...",
+            "slot_id": "...",
+            "image_url": "...",
+            "srcset": "... 960w, ... 1920w",
+            "width": 1920,
+            "height": 500,
+            "redirect_url": "...",
+            "headline": "...",
+            "bidding_type": "CPC",
+            "bid_amount": 2.5,
+            "impression_url": ".../api/ads/track/impression.gif?t=...",
+            "beacon_url": ".../api/ads/track/beacon?t=...",
+            "click_url": ".../c/..."
+        }
+        or None
+    """
+
+    if shared:
+        viewer = None
+
+    # Candidates come from the slot snapshot; targeting is a bitset AND
+    eligible = slot_snapshot(slot_id).candidates(context)
+
+    winner = select_winner(eligible, skip=auction_filter(viewer), key=ranking_key())
+    observe_auction(slot_id, len(eligible), filled=winner is not None)
+
+    # No ads available
+    if not winner:
+        return None
+
+    campaign, creative = winner
+    record_serve(viewer, campaign)
+    accept_webp, width = image_prefs
+    return build_ad_payload(campaign, creative, slot_id, accept_webp=accept_webp, width=width, shared=shared)
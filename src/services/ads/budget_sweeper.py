@@ -0,0 +1,79 @@
+# src/services/ads/budget_sweeper.py
+"""
+Budget Sweeper
+--------------
+
+Takes campaigns out of the auction as soon as their budget is gone,
+instead of waiting for a click or a wallet page visit.
+
+Every BUDGET_SWEEP_INTERVAL_SECONDS (per-process PeriodicTask):
+    1. one indexed query (status + budget) for serving campaigns with
+       budget <= 0 — `budget` is the remaining budget: CPC billing does
+       $inc {spend: +cost, budget: -cost}
+    2. one update_many → status "ended" ("paused" from the wallet page)
+    3. the campaigns are evicted from this process's serving snapshots
+
+Other processes drop them on their next snapshot reload
+(SERVING_CACHE_TTL_SECONDS), so an exhausted campaign stops serving
+within seconds everywhere.
+"""
+
+from datetime import datetime
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.background import PeriodicTask
+from utils.logging import app_logger
+from .edge_cache import purge_campaigns
+from .serving_cache import serving_cache
+
+# Statuses that still take part in (or can return to) the auction
+SERVING_STATUSES = ["approved", "running"]
+
+
+def exhausted_query(user_id: str = None) -> dict:
+    """Serving campaigns without remaining budget (status + budget indexed)."""
+    query = {
+        "status": {"$in": SERVING_STATUSES},
+        "budget": {"$lte": 0},
+    }
+
+    if user_id is not None:
+        query["user_id"] = user_id
+
+    return query
+
+
+def sweep_exhausted_campaigns(user_id: str = None, now: datetime = None, status: str = "ended") -> int:
+    """
+    Ends every serving campaign whose budget is used up (optionally for
+    one advertiser). Returns the number of campaigns ended.
+
+    The wallet page passes status="paused" (its old behaviour), so the
+    advertiser can top up and resume instead of recreating the campaign.
+    """
+    now = now or datetime.utcnow()
+    campaigns_col = get_collection("campaigns")
+
+    exhausted = list(campaigns_col.find(exhausted_query(user_id), {"_id": 1}))
+    if not exhausted:
+        return 0
+
+    ids = [doc["_id"] for doc in exhausted]
+    result = campaigns_col.update_many(
+        {"_id": {"$in": ids}, "status": {"$in": SERVING_STATUSES}},
+        {"$set": {"status": status, f"{status}_reason": "budget_exhausted", "updated_at": now}},
+    )
+
+    serving_cache.evict_campaigns(str(oid) for oid in ids)
+    purge_campaigns(ids)
+
+    app_logger.info(f"[BUDGET] {status} {result.modified_count} campaign(s) with exhausted budget")
+    return result.modified_count
+
+
+budget_sweeper = PeriodicTask(
+    "budget-sweeper",
+    settings.BUDGET_SWEEP_INTERVAL_SECONDS,
+    sweep_exhausted_campaigns,
+)
@@ -0,0 +1,311 @@
+# src/services/ads/creative_pipeline.py
+"""
+Creative Image Pipeline
+-----------------------
+
+Turns an uploaded creative into web-ready variants sized for its slot:
+
+    validate_upload(file, slot_id)          (request thread, header only)
+        → aspect ratio + minimum size against ad_slots dimensions
+    creative_store.store_upload(file)       (request thread)
+        → original stored under its SHA-256, one reference taken
+    process_creative_async(digest, slot_id, campaign_id)  (worker pool)
+        → first run per image: a lossless master (EXIF orientation
+          applied, metadata stripped) replaces the original upload
+        → skipped when the image was already processed for this slot size
+        → for every scale in CREATIVE_SCALES (1 = slot size), from the master:
+              WebP + JPEG (PNG if alpha), each content-addressed
+        → the campaign's creative is switched to the variants
+
+The ad payload then serves the best variant plus a `srcset`
+(bidding_engine.build_ad_payload).
+
+Resizing and encoding run in a thread pool: Pillow releases the GIL for
+both, so the request thread returns immediately.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+from PIL import Image, ImageOps
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.logging import app_logger
+from .ad_slots import get_slot_dimensions
+from .creative_store import put_bytes, put_master, url_to_path
+
+
+class CreativeError(ValueError):
+    """Upload rejected; the message is safe to show to the advertiser."""
+
+
+# -----------------------------------------------------
+# Slot sizes
+# -----------------------------------------------------
+def parse_dimensions(value: str):
+    """"1920x500" / "1920×500" → (1920, 500), or None."""
+    if not value:
+        return None
+    try:
+        width, height = value.lower().replace("×", "x").split("x")
+        return int(width), int(height)
+    except ValueError:
+        return None
+
+
+def slot_sizes(slot_id: str) -> list:
+    """Variant sizes for a slot, largest first."""
+    dims = parse_dimensions(get_slot_dimensions(slot_id))
+    if not dims:
+        return []
+
+    width, height = dims
+    return [
+        (round(width * scale), round(height * scale))
+        for scale in sorted(settings.CREATIVE_SCALES, reverse=True)
+    ]
+
+
+# -----------------------------------------------------
+# Validation (request thread — reads the header only)
+# -----------------------------------------------------
+def validate_upload(file, slot_id: str):
+    """
+    Checks the uploaded image against the slot's declared dimensions.
+    Raises CreativeError. Rewinds the stream for the caller's save().
+    """
+    dims = parse_dimensions(get_slot_dimensions(slot_id))
+
+    try:
+        with Image.open(file.stream) as img:
+            width, height = img.size
+    except Exception:
+        raise CreativeError("Uploaded file is not a readable image.") from None
+    finally:
+        file.stream.seek(0)
+
+    if not dims:
+        return
+
+    slot_w, slot_h = dims
+    expected, actual = slot_w / slot_h, width / height
+
+    if abs(actual - expected) / expected > settings.CREATIVE_ASPECT_TOLERANCE:
+        raise CreativeError(
+            f"Image is {width}×{height}; this slot needs a {slot_w}×{slot_h} (same aspect ratio) image."
+        )
+
+    if width < slot_w * min(settings.CREATIVE_SCALES):
+        raise CreativeError(
+            f"Image is too small ({width}×{height}); upload at least "
+            f"{round(slot_w * min(settings.CREATIVE_SCALES))}px wide, ideally {slot_w}×{slot_h}."
+        )
+
+
+# -----------------------------------------------------
+# Processing (worker pool)
+# -----------------------------------------------------
+def _encode(img, fmt: str, **options) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def write_master(src_path: str, digest: str) -> str:
+    """
+    Stores a lossless PNG of the upload with EXIF orientation applied and
+    no metadata as blob `digest`'s master. Returns its URL.
+    """
+    with Image.open(src_path) as original:
+        img = ImageOps.exif_transpose(original)
+        has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+        # convert() copies EXIF / ICC / XMP along; PNG would write them back
+        img.info = {}
+        return put_master(_encode(img, "PNG"), digest)
+
+
+def render_variants(src_path: str, slot_id: str, digest: str) -> list:
+    """
+    Encodes WebP + fallback variants for every slot size into the
+    content-addressed store, under blob `digest`.
+    Returns [{"url", "width", "height", "format"}, …], largest first.
+    """
+    variants, rendered = [], set()
+
+    with Image.open(src_path) as original:
+        img = ImageOps.exif_transpose(original)
+        has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+        sizes = slot_sizes(slot_id) or [img.size]
+
+        for size in sizes:
+            # Never upscale: clamp to the source width
+            if size[0] > img.width:
+                size = (img.width, round(img.width * size[1] / size[0]))
+
+            if size in rendered:
+                continue
+            rendered.add(size)
+
+            # New image objects carry no EXIF / ICC / XMP
+            resized = ImageOps.fit(img, size, method=Image.LANCZOS)
+
+            webp = _encode(resized, "WEBP", quality=settings.CREATIVE_WEBP_QUALITY, method=4)
+            variants.append({"url": put_bytes(webp, "webp", digest), "width": size[0], "height": size[1], "format": "webp"})
+
+            if has_alpha:
+                url, fmt = put_bytes(_encode(resized, "PNG", optimize=True), "png", digest), "png"
+            else:
+                jpeg = _encode(
+                    resized, "JPEG",
+                    quality=settings.CREATIVE_JPEG_QUALITY, optimize=True, progressive=True,
+                )
+                url, fmt = put_bytes(jpeg, "jpg", digest), "jpeg"
+            variants.append({"url": url, "width": size[0], "height": size[1], "format": fmt})
+
+    return variants
+
+
+def rendition_key(slot_id: str) -> str:
+    dims = parse_dimensions(get_slot_dimensions(slot_id))
+    return f"{dims[0]}x{dims[1]}" if dims else "source"
+
+
+def _largest_fallback(renditions: dict):
+    fallbacks = [v for variants in renditions.values() for v in variants if v["format"] != "webp"]
+    return max(fallbacks, key=lambda v: v["width"], default=None)
+
+
+def creative_fields(blob: dict, slot_id: str) -> dict:
+    """Fields an ad_creatives document takes from its blob."""
+    renditions = blob.get("renditions") or {}
+    variants = renditions.get(rendition_key(slot_id)) or []
+    fallback = next((v for v in variants if v["format"] != "webp"), None)
+    if fallback:
+        image_url = fallback["url"]
+    else:
+        # Not rendered for this size yet; blobs processed before masters
+        # existed have lost their original and fall back to a variant
+        legacy = None if blob.get("master") else _largest_fallback(renditions)
+        image_url = blob.get("master") or (legacy["url"] if legacy else blob["url"])
+    return {
+        "image_url": image_url,
+        "variants": variants,
+        "content_hash": blob["_id"],
+    }
+
+
+def ensure_master(blob: dict):
+    """
+    URL of the blob's master, writing it from the original upload on first
+    use. The original (with its metadata) is deleted afterwards, and
+    creatives / campaigns still showing it are pointed at the master.
+    Returns None for blobs processed before masters were kept.
+    """
+    if blob.get("master"):
+        return blob["master"]
+
+    digest = blob["_id"]
+    blobs_col = get_collection("creative_blobs")
+
+    src_path = url_to_path(blob["url"])
+    try:
+        master = write_master(src_path, digest)
+    except FileNotFoundError:
+        # Another worker just turned it into the master (or it is a legacy blob)
+        return (blobs_col.find_one({"_id": digest}, {"master": 1}) or {}).get("master")
+
+    blobs_col.update_one({"_id": digest}, {"$set": {"master": master}})
+    get_collection("ad_creatives").update_many(
+        {"content_hash": digest, "image_url": blob["url"]}, {"$set": {"image_url": master}}
+    )
+    get_collection("campaigns").update_many({"image_url": blob["url"]}, {"$set": {"image_url": master}})
+    blob["master"] = master
+
+    try:
+        os.remove(src_path)
+    except OSError:
+        pass
+
+    return master
+
+
+def process_creative(digest: str, slot_id: str, campaign_id: str) -> list:
+    """
+    Renders the blob's variants for the slot size (once per distinct image
+    and size) from its master and points the campaign's creative at them.
+    """
+    blobs_col = get_collection("creative_blobs")
+    blob = blobs_col.find_one({"_id": digest})
+    if not blob:
+        return []  # released before the pool got to it
+
+    original_url = blob["url"]
+    master = ensure_master(blob)
+
+    key = rendition_key(slot_id)
+    renditions = blob.setdefault("renditions", {})
+
+    if key not in renditions:
+        if master:
+            src_path = url_to_path(master)
+        else:
+            # Processed before masters were kept: re-render from the largest variant
+            largest = _largest_fallback(renditions)
+            if not largest:
+                raise CreativeError(f"No source image left for {digest}")
+            src_path = url_to_path(largest["url"])
+
+        renditions[key] = render_variants(src_path, slot_id, digest)
+        blobs_col.update_one({"_id": digest}, {"$set": {f"renditions.{key}": renditions[key]}})
+
+    fields = creative_fields(blob, slot_id)
+    get_collection("ad_creatives").update_many(
+        {"campaign_id": str(campaign_id), "content_hash": digest}, {"$set": fields}
+    )
+    get_collection("campaigns").update_one(
+        {"_id": ObjectId(campaign_id), "image_url": {"$in": [original_url, master]}},
+        {"$set": {"image_url": fields["image_url"]}},
+    )
+
+    return renditions[key]
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+
+    # Thread pools do not survive fork(); one per process
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.CREATIVE_WORKERS, thread_name_prefix="dcorp-creative"
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def process_creative_async(digest: str, slot_id: str, campaign_id: str):
+    """Queues process_creative() on the worker pool. Returns the Future."""
+
+    def run():
+        try:
+            return process_creative(digest, slot_id, campaign_id)
+        except Exception as e:
+            # The original upload (or the master) keeps serving; nothing is lost
+            app_logger.error(f"[CREATIVE PIPELINE ERROR] {digest}: {e}", exc_info=True)
+            return None
+
+    return _pool().submit(run)
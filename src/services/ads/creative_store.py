@@ -0,0 +1,239 @@
+# src/services/ads/creative_store.py
+"""
+Content-Addressed Creative Storage
+----------------------------------
+
+Every creative file is stored under the SHA-256 of its bytes:
+
+    CREATIVE_STORE_FOLDER/ab/cd/abcd…ef.jpg    →   /static/creatives/ab/cd/abcd…ef.jpg
+
+Variants live in their blob's own directory, named by their own hash,
+next to the blob's master:
+
+    ab/cd/abcd…ef/1234…89.webp
+    ab/cd/abcd…ef/master.png     lossless, metadata stripped
+
+The pipeline renders every size from the master and then deletes the
+original upload (which still carries its metadata). The master stays
+until the blob's last reference is released.
+
+Two blobs can render byte-identical variants (same pixels, different
+metadata); each keeps its own copy, so releasing one never deletes a
+file the other still serves.
+
+A URL therefore never changes content, so nginx serves the tree with
+`Cache-Control: immutable` and a year-long max-age. Two shard levels keep
+directories small.
+
+Provides:
+- store_upload(file)      → blob doc for an uploaded original (+1 reference)
+- store_file(path)        → same, for a file on disk
+- put_bytes(data, ext, owner) → URL for a derived file (variant) of blob `owner`
+- put_master(data, owner) → URL of blob `owner`'s master (PNG bytes)
+- acquire(digest, ext)    → +1 reference on a blob
+- release(digest)         → −1 reference; files removed at zero
+- url_to_path(url)
+
+`creative_blobs` documents (one per distinct uploaded original):
+    {_id: sha256, ext, url, master, renditions: {"<w>x<h>": [variants]}, refs, created_at}
+
+`url` is the original upload, `master` is set once the pipeline has
+written the master (the original is gone from then on).
+
+`renditions` is keyed by slot size, so one image used in differently
+sized slots is rendered once per size.
+
+Each ad_creatives document holding `content_hash` owns one reference, so
+the same image uploaded for many campaigns is stored and processed once.
+"""
+
+import datetime
+import hashlib
+import os
+import tempfile
+
+from pymongo import ReturnDocument
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.logging import app_logger
+
+
+URL_PREFIX = "/static/creatives"
+
+_CHUNK = 64 * 1024
+
+
+# -----------------------------------------------------
+# Paths
+# -----------------------------------------------------
+def content_name(digest: str, ext: str) -> str:
+    """Sharded relative name: ab/cd/<digest>.<ext>"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def content_url(digest: str, ext: str) -> str:
+    return f"{URL_PREFIX}/{content_name(digest, ext)}"
+
+
+def variant_name(owner: str, digest: str, ext: str) -> str:
+    """Relative name of a variant inside its blob's directory."""
+    return f"{owner[:2]}/{owner[2:4]}/{owner}/{digest}.{ext}"
+
+
+def master_name(owner: str) -> str:
+    """Relative name of a blob's lossless master."""
+    return f"{owner[:2]}/{owner[2:4]}/{owner}/master.png"
+
+
+def owns_url(owner: str, url: str) -> bool:
+    """True for the blob's original and the variants stored under it."""
+    return bool(url) and url.startswith(f"{URL_PREFIX}/{owner[:2]}/{owner[2:4]}/{owner}")
+
+
+def url_to_path(url: str):
+    """Filesystem path of a store URL, or None for anything else."""
+    if not url or not url.startswith(URL_PREFIX + "/"):
+        return None
+    return os.path.join(settings.CREATIVE_STORE_FOLDER, url[len(URL_PREFIX) + 1:])
+
+
+def normalize_ext(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return "jpg" if ext == "jpeg" else (ext or "bin")
+
+
+def _write_once(name: str, chunks) -> str:
+    """Writes the file unless it already exists. Returns its URL."""
+    path = os.path.join(settings.CREATIVE_STORE_FOLDER, name)
+
+    if not os.path.exists(path):
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+
+        # Write + rename: readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks():
+                    out.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    return f"{URL_PREFIX}/{name}"
+
+
+# -----------------------------------------------------
+# Writes
+# -----------------------------------------------------
+def put_bytes(data: bytes, ext: str, owner: str) -> str:
+    """Stores derived bytes (a variant of blob `owner`). Returns the immutable URL."""
+    digest = hashlib.sha256(data).hexdigest()
+    return _write_once(variant_name(owner, digest, ext), lambda: [data])
+
+
+def put_master(data: bytes, owner: str) -> str:
+    """Stores blob `owner`'s master (PNG bytes). Returns its URL."""
+    return _write_once(master_name(owner), lambda: [data])
+
+
+def hash_stream(stream) -> str:
+    h = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(_CHUNK), b""):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def acquire(digest: str, ext: str) -> dict:
+    """+1 reference (creating the blob). Returns the blob document."""
+    return get_collection("creative_blobs").find_one_and_update(
+        {"_id": digest},
+        {
+            "$inc": {"refs": 1},
+            "$setOnInsert": {
+                "ext": ext,
+                "url": content_url(digest, ext),
+                "renditions": {},
+                "created_at": datetime.datetime.utcnow(),
+            },
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _store(stream, filename: str) -> dict:
+    digest = hash_stream(stream)
+    blob = acquire(digest, normalize_ext(filename))
+
+    if not blob.get("master"):
+        _write_once(content_name(digest, blob["ext"]), lambda: iter(lambda: stream.read(_CHUNK), b""))
+        stream.seek(0)
+
+    return blob
+
+
+def store_upload(file) -> dict:
+    """
+    Hashes an uploaded file (werkzeug FileStorage) and takes a reference.
+    The original is only written while the blob has no master yet —
+    re-uploads of a processed image are never stored again.
+    """
+    return _store(file.stream, file.filename)
+
+
+def store_file(path: str) -> dict:
+    """store_upload() for a file already on disk (migrations)."""
+    with open(path, "rb") as stream:
+        return _store(stream, path)
+
+
+# -----------------------------------------------------
+# Reference counting
+# -----------------------------------------------------
+def _remove_url(url: str):
+    path = url_to_path(url)
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def release(digest: str):
+    """−1 reference. At zero the blob and all of its files are deleted."""
+    if not digest:
+        return
+
+    blobs_col = get_collection("creative_blobs")
+
+    blob = blobs_col.find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"refs": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not blob or blob.get("refs", 0) > 0:
+        return
+
+    # Conditional delete: a concurrent acquire() keeps the blob alive
+    if blobs_col.delete_one({"_id": digest, "refs": {"$lte": 0}}).deleted_count:
+        _remove_url(blob.get("url"))
+        _remove_url(blob.get("master"))
+        for variants in (blob.get("renditions") or {}).values():
+            for variant in variants:
+                # Variants written before they were kept per blob may be
+                # shared with another blob: those files are left in place
+                if owns_url(digest, variant.get("url")):
+                    _remove_url(variant.get("url"))
+        try:
+            os.rmdir(os.path.join(settings.CREATIVE_STORE_FOLDER, digest[:2], digest[2:4], digest))
+        except OSError:
+            pass
+        app_logger.info(f"[CREATIVE STORE] released {digest}")
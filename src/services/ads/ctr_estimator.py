@@ -0,0 +1,81 @@
+# src/services/ads/ctr_estimator.py
+"""
+CTR Estimates for Ranking
+-------------------------
+
+Smoothed click-through rate per campaign (campaigns are bound to one
+slot, so this is also per campaign × slot), from the `impressions` /
+`clicks` counters the tracking endpoints maintain on each campaign.
+
+Beta prior (CTR_PRIOR_MEAN, CTR_PRIOR_STRENGTH):
+    alpha = prior_mean × strength       + clicks
+    beta  = (1 − prior_mean) × strength + impressions − clicks
+
+    ctr(campaign)    → posterior mean          (ecpm / epsilon modes)
+    sample(campaign) → one Beta(alpha, beta)   (thompson mode)
+
+New campaigns start at the prior mean instead of 0 (which would starve
+them) or 1/1 (which would let one lucky click win everything).
+
+Counters are reloaded by a per-process PeriodicTask every
+CTR_REFRESH_SECONDS; ranking itself never touches MongoDB.
+"""
+
+import random
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.background import PeriodicTask
+
+
+class CtrEstimator:
+    def __init__(self, prior_mean: float, prior_strength: float, refresh_seconds: float):
+        self.prior_alpha = prior_mean * prior_strength
+        self.prior_beta = (1.0 - prior_mean) * prior_strength
+        self._posteriors = {}  # campaign_id → (alpha, beta)
+        self.task = PeriodicTask("ctr-estimator", refresh_seconds, self.refresh)
+
+    def posterior(self, impressions, clicks):
+        impressions = max(0.0, float(impressions or 0))
+        clicks = min(max(0.0, float(clicks or 0)), impressions)
+        return self.prior_alpha + clicks, self.prior_beta + impressions - clicks
+
+    def refresh(self):
+        campaigns_col = get_collection("campaigns", profile="serving")
+        docs = campaigns_col.find(
+            {"status": "approved"},
+            {"impressions": 1, "clicks": 1},
+        )
+        self._posteriors = {
+            str(doc["_id"]): self.posterior(doc.get("impressions"), doc.get("clicks"))
+            for doc in docs
+        }
+
+    def _alpha_beta(self, campaign: dict):
+        cached = self._posteriors.get(str(campaign["_id"]))
+        if cached is not None:
+            return cached
+        # Not refreshed yet: use the counters on the snapshot document
+        return self.posterior(campaign.get("impressions"), campaign.get("clicks"))
+
+    def ctr(self, campaign: dict) -> float:
+        alpha, beta = self._alpha_beta(campaign)
+        return alpha / (alpha + beta)
+
+    def sample(self, campaign: dict) -> float:
+        alpha, beta = self._alpha_beta(campaign)
+        return random.betavariate(alpha, beta)
+
+    def ensure_started(self):
+        self.task.ensure_started()
+
+    def stop(self):
+        self.task.stop()
+
+
+# Process-wide estimator used by the bidding engine
+ctr_estimator = CtrEstimator(
+    prior_mean=settings.CTR_PRIOR_MEAN,
+    prior_strength=settings.CTR_PRIOR_STRENGTH,
+    refresh_seconds=settings.CTR_REFRESH_SECONDS,
+)
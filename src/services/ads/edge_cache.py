@@ -0,0 +1,195 @@
+# src/services/ads/edge_cache.py
+"""
+Edge Cache for Ad Decisions
+---------------------------
+
+Lets nginx (proxy_cache, deployment/nginx.conf) answer repeated
+/api/ads/slot/<slot_id> requests for a few seconds when the decision does
+not depend on who is asking.
+
+A request is edge-cacheable when:
+    • EDGE_CACHE_TTL_SECONDS > 0
+    • it carries no identity: no ?viewer_id= / X-Viewer-ID (nginx
+      bypasses the cache for both, so the cache key never mixes them)
+    • ?device= is given, or no campaign in the slot targets devices
+      (otherwise the device comes from the User-Agent)
+
+Identity-less decisions are shared by every anonymous viewer, so they are
+made without frequency capping (an IP + User-Agent guess would be cached
+for everyone behind it anyway). Caps apply to identified viewers, and to
+anonymous requests that cannot be cached.
+
+Cacheable responses carry
+    Cache-Control: public, max-age=0, s-maxage=<ttl>
+    X-Accel-Expires: <ttl>                  (nginx ignores s-maxage)
+    ETag, Vary: Accept
+    Surrogate-Key: slot-<slot_id> campaign-<campaign_id>
+everything else `Cache-Control: private, no-store`.
+
+Cacheable decisions are built with shared=True (bidding_engine): no
+per-serve event tokens in the body, only a tracking_url the child app
+calls (uncached) for its own impression / click URLs. The ETag hashes
+the decision itself, so If-None-Match revalidation gets a 304.
+
+While a decision is cached, pacing and exploration (epsilon / thompson)
+are sampled once per TTL instead of per request.
+
+Changes that alter a slot's auction (approve / reject / pause / resume,
+budget exhausted, schedule ended, edits) call purge_*(), which sends
+`PURGE EDGE_PURGE_URL<slot_id>` from a background thread. Surrogate-Key
+serves CDNs that purge by key natively.
+
+Stock nginx cannot purge (that needs ngx_cache_purge), so by default
+EDGE_PURGE_URL is unset and purge_*() does nothing: an approved, paused,
+rejected or exhausted campaign shows up at the edge only once the cached
+decision expires, i.e. up to EDGE_CACHE_TTL_SECONDS (plus the serving
+cache's SERVING_CACHE_TTL_SECONDS) later. Configure purging, or lower
+the TTL, where that delay matters.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.logging import app_logger
+from .serving_cache import serving_cache
+
+
+# -----------------------------------------------------
+# Policy + headers
+# -----------------------------------------------------
+def is_cacheable(slot_id: str, args, headers) -> bool:
+    """Whether this slot request may be answered from a shared cache."""
+    if settings.EDGE_CACHE_TTL_SECONDS <= 0:
+        return False
+
+    # Identified viewers get their own (frequency capped) decision
+    if args.get("viewer_id") or headers.get("X-Viewer-ID"):
+        return False
+
+    snapshot = serving_cache.get(slot_id)
+    if snapshot is None:
+        return False
+
+    index = snapshot.index
+    if args.get("device") is None and index.untargeted["device"] != index.all_mask:
+        return False
+
+    return True
+
+
+def etag_for(ad: dict) -> str:
+    """ETag of a decision; tracking_url holds a timed token and is left out."""
+    decision = {k: v for k, v in ad.items() if k != "tracking_url"} if ad else None
+    body = json.dumps(decision, sort_keys=True, default=str).encode("utf-8")
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def not_modified(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+
+
+def cache_headers(slot_id: str, ad: dict, cacheable: bool, etag: str = None) -> dict:
+    if not cacheable:
+        return {"Cache-Control": "private, no-store"}
+
+    ttl = settings.EDGE_CACHE_TTL_SECONDS
+    keys = f"slot-{slot_id}"
+    if ad:
+        keys += f" campaign-{ad['campaign_id']}"
+
+    headers = {
+        "Cache-Control": f"public, max-age=0, s-maxage={ttl}",
+        "X-Accel-Expires": str(ttl),
+        "Surrogate-Key": keys,
+        "Vary": "Accept",
+    }
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+# -----------------------------------------------------
+# Purging (background; never blocks a request)
+# -----------------------------------------------------
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+
+    # Thread pools do not survive fork(); one per process
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dcorp-edge-purge")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _send_purges(slot_ids):
+    for slot_id in sorted({s for s in slot_ids if s}):
+        req = urllib.request.Request(settings.EDGE_PURGE_URL + slot_id, method="PURGE")
+        try:
+            urllib.request.urlopen(req, timeout=settings.EDGE_PURGE_TIMEOUT_SECONDS).close()
+        except urllib.error.HTTPError as e:
+            if e.code != 404:  # 404: nothing cached for the slot
+                app_logger.warning(f"[EDGE PURGE] {slot_id}: HTTP {e.code}")
+        except Exception as e:
+            app_logger.warning(f"[EDGE PURGE] {slot_id}: {e}")
+
+
+def _campaign_slots(campaign_ids) -> list:
+    oids = [ObjectId(cid) for cid in map(str, campaign_ids) if ObjectId.is_valid(cid)]
+    if not oids:
+        return []
+    docs = get_collection("campaigns").find({"_id": {"$in": oids}}, {"slot_id": 1})
+    return [doc.get("slot_id") for doc in docs]
+
+
+def _creative_slots(creative_ids) -> list:
+    oids = [ObjectId(cid) for cid in map(str, creative_ids) if ObjectId.is_valid(cid)]
+    if not oids:
+        return []
+    docs = get_collection("ad_creatives").find({"_id": {"$in": oids}}, {"campaign_id": 1})
+    return _campaign_slots(doc.get("campaign_id") for doc in docs)
+
+
+def _submit(fn, *args):
+    if not settings.EDGE_PURGE_URL:
+        return None
+
+    def run():
+        try:
+            _send_purges(fn(*args))
+        except Exception as e:
+            app_logger.error(f"[EDGE PURGE ERROR] {e}", exc_info=True)
+
+    return _pool().submit(run)
+
+
+def purge_slots(slot_ids):
+    """Drops every cached decision for these slots."""
+    return _submit(list, list(slot_ids))
+
+
+def purge_campaigns(campaign_ids):
+    """purge_slots() for the slots these campaigns serve in."""
+    return _submit(_campaign_slots, list(campaign_ids))
+
+
+def purge_creatives(creative_ids):
+    """purge_slots() for the slots these creatives' campaigns serve in."""
+    return _submit(_creative_slots, list(creative_ids))
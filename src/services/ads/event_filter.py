@@ -0,0 +1,126 @@
+# src/services/ads/event_filter.py
+"""
+Duplicate + Click-Rate Filter
+-----------------------------
+
+Sits in front of counting and billing in the tracking path:
+
+    check(kind, ip, ua, campaign_id[, extra]) → None | "duplicate" | "rate_limited"
+
+duplicate     the same (kind, ip, ua, campaign) within
+              EVENT_DEDUP_WINDOW_SECONDS. Keys are 64-bit hashes kept in
+              two time-bucketed sets that rotate every window, so memory
+              is bounded by ~2 windows of traffic (and EVENT_DEDUP_MAX_KEYS).
+              Batch uploads pass the event's per-serve token as `extra`,
+              so a retried upload is a duplicate but two real views are
+              not.
+rate_limited  clicks only: a token bucket per IP (CLICK_RATE_PER_SECOND,
+              CLICK_RATE_BURST).
+
+Flagged events are still logged (with "suspicious": reason) so fraud can
+be reviewed, but they do not move campaign counters or spend.
+
+A check is two set probes and a little arithmetic — microseconds. State
+is per worker process, like frequency capping: a soft filter.
+"""
+
+import threading
+import time
+
+from config.settings import settings
+from utils.metrics import SUSPICIOUS_EVENTS
+from .frequency_cap import hash_viewer
+
+
+class RotatingKeySet:
+    """Remembers keys for between one and two windows."""
+
+    def __init__(self, window_seconds: float, max_keys: int):
+        self.window = window_seconds
+        self.max_keys = max_keys
+
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = time.monotonic()
+
+    def add(self, key: int, now: float) -> bool:
+        """Adds the key. True if it was already present (a duplicate)."""
+        if now - self._rotated_at >= self.window or len(self._current) >= self.max_keys:
+            self._previous = self._current
+            self._current = set()
+            self._rotated_at = now
+
+        if key in self._current or key in self._previous:
+            return True
+
+        self._current.add(key)
+        return False
+
+
+class TokenBuckets:
+    """One token bucket per key; idle buckets are dropped every window."""
+
+    def __init__(self, rate: float, burst: float, window_seconds: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.window = window_seconds
+        self.max_keys = max_keys
+
+        self._buckets = {}  # key → (tokens, last refill)
+        self._swept_at = time.monotonic()
+
+    def take(self, key: int, now: float) -> bool:
+        """Spends one token. False when the bucket is empty."""
+        if now - self._swept_at >= self.window or len(self._buckets) >= self.max_keys:
+            # A bucket idle for burst / rate seconds is full again anyway
+            idle = self.burst / self.rate if self.rate > 0 else self.window
+            self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < idle}
+            self._swept_at = now
+
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+
+class EventFilter:
+    def __init__(self, enabled: bool, window_seconds: float, max_keys: int,
+                 click_rate: float, click_burst: float):
+        self.enabled = enabled
+        self._seen = RotatingKeySet(window_seconds, max_keys)
+        self._clicks = TokenBuckets(click_rate, click_burst, window_seconds, max_keys)
+        self._lock = threading.Lock()
+
+    def check(self, kind: str, ip, ua, campaign_id: str, extra="", now: float = None):
+        """None for a clean event, else the reason it is suspicious."""
+        if not self.enabled:
+            return None
+
+        now = now if now is not None else time.monotonic()
+        event_key = hash_viewer(f"{kind}|{ip or ''}|{ua or ''}|{campaign_id}|{extra}")
+
+        with self._lock:
+            if self._seen.add(event_key, now):
+                reason = "duplicate"
+            elif kind == "click" and ip and not self._clicks.take(hash_viewer(f"ip:{ip}"), now):
+                reason = "rate_limited"
+            else:
+                return None
+
+        SUSPICIOUS_EVENTS.labels(kind=kind, reason=reason).inc()
+        return reason
+
+
+# Process-wide filter used by the tracking endpoints
+event_filter = EventFilter(
+    enabled=settings.EVENT_FILTER_ENABLED,
+    window_seconds=settings.EVENT_DEDUP_WINDOW_SECONDS,
+    max_keys=settings.EVENT_DEDUP_MAX_KEYS,
+    click_rate=settings.CLICK_RATE_PER_SECOND,
+    click_burst=settings.CLICK_RATE_BURST,
+)
@@ -0,0 +1,126 @@
+# src/services/ads/frequency_cap.py
+"""
+Frequency Capping
+-----------------
+
+Limits how often one viewer sees the same campaign:
+    max N impressions per (viewer, campaign) per sliding window.
+
+Storage is in-process and compact:
+    • viewers are keyed by a 64-bit hash (raw ids/IPs are never stored)
+    • two generations of {(viewer_hash, campaign_id): [timestamps]}
+      rotate every window, so memory is bounded by ~2 windows of traffic
+      (and hard-capped by FREQ_CAP_MAX_KEYS)
+
+A lookup is two dict probes — microseconds per candidate.
+
+Counters are per worker process. With W workers a viewer can see a
+campaign up to W×N times in the worst case; the cap is a soft limit.
+"""
+
+import hashlib
+import threading
+import time
+
+from config.settings import settings
+
+
+def hash_viewer(raw: str) -> int:
+    """Stable 64-bit viewer key (blake2b)."""
+    return int.from_bytes(hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def viewer_key(viewer_id: str = None, ip: str = None, ua: str = None):
+    """
+    Viewer identity for capping: explicit viewer id from the child app,
+    otherwise IP + User-Agent. None when nothing identifies the viewer.
+    """
+    if viewer_id:
+        return hash_viewer(f"v:{viewer_id}")
+    if ip:
+        return hash_viewer(f"n:{ip}|{ua or ''}")
+    return None
+
+
+class FrequencyCapper:
+    def __init__(self, max_impressions: int, window_seconds: int, max_keys: int):
+        self.max_impressions = max_impressions
+        self.window = window_seconds
+        self.max_keys = max_keys
+
+        self._current = {}
+        self._previous = {}
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self, now: float):
+        if now - self._rotated_at >= self.window:
+            # Anything in `previous` is now older than one full window
+            self._previous = self._current
+            self._current = {}
+            self._rotated_at = now
+
+    def _recent(self, key, now: float) -> int:
+        cutoff = now - self.window
+        seen = 0
+        for generation in (self._current, self._previous):
+            stamps = generation.get(key)
+            if stamps:
+                seen += sum(1 for t in stamps if t > cutoff)
+        return seen
+
+    def is_capped(self, viewer: int, campaign_id: str, cap: int = None, now: float = None) -> bool:
+        cap = self.max_impressions if cap is None else cap
+        if viewer is None or cap <= 0:
+            return False
+
+        now = now if now is not None else time.monotonic()
+        return self._recent((viewer, campaign_id), now) >= cap
+
+    def record(self, viewer: int, campaign_id: str, cap: int = None, now: float = None):
+        cap = self.max_impressions if cap is None else cap
+        if viewer is None or cap <= 0:
+            return
+
+        now = now if now is not None else time.monotonic()
+        key = (viewer, campaign_id)
+
+        with self._lock:
+            self._rotate(now)
+
+            stamps = self._current.get(key)
+            if stamps is None:
+                if len(self._current) >= self.max_keys:
+                    # Memory guard: start a fresh generation early
+                    self._previous = self._current
+                    self._current = {}
+                    self._rotated_at = now
+                stamps = self._current[key] = []
+
+            stamps.append(now)
+
+            # Never need more than `cap` stamps per generation
+            if len(stamps) > cap:
+                del stamps[0]
+
+    def reset(self):
+        with self._lock:
+            self._current = {}
+            self._previous = {}
+
+
+# Process-wide capper used by the bidding engine
+frequency_capper = FrequencyCapper(
+    max_impressions=settings.FREQ_CAP_IMPRESSIONS,
+    window_seconds=settings.FREQ_CAP_WINDOW_SECONDS,
+    max_keys=settings.FREQ_CAP_MAX_KEYS,
+)
+
+
+def campaign_cap(campaign: dict) -> int:
+    """Per-campaign override ("frequency_cap") or the global default."""
+    cap = campaign.get("frequency_cap")
+    try:
+        return int(cap) if cap is not None else settings.FREQ_CAP_IMPRESSIONS
+    except (TypeError, ValueError):
+        return settings.FREQ_CAP_IMPRESSIONS
@@ -0,0 +1,142 @@
+# src/services/ads/pacing.py
+"""
+Budget Pacing
+-------------
+
+Spreads each campaign's `daily_budget` evenly over the day instead of
+letting it burn out in the first hour.
+
+Once per PACING_INTERVAL_SECONDS a background thread (one per process):
+    1. sums today's ad_spend transactions per campaign (one aggregate)
+    2. compares them with the even-pacing target:
+           target = daily_budget × fraction of the day elapsed (IST)
+    3. updates a serve probability ("throttle") per campaign
+
+The auction only does `random() < throttle` for the candidates it
+actually considers — no DB reads per ad request.
+
+Campaigns without a daily_budget are never throttled.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.background import PeriodicTask
+from utils.timezone import IST
+
+
+# -----------------------------------------------------
+# Controller maths (pure)
+# -----------------------------------------------------
+def day_window(now: datetime = None):
+    """(start of today in IST as naive UTC, fraction of the IST day elapsed)."""
+    now = now or datetime.now(timezone.utc)
+    local = now.astimezone(IST)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    fraction = (local - midnight) / timedelta(days=1)
+    start_utc = midnight.astimezone(timezone.utc).replace(tzinfo=None)
+    return start_utc, fraction
+
+
+def compute_throttle(previous: float, spent_today: float, daily_budget: float, day_fraction: float) -> float:
+    """
+    Next serve probability for one campaign.
+
+    Multiplicative controller: when spend runs ahead of the even-pacing
+    target the throttle shrinks in proportion, when it lags it grows
+    (at most PACING_MAX_STEP× per interval). Budget spent → 0.
+    """
+    if daily_budget <= 0:
+        return 1.0
+
+    if spent_today >= daily_budget:
+        return 0.0
+
+    # Small floor so early-morning spend does not divide by ~0
+    target = daily_budget * max(day_fraction, 1.0 / 96)
+
+    if spent_today <= 0:
+        ratio = settings.PACING_MAX_STEP
+    else:
+        ratio = min(target / spent_today, settings.PACING_MAX_STEP)
+
+    throttle = (previous or settings.PACING_MIN_THROTTLE) * ratio
+    return max(settings.PACING_MIN_THROTTLE, min(1.0, throttle))
+
+
+# -----------------------------------------------------
+# Controller (per process)
+# -----------------------------------------------------
+class PacingController:
+    def __init__(self, interval_seconds: float):
+        self._throttles = {}
+        self._day_start = None
+        self.task = PeriodicTask("pacing", interval_seconds, self.refresh, enabled=settings.PACING_ENABLED)
+
+    # ---------- auction side ----------
+    def throttle(self, campaign_id: str) -> float:
+        return self._throttles.get(campaign_id, 1.0)
+
+    def is_throttled(self, campaign: dict) -> bool:
+        """Random serve check: True → skip this campaign for this request."""
+        throttle = self._throttles.get(str(campaign["_id"]))
+        if throttle is None or throttle >= 1.0:
+            return False
+        return random.random() >= throttle
+
+    # ---------- refresh side ----------
+    def _load(self, day_start: datetime):
+        campaigns_col = get_collection("campaigns", profile="serving")
+        tx_col = get_collection("transactions", profile="serving")
+
+        budgets = {
+            str(doc["_id"]): float(doc.get("daily_budget") or 0)
+            for doc in campaigns_col.find(
+                {"status": "approved", "daily_budget": {"$gt": 0}},
+                {"daily_budget": 1},
+            )
+        }
+
+        if not budgets:
+            return {}, {}
+
+        spent = {
+            row["_id"]: float(row["spent"] or 0)
+            for row in tx_col.aggregate([
+                {"$match": {
+                    "transaction_type": "ad_spend",
+                    "created_at": {"$gte": day_start},
+                    "campaign_id": {"$in": list(budgets)},
+                }},
+                {"$group": {"_id": "$campaign_id", "spent": {"$sum": "$amount"}}},
+            ])
+        }
+
+        return budgets, spent
+
+    def refresh(self, now: datetime = None):
+        day_start, fraction = day_window(now)
+        budgets, spent = self._load(day_start)
+
+        # New day → everyone starts unthrottled
+        previous = self._throttles if day_start == self._day_start else {}
+
+        self._throttles = {
+            cid: compute_throttle(previous.get(cid, 1.0), spent.get(cid, 0.0), budget, fraction)
+            for cid, budget in budgets.items()
+        }
+        self._day_start = day_start
+
+    def ensure_started(self):
+        """Starts the per-process refresh thread (see utils/background.py)."""
+        self.task.ensure_started()
+
+    def stop(self):
+        self.task.stop()
+
+
+# Process-wide controller used by the bidding engine
+pacing_controller = PacingController(interval_seconds=settings.PACING_INTERVAL_SECONDS)
@@ -0,0 +1,106 @@
+# src/services/ads/schedule.py
+"""
+Campaign Scheduling
+-------------------
+
+Honours `start_date` / `end_date` (user/campaign.create_campaign):
+
+    • serving side — every slot snapshot (serving_cache) keeps a min-heap
+      of upcoming start / end boundaries and flips campaigns on and off
+      in memory exactly when one passes; no query per request
+    • storage side — sweep_ended_campaigns() bulk-marks campaigns past
+      their end as "ended", run by a per-process PeriodicTask
+
+Dates entered without a time (the campaign form stores midnight) are
+inclusive: a campaign ending 2026-01-31 serves until the end of that day.
+Times are naive UTC, like every other timestamp in the campaigns collection.
+"""
+
+from datetime import datetime, timedelta
+
+from config.settings import settings
+from database.connection import get_collection
+from utils.background import PeriodicTask
+from utils.logging import app_logger
+
+
+# -----------------------------------------------------
+# Boundaries
+# -----------------------------------------------------
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else None
+
+
+def schedule_bounds(campaign: dict):
+    """(start, end) of the serving window; either may be None (open)."""
+    start = _as_datetime(campaign.get("start_date"))
+    end = _as_datetime(campaign.get("end_date"))
+
+    # Date-only end → serve through the whole day
+    if end is not None and end.time() == datetime.min.time():
+        end = end + timedelta(days=1)
+
+    return start, end
+
+
+def is_live(campaign: dict, now: datetime = None) -> bool:
+    now = now or datetime.utcnow()
+    start, end = schedule_bounds(campaign)
+    return (start is None or start <= now) and (end is None or now < end)
+
+
+def not_ended_query(now: datetime = None) -> dict:
+    """
+    Mongo filter dropping campaigns whose end_date has certainly passed
+    (a superset of the live ones; snapshots apply the exact boundary).
+    """
+    now = now or datetime.utcnow()
+    return {
+        "$or": [
+            {"end_date": None},
+            {"end_date": {"$gte": now - timedelta(days=1)}},
+        ]
+    }
+
+
+# -----------------------------------------------------
+# Sweeper: mark ended campaigns in bulk
+# -----------------------------------------------------
+def sweep_ended_campaigns(now: datetime = None) -> int:
+    """Sets status "ended" on approved campaigns past their end. Returns count."""
+    from .serving_cache import serving_cache  # serving_cache imports this module
+    from .edge_cache import purge_slots
+
+    now = now or datetime.utcnow()
+    campaigns_col = get_collection("campaigns")
+
+    ended = [
+        doc for doc in campaigns_col.find(
+            {"status": "approved", "end_date": {"$lt": now}},
+            {"end_date": 1, "slot_id": 1},
+        )
+        if not is_live(doc, now)
+    ]
+
+    if not ended:
+        return 0
+
+    result = campaigns_col.update_many(
+        {"_id": {"$in": [doc["_id"] for doc in ended]}, "status": "approved"},
+        {"$set": {"status": "ended", "updated_at": now}},
+    )
+
+    ended_slots = {doc.get("slot_id") for doc in ended}
+    for slot_id in ended_slots:
+        serving_cache.invalidate(slot_id)
+    purge_slots(ended_slots)
+
+    app_logger.info(f"[SCHEDULE] ended {result.modified_count} campaign(s) past end_date")
+    return result.modified_count
+
+
+schedule_sweeper = PeriodicTask(
+    "schedule-sweeper",
+    settings.SCHEDULE_SWEEP_INTERVAL_SECONDS,
+    sweep_ended_campaigns,
+)
@@ -0,0 +1,141 @@
+# src/services/ads/serving_cache.py
+"""
+Serving Cache
+-------------
+
+Per-slot, in-process snapshots of the auction candidates:
+
+    slot_id → SlotSnapshot(pairs, TargetingIndex, built_at)
+
+A snapshot holds every approved, funded campaign of the slot joined with
+its approved creative, plus the targeting bitset index over them. Ad
+requests read the snapshot instead of querying MongoDB; it is reloaded
+once older than SERVING_CACHE_TTL_SECONDS.
+
+Campaign schedules (start_date / end_date) are applied per snapshot: an
+"active" bitmask plus a min-heap of upcoming boundaries, popped lazily
+as requests arrive (see schedule.py).
+
+Writers swap the dict entry; readers never lock.
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from config.settings import settings
+from .schedule import schedule_bounds
+from .targeting_engine import TargetingIndex
+
+_START, _END = 0, 1
+
+
+class SlotSnapshot:
+    __slots__ = (
+        "slot_id", "pairs", "index", "built_at", "positions",
+        "_active", "_removed", "_boundaries", "_lock",
+    )
+
+    def __init__(self, slot_id: str, pairs: list, built_at: float = None, now: datetime = None):
+        self.slot_id = slot_id
+        self.pairs = pairs
+        self.index = TargetingIndex(pairs)
+        self.built_at = built_at if built_at is not None else time.monotonic()
+        self._lock = threading.Lock()
+        self.positions = {str(campaign["_id"]): i for i, (campaign, _) in enumerate(pairs)}
+
+        now = now or datetime.utcnow()
+        self._active = 0
+        self._removed = 0  # evicted campaigns (budget exhausted, paused, …)
+        self._boundaries = []  # (when, _START | _END, index) — start before end on ties
+
+        for i, (campaign, _) in enumerate(pairs):
+            bit = 1 << i
+            start, end = schedule_bounds(campaign)
+
+            if end is not None and end <= now:
+                continue  # already over
+
+            if start is None or start <= now:
+                self._active |= bit
+            else:
+                self._boundaries.append((start, _START, i))
+
+            if end is not None:
+                self._boundaries.append((end, _END, i))
+
+        heapq.heapify(self._boundaries)
+
+    def active_mask(self, now: datetime = None) -> int:
+        """Campaigns inside their schedule window right now, minus evicted ones."""
+        if not self._boundaries:
+            return self._active & ~self._removed
+
+        now = now or datetime.utcnow()
+        if self._boundaries[0][0] > now:
+            return self._active & ~self._removed
+
+        with self._lock:
+            while self._boundaries and self._boundaries[0][0] <= now:
+                _, kind, i = heapq.heappop(self._boundaries)
+                if kind == _START:
+                    self._active |= 1 << i
+                else:
+                    self._active &= ~(1 << i)
+
+        return self._active & ~self._removed
+
+    def remove(self, campaign_ids) -> bool:
+        """Evicts campaigns from this snapshot. True if any was present."""
+        mask = 0
+        for campaign_id in campaign_ids:
+            i = self.positions.get(campaign_id)
+            if i is not None:
+                mask |= 1 << i
+
+        if mask:
+            with self._lock:
+                self._removed |= mask
+        return bool(mask)
+
+    def candidates(self, context: dict = None, now: datetime = None) -> list:
+        return self.index.select(self.index.match(context) & self.active_mask(now))
+
+
+class ServingCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def get(self, slot_id: str):
+        """Fresh snapshot for the slot, or None (missing / expired)."""
+        snapshot = self._snapshots.get(slot_id)
+        if snapshot is None or time.monotonic() - snapshot.built_at > self.ttl:
+            return None
+        return snapshot
+
+    def put(self, slot_id: str, pairs: list) -> SlotSnapshot:
+        snapshot = SlotSnapshot(slot_id, pairs)
+        with self._lock:
+            self._snapshots[slot_id] = snapshot
+        return snapshot
+
+    def evict_campaigns(self, campaign_ids):
+        """Removes campaigns from every cached slot without a reload."""
+        campaign_ids = {str(cid) for cid in campaign_ids}
+        for snapshot in list(self._snapshots.values()):
+            snapshot.remove(campaign_ids)
+
+    def invalidate(self, slot_id: str = None):
+        """Drops one slot (or every slot); the next request reloads it."""
+        with self._lock:
+            if slot_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(slot_id, None)
+
+
+# Process-wide cache used by the bidding engine (sync + async serving)
+serving_cache = ServingCache(ttl_seconds=settings.SERVING_CACHE_TTL_SECONDS)
@@ -0,0 +1,186 @@
+# src/services/ads/targeting_engine.py
+"""
+Targeting Engine
+----------------
+
+Matches the request context of an ad call against the campaign targeting
+fields (see campaign_model.serialize_campaign):
+
+    devices     → device     e.g. ["mobile", "desktop"]
+    locations   → location   e.g. ["IN", "US"]
+    categories  → category   e.g. ["fashion"]
+    age_min/max → age        bucket "18-24", "25-34", …
+    gender      → gender     "male" / "female" / "all"
+
+Per slot, campaigns are numbered 0..n-1 and every targeting value maps
+to an int bitmask of the campaigns that accept it. Matching a request is
+one AND per dimension — no query-time filtering, no per-campaign loop.
+
+Semantics:
+    • a campaign with no value for a dimension accepts everything
+    • a request without a value for a dimension only matches campaigns
+      that do not target that dimension
+    • without ?device=, the device class is read from the User-Agent
+"""
+
+from utils.user_agent import classify_user_agent, device_name
+
+# (label, min_age, max_age) — inclusive
+AGE_BUCKETS = (
+    ("13-17", 13, 17),
+    ("18-24", 18, 24),
+    ("25-34", 25, 34),
+    ("35-44", 35, 44),
+    ("45-54", 45, 54),
+    ("55-64", 55, 64),
+    ("65+", 65, 200),
+)
+
+DIMENSIONS = ("device", "location", "category", "age", "gender")
+
+# Values that mean "no restriction"
+_ANY = {"", "all", "any", "*"}
+
+
+# -----------------------------------------------------
+# Normalisation
+# -----------------------------------------------------
+def _norm(value) -> str:
+    return str(value).strip().lower()
+
+
+def _value_set(raw):
+    """Campaign field → set of normalised values, or None (untargeted)."""
+    if raw is None:
+        return None
+
+    if isinstance(raw, str):
+        raw = raw.split(",")
+
+    values = {_norm(v) for v in raw if v is not None} - _ANY
+    return values or None
+
+
+def _int_or_none(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def age_bucket(age) -> str:
+    """Age (int or numeric string) or bucket label → bucket label, or None."""
+    if isinstance(age, str) and any(age.strip() == label for label, _, _ in AGE_BUCKETS):
+        return age.strip()
+
+    age = _int_or_none(age)
+    if age is None:
+        return None
+
+    for label, low, high in AGE_BUCKETS:
+        if low <= age <= high:
+            return label
+    return None
+
+
+def _age_buckets(age_min, age_max):
+    low, high = _int_or_none(age_min), _int_or_none(age_max)
+    if low is None and high is None:
+        return None
+
+    low = low if low is not None else 0
+    high = high if high is not None else 200
+    return {label for label, b_low, b_high in AGE_BUCKETS if b_low <= high and b_high >= low}
+
+
+def campaign_targeting(campaign: dict) -> dict:
+    """{dimension: set of accepted values or None} for one campaign."""
+    return {
+        "device": _value_set(campaign.get("devices")),
+        "location": _value_set(campaign.get("locations")),
+        "category": _value_set(campaign.get("categories")),
+        "age": _age_buckets(campaign.get("age_min"), campaign.get("age_max")),
+        "gender": _value_set(campaign.get("gender")),
+    }
+
+
+def request_context(args, user_agent: str = None) -> dict:
+    """
+    Request context from query args (?device=&location=&category=&age=&gender=).
+    `age` may be a number or a bucket label. Missing values are None;
+    a missing device falls back to the User-Agent's device class.
+    """
+    context = {}
+    for dim in ("device", "location", "category", "gender"):
+        value = args.get(dim)
+        context[dim] = _norm(value) or None if value is not None else None
+
+    if context["device"] is None and user_agent:
+        context["device"] = device_name(classify_user_agent(user_agent).device)
+
+    context["age"] = age_bucket(args.get("age"))
+    return context
+
+
+# -----------------------------------------------------
+# Inverted index (per slot)
+# -----------------------------------------------------
+def mask_indices(mask: int):
+    """Yields the set bit positions of `mask`, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class TargetingIndex:
+    """
+    Bitset index over a fixed list of (campaign, creative) pairs.
+    Immutable once built; rebuild to change the candidate set.
+    """
+
+    __slots__ = ("pairs", "all_mask", "untargeted", "by_value")
+
+    def __init__(self, pairs: list):
+        self.pairs = pairs
+        self.all_mask = (1 << len(pairs)) - 1
+        self.untargeted = {dim: 0 for dim in DIMENSIONS}
+        self.by_value = {dim: {} for dim in DIMENSIONS}
+
+        for i, (campaign, _) in enumerate(pairs):
+            bit = 1 << i
+            for dim, values in campaign_targeting(campaign).items():
+                if values is None:
+                    self.untargeted[dim] |= bit
+                    continue
+
+                index = self.by_value[dim]
+                for value in values:
+                    index[value] = index.get(value, 0) | bit
+
+    def match(self, context: dict = None) -> int:
+        """Bitmask of the campaigns that accept `context`."""
+        mask = self.all_mask
+        context = context or {}
+
+        for dim in DIMENSIONS:
+            value = context.get(dim)
+            accepted = self.untargeted[dim]
+            if value is not None:
+                accepted |= self.by_value[dim].get(value, 0)
+
+            mask &= accepted
+            if not mask:
+                break
+
+        return mask
+
+    def select(self, mask: int) -> list:
+        """(campaign, creative) pairs for the set bits of `mask`, in index order."""
+        if mask == self.all_mask:
+            return self.pairs
+        return [self.pairs[i] for i in mask_indices(mask)]
+
+    def candidates(self, context: dict = None) -> list:
+        """Matching (campaign, creative) pairs, in index order."""
+        return self.select(self.match(context))
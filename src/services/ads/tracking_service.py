@@ -0,0 +1,768 @@
+# src/services/ads/tracking_service.py
+"""
+Tracking Service (Impressions + Clicks)
+---------------------------------------
+
+Driver-agnostic building blocks for the tracking endpoints.
+
+Used by:
+    - api/ads/ad_tracking_api.py (Flask, pymongo)
+    - api/ads/async_serving.py   (ASGI, motor)
+
+Nothing in here talks to MongoDB: callers run the documents and
+updates returned below with their own driver (UpdateOne works with
+both pymongo and motor).
+
+Beacon tokens (itsdangerous, signed with SECRET_KEY) carry the event in
+the URL itself, so pixels, sendBeacon and click redirects need no JSON
+body and no CORS preflight:
+
+    impression_token(campaign_id, slot_id)           → ?t= for the pixel / beacon
+    click_token(campaign_id, slot_id, redirect_url)  → /c/<token>
+
+The redirect target is signed too, so /c/ is never an open redirect.
+
+Edge-cached slot responses are shared by many viewers, so they carry no
+per-serve token. They carry a decision token instead:
+
+    decision_token(campaign_id, slot_id, redirect_url) → /api/ads/track/session?d=
+
+and the child app fetches its per-serve tracking URLs from that
+(uncached) endpoint.
+
+Batch uploads (POST /api/ads/track/batch) carry the same tokens per
+event: decode_batch() → plan_batch() → one bulk write per collection.
+
+Every impression / click passes flag_suspicious() (event_filter.py):
+duplicates and click floods are stored with "suspicious": <reason> but
+left out of campaign counters and billing.
+
+Events are idempotent. Each one carries an event_id (unique index on
+ads_impressions / ads_clicks / ads_conversions, database/ads_indexes.py):
+
+    event_id(kind, token=..., client_id=..., scope=...)
+
+derived from the signed per-serve token (it holds a nonce) whenever
+there is one; a caller-chosen id is then ignored, otherwise one token
+could be replayed under fresh ids and billed each time. Only conversions
+add the caller's order id (one click can lead to several orders).
+
+Unsigned (legacy bare-id) JSON posts are not authenticated anyway, so
+they may send their own "event_id" (≤ MAX_CLIENT_EVENT_ID chars), scoped
+to (kind, campaign_id); token-less conversion postbacks are keyed by
+order id within the viewer + campaign. A retried event hits
+DuplicateKeyError and moves no counter or spend, so child apps can retry
+freely.
+
+Recording runs the same code in both apps: record_impression_steps(),
+record_click_steps(), record_conversion_steps() and ingest_batch_steps()
+are generators that yield MongoOp calls and get the results sent back.
+run_steps() executes them with pymongo, run_steps_async() with motor.
+
+Conversions (postback, pixel or batch) are stored as pending documents
+(make_conversion_doc); services/ads/attribution.py joins them to the
+viewer's last click and rolls them up into the campaign. Clicks carry a
+`viewer` tag (viewer_tag) for that join.
+"""
+
+import hashlib
+import json
+import secrets
+import zlib
+from datetime import datetime
+from typing import NamedTuple
+from bson import ObjectId
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+try:
+    import msgpack
+except ImportError:  # optional: gzip NDJSON batches only
+    msgpack = None
+
+from config.settings import settings
+from utils.metrics import BILLING_FAILURES
+from utils.user_agent import ua_fields
+from .edge_cache import purge_slots
+from .event_filter import event_filter
+from .frequency_cap import viewer_key
+from .serving_cache import serving_cache
+
+
+# 1×1 transparent GIF returned by the impression pixel
+TRANSPARENT_GIF = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff"
+    b"!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00"
+    b"\x00\x02\x02D\x01\x00;"
+)
+
+
+# -----------------------------------------------------
+# Utility: Safe ObjectId conversion
+# -----------------------------------------------------
+def safe_oid(val):
+    try:
+        return ObjectId(val)
+    except Exception:
+        return None
+
+
+# -----------------------------------------------------
+# Request validation
+# -----------------------------------------------------
+def parse_tracking_payload(data: dict):
+    """
+    Validates an impression/click payload.
+
+    Returns:
+        (campaign_id, campaign_oid, slot_id)
+
+    Raises:
+        ValueError with the public error message.
+    """
+    data = data or {}
+
+    campaign_id = data.get("campaign_id")
+    slot_id = data.get("slot_id")
+
+    if not campaign_id:
+        raise ValueError("campaign_id missing")
+
+    cid = safe_oid(campaign_id)
+    if not cid:
+        raise ValueError("invalid campaign_id")
+
+    return campaign_id, cid, slot_id
+
+
+# -----------------------------------------------------
+# Beacon tokens
+# -----------------------------------------------------
+_impression_signer = URLSafeTimedSerializer(settings.SECRET_KEY, salt="dcorp-ad-impression")
+_click_signer = URLSafeTimedSerializer(settings.SECRET_KEY, salt="dcorp-ad-click")
+_decision_signer = URLSafeTimedSerializer(settings.SECRET_KEY, salt="dcorp-ad-decision")
+
+
+# The nonce makes every served decision's token (and so its event_id) unique
+def impression_token(campaign_id: str, slot_id: str) -> str:
+    return _impression_signer.dumps([campaign_id, slot_id, secrets.token_hex(6)])
+
+
+def click_token(campaign_id: str, slot_id: str, redirect_url: str) -> str:
+    return _click_signer.dumps([campaign_id, slot_id, redirect_url, secrets.token_hex(6)])
+
+
+def decision_token(campaign_id: str, slot_id: str, redirect_url: str) -> str:
+    """No nonce: identical for every viewer of a cached decision."""
+    return _decision_signer.dumps([campaign_id, slot_id, redirect_url])
+
+
+def _load_token(signer, token: str) -> list:
+    if not token:
+        raise ValueError("token missing")
+    try:
+        return signer.loads(token, max_age=settings.TRACKING_TOKEN_MAX_AGE_SECONDS)
+    except BadSignature:  # includes SignatureExpired
+        raise ValueError("invalid token") from None
+
+
+def parse_impression_token(token: str):
+    """Same return value as parse_tracking_payload(). Raises ValueError."""
+    campaign_id, slot_id = _load_token(_impression_signer, token)[:2]
+    return parse_tracking_payload({"campaign_id": campaign_id, "slot_id": slot_id})
+
+
+def parse_decision_token(token: str):
+    """(campaign_id, slot_id, redirect_url). Raises ValueError."""
+    campaign_id, slot_id, redirect_url = _load_token(_decision_signer, token)[:3]
+    parse_tracking_payload({"campaign_id": campaign_id, "slot_id": slot_id})
+    return campaign_id, slot_id, redirect_url
+
+
+def parse_click_token(token: str):
+    """(campaign_id, campaign_oid, slot_id, redirect_url). Raises ValueError."""
+    campaign_id, slot_id, redirect_url = _load_token(_click_signer, token)[:3]
+    return (*parse_tracking_payload({"campaign_id": campaign_id, "slot_id": slot_id}), redirect_url)
+
+
+# -----------------------------------------------------
+# Event ids (idempotent tracking)
+# -----------------------------------------------------
+DUPLICATE_KEY = 11000
+MAX_CLIENT_EVENT_ID = 128
+
+
+def event_id(kind: str, token: str = None, client_id=None, scope: str = ""):
+    """
+    Stable id for one event.
+
+        signed     from the token; conversions add the client's order id,
+                   any other client id is ignored
+        unsigned   the client's id within `scope` (campaign, or viewer +
+                   campaign for conversions)
+
+    None when there is nothing to key on.
+    Raises ValueError for a malformed client id.
+    """
+    if client_id is None or client_id == "":
+        client_id = None
+    elif isinstance(client_id, bool) or not isinstance(client_id, (str, int)) \
+            or len(str(client_id)) > MAX_CLIENT_EVENT_ID:
+        raise ValueError("invalid event_id")
+
+    if token:
+        if kind != "conversion":
+            client_id = None
+        source = f"t|{token}" if client_id is None else f"t|{token}|{client_id}"
+    elif client_id is not None:
+        source = f"id|{scope}|{client_id}"
+    else:
+        return None
+
+    return hashlib.blake2b(f"{kind}|{source}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def parse_tracked_event(kind: str, data: dict):
+    """
+    JSON impression / click body → (campaign_id, campaign_oid, slot_id, event_id).
+
+        {"t": <token>}                                   signed, idempotent
+        {"campaign_id", "slot_id", "event_id": <opt>}    legacy bare ids
+
+    Raises ValueError with the public error message.
+    """
+    data = data or {}
+    token = data.get("t")
+
+    if token:
+        parse = parse_impression_token if kind == "impression" else parse_click_token
+        campaign_id, cid, slot_id = parse(token)[:3]
+    else:
+        campaign_id, cid, slot_id = parse_tracking_payload(data)
+
+    return campaign_id, cid, slot_id, event_id(kind, token, data.get("event_id"), scope=str(campaign_id))
+
+
+def inserted_docs(docs: list, error: BulkWriteError = None) -> list:
+    """
+    The documents an insert_many(ordered=False) actually wrote.
+    Duplicate event ids are skipped; any other write error is re-raised.
+    """
+    if error is None:
+        return docs
+
+    write_errors = error.details.get("writeErrors", [])
+    if any(e.get("code") != DUPLICATE_KEY for e in write_errors):
+        raise error
+
+    skipped = {e["index"] for e in write_errors}
+    return [doc for i, doc in enumerate(docs) if i not in skipped]
+
+
+def batch_counters(impressions: list, clicks: list) -> dict:
+    """{campaign_oid: {"impressions": n, "clicks": n}} over newly written, clean events."""
+    counters = {}
+    for kind, docs in (("impressions", impressions), ("clicks", clicks)):
+        for doc in docs:
+            if doc.get("suspicious"):
+                continue
+            cid = safe_oid(doc["campaign_id"])
+            counters.setdefault(cid, {"impressions": 0, "clicks": 0})[kind] += 1
+    return counters
+
+
+# -----------------------------------------------------
+# Batch uploads (gzip NDJSON / msgpack)
+# -----------------------------------------------------
+class BatchError(ValueError):
+    """Unusable batch body; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _gunzip(body: bytes, limit: int) -> bytes:
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = inflater.decompress(body, limit + 1)
+    except zlib.error:
+        raise BatchError("invalid gzip body") from None
+    if len(data) > limit or inflater.unconsumed_tail:
+        raise BatchError("batch too large", 413)
+    return data
+
+
+def decode_batch(body: bytes, content_type: str = None) -> list:
+    """
+    Batch body → list of event dicts, in one pass.
+
+        application/x-ndjson   one JSON event per line
+        application/msgpack    one array of events (needs `msgpack`)
+
+    Either may be gzip-compressed (detected from the gzip magic bytes, so
+    Content-Encoding is optional). Raises BatchError.
+    """
+    limit = settings.TRACKING_BATCH_MAX_BYTES
+    body = body or b""
+
+    if body[:2] == b"\x1f\x8b":
+        body = _gunzip(body, limit)
+    elif len(body) > limit:
+        raise BatchError("batch too large", 413)
+
+    content_type = (content_type or "").split(";")[0].strip().lower()
+
+    if content_type in ("application/msgpack", "application/x-msgpack"):
+        if msgpack is None:
+            raise BatchError("msgpack not supported on this server", 415)
+        try:
+            events = msgpack.unpackb(body, raw=False)
+        except Exception:
+            raise BatchError("invalid msgpack body") from None
+        if not isinstance(events, list):
+            raise BatchError("msgpack body must be an array of events")
+    else:
+        try:
+            events = [json.loads(line) for line in body.splitlines() if line.strip()]
+        except ValueError:
+            raise BatchError("invalid NDJSON body") from None
+
+    if len(events) > settings.TRACKING_BATCH_MAX_EVENTS:
+        raise BatchError(f"at most {settings.TRACKING_BATCH_MAX_EVENTS} events per batch", 413)
+
+    return events
+
+
+def _event_time(value, now: datetime) -> datetime:
+    """Client epoch seconds → datetime, never in the future."""
+    try:
+        when = datetime.utcfromtimestamp(float(value))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return now
+    return min(when, now)
+
+
+def plan_batch(events: list, ip, ua, now: datetime = None) -> dict:
+    """
+    Validates every event and groups the writes:
+
+        event = {"type": "impression", "t": <impression token>, "ts": <epoch s>}
+              | {"type": "click",      "t": <click token>, "ts": ..., "viewer_id": <optional>}
+              | {"type": "conversion", ...make_conversion_doc() params...}
+
+    Returns:
+        {
+            "impressions": [docs], "clicks": [docs], "conversions": [docs],
+            "rejected": [{"index": i, "error": "..."}],
+        }
+
+    Counters are derived after the insert (batch_counters), from the
+    documents that were not duplicates.
+    """
+    now = now or datetime.utcnow()
+    plan = {"impressions": [], "clicks": [], "conversions": [], "rejected": []}
+
+    for i, event in enumerate(events):
+        try:
+            if not isinstance(event, dict):
+                raise ValueError("event must be an object")
+
+            kind = event.get("type")
+            if kind == "conversion":
+                plan["conversions"].append(make_conversion_doc(event, ip, ua, now))
+                continue
+
+            if kind == "impression":
+                campaign_id, _, slot_id = parse_impression_token(event.get("t"))
+            elif kind == "click":
+                campaign_id, _, slot_id, _ = parse_click_token(event.get("t"))
+            else:
+                raise ValueError("unknown event type")
+
+            doc = make_event_doc(
+                campaign_id, slot_id, ip, ua, _event_time(event.get("ts"), now),
+                event_id=event_id(kind, event.get("t")),
+            )
+            if kind == "click":
+                set_viewer(doc, event.get("viewer_id"), ip, ua)
+
+            # Keyed on the token (one per serve), not the client-chosen ts
+            flag_suspicious(kind, doc, ip, ua, extra=event.get("t"))
+            plan[kind + "s"].append(doc)
+
+        except ValueError as e:
+            plan["rejected"].append({"index": i, "error": str(e)})
+
+    return plan
+
+
+def plan_batch_campaign_writes(counters: dict, campaigns: dict) -> dict:
+    """
+    Counter increments + CPC billing for a planned batch.
+
+        counters  = batch_counters(...)
+        campaigns = {campaign_oid: campaign doc} for the clicked campaigns
+
+    Returns:
+        {
+            "ops": [UpdateOne, ...],     # one bulk_write on campaigns
+            "transactions": [...],       # one insert_many
+            "exhausted": [(campaign_id, slot_id), ...],
+        }
+    """
+    plan = {"ops": [], "transactions": [], "exhausted": []}
+
+    for cid, counts in counters.items():
+        inc = {field: n for field, n in counts.items() if n}
+        plan["ops"].append(UpdateOne({"_id": cid}, {"$inc": inc}))
+
+        campaign = campaigns.get(cid)
+        if campaign is None or not counts["clicks"]:
+            continue
+
+        billing = plan_click_billing(campaign, str(cid), counts["clicks"])
+
+        if billing["update"]:
+            plan["ops"].append(UpdateOne({"_id": cid}, billing["update"]))
+
+        if billing["transaction"]:
+            plan["transactions"].append(billing["transaction"])
+
+        if billing["exhausted"]:
+            plan["exhausted"].append((str(cid), campaign.get("slot_id")))
+
+    return plan
+
+
+# -----------------------------------------------------
+# Raw event document
+# -----------------------------------------------------
+def make_event_doc(campaign_id: str, slot_id, ip, ua, timestamp: datetime = None, event_id: str = None) -> dict:
+    """
+    Document stored in ads_impressions / ads_clicks.
+    The User-Agent is stored as device / os / browser codes
+    (utils.user_agent), not as the raw string.
+    """
+    doc = {
+        "campaign_id": campaign_id,
+        "slot_id": slot_id,
+        "timestamp": timestamp or datetime.utcnow(),
+        "ip": ip,
+        **ua_fields(ua),
+    }
+    if event_id:
+        doc["event_id"] = event_id
+    return doc
+
+
+def flag_suspicious(kind: str, doc: dict, ip, ua, extra="") -> str:
+    """
+    Runs the event filter for an impression / click document.
+    Marks the document and returns the reason when it must not be
+    counted or billed; None for a clean event.
+    """
+    reason = event_filter.check(kind, ip, ua, doc["campaign_id"], extra)
+    if reason:
+        doc["suspicious"] = reason
+    return reason
+
+
+def viewer_tag(viewer_id, ip, ua):
+    """
+    frequency_cap.viewer_key() as 16 hex chars (BSON has no unsigned
+    64-bit int). None when nothing identifies the viewer.
+    """
+    key = viewer_key(viewer_id, ip, ua)
+    return None if key is None else f"{key:016x}"
+
+
+def set_viewer(doc: dict, viewer_id, ip, ua) -> dict:
+    """Adds the `viewer` tag used by the conversion attribution join."""
+    tag = viewer_tag(viewer_id, ip, ua)
+    if tag:
+        doc["viewer"] = tag
+    return doc
+
+
+# -----------------------------------------------------
+# Conversions (postback / pixel / batch)
+# -----------------------------------------------------
+def make_conversion_doc(params: dict, ip, ua, now: datetime = None) -> dict:
+    """
+    Pending ads_conversions document for a conversion postback.
+
+        t            click token → attributed to that click's campaign
+        viewer_id    otherwise the viewer (or IP + User-Agent) is joined
+                     to their last click within the lookback window
+        campaign_id  optional: only attribute to this campaign
+        value        order value (default 0)
+        id           the advertiser's order id (idempotency)
+        ts           epoch seconds (default now)
+
+    Raises ValueError with the public error message.
+    """
+    now = now or datetime.utcnow()
+    params = params or {}
+
+    try:
+        value = float(params.get("value") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("invalid conversion value") from None
+
+    token = params.get("t")
+    if token:
+        campaign_id, _, slot_id, _ = parse_click_token(token)
+        source = "token"
+    else:
+        campaign_id, slot_id, source = params.get("campaign_id") or None, None, "viewer"
+        if campaign_id is not None and safe_oid(campaign_id) is None:
+            raise ValueError("invalid campaign_id")
+
+    doc = make_event_doc(campaign_id, slot_id, ip, ua, _event_time(params.get("ts"), now))
+    set_viewer(doc, params.get("viewer_id"), ip, ua)
+
+    if source == "viewer" and "viewer" not in doc:
+        raise ValueError("viewer unknown")
+
+    eid = event_id("conversion", token, params.get("id"), scope=f"{doc.get('viewer')}|{campaign_id}")
+    if eid:
+        doc["event_id"] = eid
+
+    doc.update({
+        "value": value,
+        "source": source,
+        "attribution": "pending",
+        "received_at": now,
+    })
+    return doc
+
+
+# -----------------------------------------------------
+# CPC billing plan
+# -----------------------------------------------------
+def plan_click_billing(campaign: dict, campaign_id: str, clicks: int = 1) -> dict:
+    """
+    Decides what `clicks` clicks cost the campaign (1 for the live
+    endpoints, many for a batch upload).
+
+    Returns:
+        {
+            "update": {...} or None,       # update for the campaign doc
+            "transaction": {...} or None,  # spend log to insert
+            "exhausted": bool,             # budget used up → evict from serving
+        }
+
+    Status is never changed here: services/ads/budget_sweeper ends
+    exhausted campaigns in bulk.
+    """
+    bidding_type = (campaign.get("bidding_type") or "CPC").upper()
+    bid = float(campaign.get("bid_amount", 0) or 0)
+    current_budget = float(campaign.get("budget", 0) or 0)
+
+    if bidding_type != "CPC" or clicks <= 0:
+        return {"update": None, "transaction": None, "exhausted": False}
+
+    # Budget exhausted → zero it; the budget sweeper ends the campaign
+    if current_budget < bid:
+        return {
+            "update": {"$set": {"budget": 0}},
+            "transaction": None,
+            "exhausted": True,
+        }
+
+    # Clicks past the remaining budget are logged but not billed
+    billable = clicks if bid <= 0 else min(clicks, int((current_budget + 1e-9) // bid))
+    cost = bid * billable
+    now = datetime.utcnow()
+
+    if billable < clicks:
+        update = {"$inc": {"spend": cost}, "$set": {"budget": 0}}
+    else:
+        # Deduct from campaign budget and increase spend
+        update = {"$inc": {"spend": cost, "budget": -cost}}
+
+    return {
+        "update": update,
+
+        # Log a spend transaction (analytics-only)
+        "transaction": {
+            "user_id": campaign["user_id"],
+            "campaign_id": campaign_id,
+            "type": "info",
+            "transaction_type": "ad_spend",
+            "amount": cost,
+            "clicks": billable,
+            "created_at": now,
+            "reason": f"campaign:{campaign_id}",
+            "ref_id": f"CPC-{now.strftime('%Y%m%d%H%M%S')}",
+            "status": "logged"
+        },
+
+        "exhausted": billable < clicks or current_budget - cost <= 0,
+    }
+
+
+# -----------------------------------------------------
+# Recording (one implementation for pymongo and motor)
+# -----------------------------------------------------
+class MongoOp(NamedTuple):
+    """get_collection(collection, profile).method(*args, **kwargs); "find" → list of docs."""
+    collection: str
+    method: str
+    args: tuple = ()
+    kwargs: dict = None
+    profile: str = "default"
+
+
+def _op(collection: str, method: str, *args, profile: str = "default", **kwargs) -> MongoOp:
+    return MongoOp(collection, method, args, kwargs, profile)
+
+
+def record_impression_steps(campaign_id, cid, slot_id, ip, ua, event_id=None):
+    """Logs an impression; counts it unless it is a retry or suspicious."""
+    doc = make_event_doc(campaign_id, slot_id, ip, ua, event_id=event_id)
+    suspicious = flag_suspicious("impression", doc, ip, ua)
+
+    try:
+        yield _op("ads_impressions", "insert_one", doc, profile="tracking")
+    except DuplicateKeyError:
+        return  # retried event: already counted
+
+    # Logged for review, never counted / billed
+    if suspicious:
+        return
+
+    yield _op("campaigns", "update_one", {"_id": cid}, {"$inc": {"impressions": 1}})
+
+
+def record_click_steps(campaign_id, cid, slot_id, ip, ua, viewer_id=None, event_id=None):
+    """Logs + bills a click. Returns False if the campaign does not exist."""
+    doc = make_event_doc(campaign_id, slot_id, ip, ua, event_id=event_id)
+    set_viewer(doc, viewer_id, ip, ua)
+    suspicious = flag_suspicious("click", doc, ip, ua)
+
+    try:
+        yield _op("ads_clicks", "insert_one", doc, profile="tracking")
+    except DuplicateKeyError:
+        return True  # retried event: already counted + billed
+
+    # Logged for review, never counted / billed
+    if suspicious:
+        return True
+
+    campaign = yield _op("campaigns", "find_one", {"_id": cid})
+    if not campaign:
+        return False
+
+    yield _op("campaigns", "update_one", {"_id": cid}, {"$inc": {"clicks": 1}})
+
+    try:
+        billing = plan_click_billing(campaign, campaign_id)
+
+        if billing["update"]:
+            yield _op("campaigns", "update_one", {"_id": cid}, billing["update"])
+
+        if billing["transaction"]:
+            yield _op("transactions", "insert_one", billing["transaction"])
+
+        # Stop serving it from this process right away
+        if billing["exhausted"]:
+            serving_cache.evict_campaigns([campaign_id])
+            purge_slots([campaign.get("slot_id")])
+
+    except Exception as e:
+        BILLING_FAILURES.labels(reason=type(e).__name__).inc()
+        raise
+
+    return True
+
+
+def record_conversion_steps(doc: dict):
+    """Stores a pending conversion (make_conversion_doc)."""
+    try:
+        yield _op("ads_conversions", "insert_one", doc, profile="tracking")
+    except DuplicateKeyError:
+        pass  # retried postback: already stored
+
+
+def ingest_batch_steps(plan: dict):
+    """Writes a planned batch (one bulk write per collection). Returns the duplicate count."""
+    written = {}
+    for name, key in (("ads_impressions", "impressions"), ("ads_clicks", "clicks"), ("ads_conversions", "conversions")):
+        written[key] = plan[key]
+        if not plan[key]:
+            continue
+        try:
+            yield _op(name, "insert_many", plan[key], ordered=False, profile="tracking")
+        except BulkWriteError as e:
+            written[key] = inserted_docs(plan[key], e)
+
+    duplicates = sum(len(plan[key]) - len(docs) for key, docs in written.items())
+
+    # Only newly written events move counters / spend
+    counters = batch_counters(written["impressions"], written["clicks"])
+    if not counters:
+        return duplicates
+
+    clicked = [cid for cid, counts in counters.items() if counts["clicks"]]
+    docs = {}
+    if clicked:
+        docs = {doc["_id"]: doc for doc in (yield _op("campaigns", "find", {"_id": {"$in": clicked}}))}
+
+    try:
+        writes = plan_batch_campaign_writes(counters, docs)
+
+        yield _op("campaigns", "bulk_write", writes["ops"], ordered=False)
+
+        if writes["transactions"]:
+            yield _op("transactions", "insert_many", writes["transactions"], ordered=False)
+
+        if writes["exhausted"]:
+            serving_cache.evict_campaigns(cid for cid, _ in writes["exhausted"])
+            purge_slots(slot_id for _, slot_id in writes["exhausted"])
+
+    except Exception as e:
+        BILLING_FAILURES.labels(reason=type(e).__name__).inc()
+        raise
+
+    return duplicates
+
+
+def run_steps(steps, get_collection):
+    """Runs a *_steps() generator with pymongo. Returns its result."""
+    try:
+        op = next(steps)
+        while True:
+            col = get_collection(op.collection, profile=op.profile)
+            try:
+                if op.method == "find":
+                    result = list(col.find(*op.args, **(op.kwargs or {})))
+                else:
+                    result = getattr(col, op.method)(*op.args, **(op.kwargs or {}))
+            except Exception as e:
+                op = steps.throw(e)
+            else:
+                op = steps.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+async def run_steps_async(steps, get_collection):
+    """Runs a *_steps() generator with motor. Returns its result."""
+    try:
+        op = next(steps)
+        while True:
+            col = get_collection(op.collection, profile=op.profile)
+            try:
+                if op.method == "find":
+                    result = await col.find(*op.args, **(op.kwargs or {})).to_list(length=None)
+                else:
+                    result = await getattr(col, op.method)(*op.args, **(op.kwargs or {}))
+            except Exception as e:
+                op = steps.throw(e)
+            else:
+                op = steps.send(result)
+    except StopIteration as done:
+        return done.value
@@ -0,0 +1,66 @@
+"""
+Fingerprinted Static Assets
+---------------------------
+
+Provides:
+- register_assets(app)  → `asset_url(path)` template global
+- asset_url("css/theme.css") in templates → /static/dist/css/theme.3f2a9c1b0d.css
+
+Resolves "css/theme.css" through the manifest written by
+scripts/build_assets.py. Hashed files are served by nginx as immutable;
+without a build (local development) the plain /static/ path is used.
+"""
+
+import json
+import os
+
+from utils.logging import app_logger
+
+
+class AssetManifest:
+    def __init__(self, path: str, reload: bool = False):
+        self.path = path
+        self.reload = reload
+        self._mtime = None
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime, self._entries = None, {}
+            return
+
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"[ASSETS] unreadable manifest {self.path}: {e}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resolve(self, path: str) -> str:
+        # DEBUG picks up rebuilds without a restart
+        if self.reload:
+            self._load()
+        return self._entries.get(path, path)
+
+
+def register_assets(app, debug: bool = False):
+    from flask import url_for
+
+    manifest = AssetManifest(os.path.join(app.static_folder, "dist", "manifest.json"), reload=debug)
+    if not manifest:
+        app_logger.info("[ASSETS] no manifest; run scripts/build_assets.py for fingerprinted assets")
+
+    def asset_url(path: str) -> str:
+        return url_for("static", filename=manifest.resolve(path))
+
+    app.jinja_env.globals["asset_url"] = asset_url
+    return manifest
@@ -0,0 +1,59 @@
+"""
+Background Periodic Tasks
+-------------------------
+
+Provides:
+- PeriodicTask(name, interval_seconds, fn) → daemon thread running fn()
+  every interval, started lazily per process
+
+ensure_started() is cheap (one PID compare) and safe to call on every
+request: gunicorn workers forked from a preloaded master start their own
+thread on first use, the master never runs one.
+
+Errors are logged and the task retries on the next interval.
+"""
+
+import os
+import threading
+
+from utils.logging import app_logger
+
+
+class PeriodicTask:
+    def __init__(self, name: str, interval_seconds: float, fn, enabled: bool = True):
+        self.name = name
+        self.interval = interval_seconds
+        self.fn = fn
+        self.enabled = enabled
+
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _run(self, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                self.fn()
+            except Exception as e:
+                app_logger.error(f"[{self.name.upper()} ERROR] {e}", exc_info=True)
+
+            stop.wait(self.interval)
+
+    def ensure_started(self):
+        """Starts the thread in the current process (idempotent)."""
+        if not self.enabled or self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._stop = threading.Event()
+            threading.Thread(
+                target=self._run, args=(self._stop,), name=f"dcorp-{self.name}", daemon=True
+            ).start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+        self._pid = None
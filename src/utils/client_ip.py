@@ -0,0 +1,26 @@
+"""
+Client IP
+---------
+
+Both apps run behind nginx, so the socket peer is always the proxy.
+The real client address is restored once, at the edge of each app:
+
+    Flask (gunicorn)   werkzeug ProxyFix, trusting PROXY_FIX_HOPS proxies
+                       (app.py create_app)
+    Quart (uvicorn)    --proxy-headers --forwarded-allow-ips 127.0.0.1
+                       (deployment/supervisor.conf)
+
+Only the hops we trust are peeled off X-Forwarded-For, so a client
+cannot pick its own address by sending the header itself.
+
+Provides:
+- client_ip(request) → the viewer's address for frequency capping,
+                       the event filter and tracking documents
+
+Never read X-Forwarded-For directly: go through client_ip().
+"""
+
+
+def client_ip(request):
+    """Client address of a Flask or Quart request (after the proxy fix)."""
+    return request.remote_addr
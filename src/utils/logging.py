@@ -2,62 +2,176 @@
 Application Logging Utility
 
 Provides:
-- init_logger(app)
-- log_info(message)
-- log_error(message)
-- request logging middleware
+- init_logging()                       → process-wide, non-blocking logging
+- log_info(message) / log_error(message)
+- register_request_logging(app)        → Flask request log middleware
+- register_async_request_logging(app)  → same for the Quart serving app
+
+Every record goes through a QueueHandler; a single QueueListener thread
+per process formats JSON lines and appends them to the log files, so
+request threads never wait on disk I/O.
+
+Several processes (gunicorn + uvicorn workers) append to the same files,
+so none of them rotates: WatchedFileHandler reopens a file once it has
+been moved, and rotation is left to logrotate (deployment/logrotate.conf).
 
 Creates logs at:
-    /logs/app.log
-    /logs/error.log
+    <LOG_DIR>/app.log     (INFO+)
+    <LOG_DIR>/error.log   (ERROR+)
 """
 
 import os
+import json
+import queue
+import random
+import time
+import uuid
 import logging
-from flask import request
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
 
-
-# -----------------------------------------------------
-# CREATE LOG DIRECTORY
-# -----------------------------------------------------
-LOG_DIR = os.path.join(os.getcwd(), "logs")
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
+from config.settings import settings
+from utils.client_ip import client_ip
 
 
 # -----------------------------------------------------
 # LOGGER INSTANCES
 # -----------------------------------------------------
-app_logger = logging.getLogger("app_logger")
-error_logger = logging.getLogger("error_logger")
+app_logger = logging.getLogger("dcorp")
+error_logger = logging.getLogger("dcorp.error")
+request_logger = logging.getLogger("dcorp.request")
 
-app_logger.setLevel(logging.INFO)
-error_logger.setLevel(logging.ERROR)
+# Fields copied from `extra={...}` into the JSON line
+_EXTRA_FIELDS = (
+    "request_id", "method", "path", "endpoint", "status",
+    "duration_ms", "ip", "ua", "sampled",
+)
 
 
 # -----------------------------------------------------
-# FILE HANDLERS
+# JSON FORMAT
 # -----------------------------------------------------
-app_file_handler = logging.FileHandler(os.path.join(LOG_DIR, "app.log"))
-error_file_handler = logging.FileHandler(os.path.join(LOG_DIR, "error.log"))
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        line = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+
+        for field in _EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                line[field] = value
+
+        if record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
 
-app_file_handler.setLevel(logging.INFO)
-error_file_handler.setLevel(logging.ERROR)
+        return json.dumps(line, default=str, ensure_ascii=False)
 
 
 # -----------------------------------------------------
-# LOG FORMAT
+# QUEUE + LISTENER (one per process)
 # -----------------------------------------------------
-formatter = logging.Formatter(
-    "%(asctime)s | %(levelname)s | %(message)s",
-    "%Y-%m-%d %H:%M:%S"
-)
+class _ProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler that (re)starts its listener in whichever process emits,
+    so it keeps working in gunicorn workers forked after init_logging().
+    """
+
+    def __init__(self):
+        super().__init__(queue.SimpleQueue())
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # Parent's listener thread does not exist after fork
+            self.queue = queue.SimpleQueue()
+            self._listener = QueueListener(
+                self.queue, *_file_handlers(), respect_handler_level=True
+            )
+            self._listener.start()
+            self._pid = os.getpid()
 
-app_file_handler.setFormatter(formatter)
-error_file_handler.setFormatter(formatter)
+    def prepare(self, record):
+        # Keep exc_info for the JSON formatter (the default prepare()
+        # flattens it into the message)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        super().enqueue(record)
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+        self._pid = None
+
+
+def _file_handlers():
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    formatter = JsonFormatter()
+
+    app_file = WatchedFileHandler(os.path.join(settings.LOG_DIR, "app.log"), encoding="utf-8")
+    app_file.setLevel(logging.INFO)
+    app_file.setFormatter(formatter)
+
+    error_file = WatchedFileHandler(os.path.join(settings.LOG_DIR, "error.log"), encoding="utf-8")
+    error_file.setLevel(logging.ERROR)
+    error_file.setFormatter(formatter)
+
+    handlers = [app_file, error_file]
+
+    if settings.DEBUG:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+        handlers.append(console)
+
+    return handlers
+
+
+_queue_handler = None
+
+
+def init_logging():
+    """
+    Installs the queue handler on the root logger (idempotent).
+    Replaces any handlers added by logging.basicConfig, so nothing is
+    written twice and nothing blocks on stderr.
+    """
+    global _queue_handler
 
-app_logger.addHandler(app_file_handler)
-error_logger.addHandler(error_file_handler)
+    if _queue_handler is not None:
+        return _queue_handler
+
+    _queue_handler = _ProcessQueueHandler()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Flushes and stops this process's listener (worker exit)."""
+    if _queue_handler is not None:
+        _queue_handler.stop()
 
 
 # -----------------------------------------------------
@@ -72,23 +186,119 @@ def log_error(message: str):
 
 
 # -----------------------------------------------------
-# REQUEST LOGGING MIDDLEWARE
+# REQUEST LOG LINE
+# -----------------------------------------------------
+def _sample_rate(path: str) -> float:
+    best, rate = "", 1.0
+    for prefix, prefix_rate in settings.LOG_SAMPLE_RATES.items():
+        if path.startswith(prefix) and len(prefix) > len(best):
+            best, rate = prefix, prefix_rate
+    return rate
+
+
+def new_request_id(incoming: str = None) -> str:
+    """Reuses a sane upstream X-Request-ID, otherwise mints one."""
+    if incoming and len(incoming) <= 64 and incoming.replace("-", "").isalnum():
+        return incoming
+    return uuid.uuid4().hex
+
+
+def log_request(request_id, method, path, endpoint, status, duration_ms, ip, ua):
+    """
+    Emits one JSON line per request, subject to per-path sampling.
+    Errors and slow requests bypass sampling.
+    """
+    rate = _sample_rate(path)
+    forced = status >= 500 or duration_ms >= settings.LOG_SLOW_REQUEST_MS
+
+    if not forced and rate < 1.0 and random.random() >= rate:
+        return
+
+    level = logging.ERROR if status >= 500 else logging.INFO
+    request_logger.log(
+        level,
+        f"{method} {path} {status}",
+        extra={
+            "request_id": request_id,
+            "method": method,
+            "path": path,
+            "endpoint": endpoint,
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "ip": ip,
+            "ua": ua,
+            "sampled": None if forced or rate >= 1.0 else rate,
+        },
+    )
+
+
+# -----------------------------------------------------
+# REQUEST LOGGING MIDDLEWARE (Flask)
 # -----------------------------------------------------
 def register_request_logging(app):
     """
-    Logs every incoming request:
-    - method
-    - path
-    - IP address
-    - user-agent
+    Logs every request (sampled) with:
+    - request id (also returned as X-Request-ID)
+    - method, path, endpoint, status, duration
+    - IP address, user-agent
     """
+    from flask import g, request
+
+    init_logging()
+
+    @app.before_request
+    def _start_request_log():
+        g.request_id = new_request_id(request.headers.get("X-Request-ID"))
+        g._request_log_start = time.perf_counter()
+
+    @app.after_request
+    def _write_request_log(response):
+        start = g.pop("_request_log_start", None)
+        if start is None:
+            return response
+
+        response.headers["X-Request-ID"] = g.request_id
+        log_request(
+            g.request_id,
+            request.method,
+            request.path,
+            request.endpoint,
+            response.status_code,
+            (time.perf_counter() - start) * 1000.0,
+            client_ip(request),
+            request.headers.get("User-Agent"),
+        )
+        return response
+
+
+# -----------------------------------------------------
+# REQUEST LOGGING MIDDLEWARE (Quart)
+# -----------------------------------------------------
+def register_async_request_logging(app):
+    from quart import g, request
+
+    init_logging()
 
     @app.before_request
-    def log_request():
-        ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-        method = request.method
-        path = request.path
-        ua = request.headers.get("User-Agent")
-
-        msg = f"{ip} {method} {path} | UA: {ua}"
-        log_info(msg)
+    async def _start_request_log():
+        g.request_id = new_request_id(request.headers.get("X-Request-ID"))
+        g._request_log_start = time.perf_counter()
+
+    @app.after_request
+    async def _write_request_log(response):
+        start = g.pop("_request_log_start", None)
+        if start is None:
+            return response
+
+        response.headers["X-Request-ID"] = g.request_id
+        log_request(
+            g.request_id,
+            request.method,
+            request.path,
+            request.endpoint,
+            response.status_code,
+            (time.perf_counter() - start) * 1000.0,
+            client_ip(request),
+            request.headers.get("User-Agent"),
+        )
+        return response
@@ -0,0 +1,201 @@
+"""
+Prometheus Metrics
+------------------
+
+Single registry of service metrics, exposed on /metrics in the text
+exposition format.
+
+Provides:
+- register_metrics(app)        → Flask request histograms + /metrics
+- register_async_metrics(app)  → same for the Quart serving app
+- observe_auction(...)         → candidates per auction, fill / no-fill
+                                 (unknown slot ids → slot_id="unknown")
+- BILLING_FAILURES             → counter, labelled by reason
+- SUSPICIOUS_EVENTS            → duplicate / rate-limited tracking events
+- MONGO_POOL_CHECKED_OUT       → checked-out connections per client profile
+
+Multi-process safe: when PROMETHEUS_MULTIPROC_DIR is set (gunicorn /
+uvicorn workers, see deployment/), every worker writes its samples to
+that directory and /metrics aggregates them all.
+
+There is no tracking buffer-depth gauge: impressions, clicks and
+batches are written straight to Mongo within the request
+(services/ads/tracking_service run_steps / run_steps_async), so no
+in-process buffer exists to measure. Add the gauge together with one.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+from database.connection import add_client_listener_factory
+from services.ads.ad_slots import valid_slot
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+# -----------------------------------------------------
+# METRIC DEFINITIONS
+# -----------------------------------------------------
+REQUEST_LATENCY = Histogram(
+    "dcorp_http_request_duration_seconds",
+    "HTTP request latency",
+    ["app", "blueprint", "method", "status"],
+    buckets=(0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+AUCTION_CANDIDATES = Histogram(
+    "dcorp_auction_candidates",
+    "Eligible (funded, with creative) campaigns per auction",
+    ["slot_id"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+
+AD_REQUESTS = Counter(
+    "dcorp_ad_requests_total",
+    "Ad decisions by outcome (no-fill rate = no_fill / all)",
+    ["slot_id", "result"],
+)
+
+BILLING_FAILURES = Counter(
+    "dcorp_billing_failures_total",
+    "Click billing attempts that raised",
+    ["reason"],
+)
+
+SUSPICIOUS_EVENTS = Counter(
+    "dcorp_suspicious_events_total",
+    "Tracking events logged but not billed / counted",
+    ["kind", "reason"],
+)
+
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "dcorp_mongo_pool_checked_out",
+    "MongoDB connections currently checked out, per client profile",
+    ["profile"],
+    multiprocess_mode="livesum",
+)
+
+
+# -----------------------------------------------------
+# AUCTION HELPERS
+# -----------------------------------------------------
+def observe_auction(slot_id: str, candidates: int, filled: bool):
+    # slot_id comes from the URL: unknown ids share one label value
+    slot_id = slot_id if valid_slot(slot_id) else "unknown"
+    AUCTION_CANDIDATES.labels(slot_id=slot_id).observe(candidates)
+    AD_REQUESTS.labels(slot_id=slot_id, result="fill" if filled else "no_fill").inc()
+
+
+# -----------------------------------------------------
+# MONGO POOL USAGE
+# -----------------------------------------------------
+class PoolUsageListener(monitoring.ConnectionPoolListener):
+    """Tracks checked-out connections for one client profile."""
+
+    def __init__(self, profile: str):
+        self.gauge = MONGO_POOL_CHECKED_OUT.labels(profile=profile)
+
+    def connection_checked_out(self, event):
+        self.gauge.inc()
+
+    def connection_checked_in(self, event):
+        self.gauge.dec()
+
+    # Remaining pool events are not needed for usage
+    def _ignore(self, event):
+        pass
+
+    pool_created = pool_ready = pool_cleared = pool_closed = _ignore
+    connection_created = connection_ready = connection_closed = _ignore
+    connection_check_out_started = connection_check_out_failed = _ignore
+
+
+# -----------------------------------------------------
+# EXPOSITION
+# -----------------------------------------------------
+def metrics_payload():
+    """Returns (body, content_type) for /metrics."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """gunicorn child_exit hook: drop a dead worker's live gauges."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+# -----------------------------------------------------
+# FLASK INTEGRATION
+# -----------------------------------------------------
+def register_metrics(app, app_name: str = "flask"):
+    from flask import g, request, Response
+
+    add_client_listener_factory(PoolUsageListener)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None and request.endpoint != "metrics":
+            REQUEST_LATENCY.labels(
+                app=app_name,
+                blueprint=request.blueprint or "app",
+                method=request.method,
+                status=str(response.status_code),
+            ).observe(time.perf_counter() - start)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        body, content_type = metrics_payload()
+        return Response(body, content_type=content_type)
+
+
+# -----------------------------------------------------
+# QUART (ASGI) INTEGRATION
+# -----------------------------------------------------
+def register_async_metrics(app, app_name: str = "serving"):
+    from quart import g, request, Response
+
+    add_client_listener_factory(PoolUsageListener)
+
+    @app.before_request
+    async def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    async def _observe_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None and request.endpoint != "metrics":
+            REQUEST_LATENCY.labels(
+                app=app_name,
+                blueprint=request.blueprint or "app",
+                method=request.method,
+                status=str(response.status_code),
+            ).observe(time.perf_counter() - start)
+        return response
+
+    @app.route("/metrics")
+    async def metrics():
+        body, content_type = metrics_payload()
+        return Response(body, content_type=content_type)
@@ -0,0 +1,168 @@
+"""
+User-Agent Classification
+-------------------------
+
+Turns a raw User-Agent string into three compact enum codes:
+
+    device   → DeviceClass   (desktop / mobile / tablet / tv / bot)
+    os       → OSFamily      (windows / macos / ios / android / …)
+    browser  → BrowserFamily (chrome / safari / firefox / edge / …)
+
+Provides:
+- classify_user_agent(ua)  → UAClass(device, os, browser), LRU-cached
+- ua_fields(ua)            → {"device": int, "os": int, "browser": int}
+                             for tracking event documents
+- device_name(code)        → "mobile", "desktop", … (targeting values)
+
+Traffic is dominated by a few hundred distinct UA strings, so the bounded
+LRU (UA_CACHE_SIZE) answers almost every call without parsing.
+"""
+
+import re
+from enum import IntEnum
+from functools import lru_cache
+from typing import NamedTuple
+
+from config.settings import settings
+
+# Longer strings are truncated before caching / parsing
+_MAX_UA_LENGTH = 512
+
+# ChromeOS token ("X11; CrOS x86_64 …"); a plain substring also matches "microsoft"
+_CROS = re.compile(r"\bcros\b")
+
+
+# -----------------------------------------------------
+# Codes (stored on events — append only, never renumber)
+# -----------------------------------------------------
+class DeviceClass(IntEnum):
+    UNKNOWN = 0
+    DESKTOP = 1
+    MOBILE = 2
+    TABLET = 3
+    TV = 4
+    BOT = 5
+
+
+class OSFamily(IntEnum):
+    UNKNOWN = 0
+    WINDOWS = 1
+    MACOS = 2
+    IOS = 3
+    ANDROID = 4
+    LINUX = 5
+    CHROMEOS = 6
+
+
+class BrowserFamily(IntEnum):
+    UNKNOWN = 0
+    CHROME = 1
+    SAFARI = 2
+    FIREFOX = 3
+    EDGE = 4
+    OPERA = 5
+    SAMSUNG = 6
+    WEBVIEW = 7
+    BOT = 8
+
+
+class UAClass(NamedTuple):
+    device: DeviceClass
+    os: OSFamily
+    browser: BrowserFamily
+
+
+UNKNOWN_UA = UAClass(DeviceClass.UNKNOWN, OSFamily.UNKNOWN, BrowserFamily.UNKNOWN)
+
+_BOT_MARKERS = ("bot", "crawler", "spider", "slurp", "headless", "curl/", "wget/", "python-requests", "httpclient")
+_TV_MARKERS = ("smart-tv", "smarttv", "googletv", "appletv", "hbbtv", "crkey", "tizen", "webos")
+
+
+# -----------------------------------------------------
+# Parsing (substring checks, most specific first)
+# -----------------------------------------------------
+def _os_of(ua: str) -> OSFamily:
+    if "windows" in ua:
+        return OSFamily.WINDOWS
+    if "iphone" in ua or "ipad" in ua or "ipod" in ua:
+        return OSFamily.IOS
+    if "android" in ua:
+        return OSFamily.ANDROID
+    if _CROS.search(ua):
+        return OSFamily.CHROMEOS
+    if "mac os x" in ua or "macintosh" in ua:
+        return OSFamily.MACOS
+    if "linux" in ua or "x11" in ua:
+        return OSFamily.LINUX
+    return OSFamily.UNKNOWN
+
+
+def _device_of(ua: str, os_family: OSFamily) -> DeviceClass:
+    if any(marker in ua for marker in _TV_MARKERS):
+        return DeviceClass.TV
+    if "ipad" in ua or "tablet" in ua or (os_family == OSFamily.ANDROID and "mobile" not in ua):
+        return DeviceClass.TABLET
+    if "mobi" in ua or "iphone" in ua or "ipod" in ua:
+        return DeviceClass.MOBILE
+    if os_family in (OSFamily.WINDOWS, OSFamily.MACOS, OSFamily.LINUX, OSFamily.CHROMEOS):
+        return DeviceClass.DESKTOP
+    return DeviceClass.UNKNOWN
+
+
+def _browser_of(ua: str) -> BrowserFamily:
+    if "edg/" in ua or "edga/" in ua or "edgios/" in ua:
+        return BrowserFamily.EDGE
+    if "opr/" in ua or "opera" in ua:
+        return BrowserFamily.OPERA
+    if "samsungbrowser" in ua:
+        return BrowserFamily.SAMSUNG
+    if "; wv)" in ua or "fban" in ua or "fbav" in ua or "instagram" in ua:
+        return BrowserFamily.WEBVIEW
+    if "firefox/" in ua or "fxios/" in ua:
+        return BrowserFamily.FIREFOX
+    if "chrome/" in ua or "crios/" in ua:
+        return BrowserFamily.CHROME
+    if "safari/" in ua:
+        return BrowserFamily.SAFARI
+    return BrowserFamily.UNKNOWN
+
+
+@lru_cache(maxsize=settings.UA_CACHE_SIZE)
+def _classify(ua: str) -> UAClass:
+    lowered = ua.lower()
+
+    if any(marker in lowered for marker in _BOT_MARKERS):
+        return UAClass(DeviceClass.BOT, _os_of(lowered), BrowserFamily.BOT)
+
+    os_family = _os_of(lowered)
+    return UAClass(_device_of(lowered, os_family), os_family, _browser_of(lowered))
+
+
+# -----------------------------------------------------
+# Public helpers
+# -----------------------------------------------------
+def classify_user_agent(ua: str) -> UAClass:
+    """UAClass for a raw User-Agent (UNKNOWN_UA when missing)."""
+    if not ua:
+        return UNKNOWN_UA
+    return _classify(ua[:_MAX_UA_LENGTH])
+
+
+def ua_fields(ua: str) -> dict:
+    """Compact codes stored on tracking events instead of the raw UA."""
+    device, os_family, browser = classify_user_agent(ua)
+    return {"device": int(device), "os": int(os_family), "browser": int(browser)}
+
+
+def device_name(code) -> str:
+    """Targeting value for a device code, or None when unknown."""
+    try:
+        device = DeviceClass(code)
+    except ValueError:
+        return None
+    return None if device == DeviceClass.UNKNOWN else device.name.lower()
+
+
+def cache_info():
+    """LRU hit/miss counters (functools.lru_cache)."""
+    return _classify.cache_info()
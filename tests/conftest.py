@@ -0,0 +1,42 @@
+"""
+Shared fixtures
+---------------
+
+Tests run on mongomock with the default settings: importing `benchmarks`
+puts src/ on sys.path and fills in placeholders for the settings that
+are mandatory in production (real environment values win).
+
+    pip install -r benchmarks/requirements.txt
+    pytest tests
+"""
+
+import mongomock
+import pytest
+
+from benchmarks import BENCH_ENV
+from database.connection import reset_connections, use_client
+from services.ads.serving_cache import serving_cache
+
+
+@pytest.fixture
+def db():
+    """Every client profile routed to one fresh mongomock database."""
+    database = use_client(mongomock.MongoClient(), BENCH_ENV["MONGO_DB"])
+    serving_cache.invalidate()
+    yield database
+    serving_cache.invalidate()
+    reset_connections()
+
+
+@pytest.fixture
+def app(db):
+    from app import create_app
+
+    flask_app = create_app()
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,79 @@
+"""`budget` is the remaining balance for billing, the auction and the sweeper alike."""
+
+import pytest
+from bson import ObjectId
+
+from api.user.wallet import enforce_campaign_budget_limits
+from database.connection import get_collection
+from services.ads.bidding_engine import deduct_spend, funded_campaigns
+from services.ads.budget_sweeper import exhausted_query, sweep_exhausted_campaigns
+from services.ads.event_filter import event_filter
+from services.ads.tracking_service import record_click_steps, run_steps
+
+
+@pytest.fixture
+def campaign(db, monkeypatch):
+    monkeypatch.setattr(event_filter, "enabled", False)
+
+    # Mostly spent already: 5.0 left of an original 100.0
+    oid = ObjectId()
+    db.campaigns.insert_one({
+        "_id": oid, "user_id": "u1", "slot_id": "home_banner",
+        "bidding_type": "CPC", "bid_amount": 2.0, "budget": 5.0, "spend": 95.0,
+        "impressions": 0, "clicks": 0, "status": "approved",
+    })
+    return oid
+
+
+def click(campaign, n):
+    return run_steps(
+        record_click_steps(str(campaign), campaign, "home_banner", "10.0.0.1", f"test/{n}"),
+        get_collection,
+    )
+
+
+def test_billing_auction_and_sweeper_agree(db, campaign):
+    # Remaining budget is not reduced by spend a second time
+    assert funded_campaigns(db.campaigns.find()) != []
+
+    for n in range(2):
+        assert click(campaign, n)
+
+    doc = db.campaigns.find_one()
+    assert doc["budget"] == pytest.approx(1.0)
+    assert doc["spend"] == pytest.approx(99.0)
+    assert funded_campaigns([doc]) == [doc]
+    assert db.campaigns.count_documents(exhausted_query()) == 0
+    assert sweep_exhausted_campaigns() == 0
+
+    # Less than one bid left → zeroed, dropped from the auction, ended by the sweeper
+    assert click(campaign, 2)
+
+    doc = db.campaigns.find_one()
+    assert doc["budget"] == 0
+    assert funded_campaigns([doc]) == []
+    assert sweep_exhausted_campaigns() == 1
+    assert db.campaigns.find_one()["status"] == "ended"
+    assert db.transactions.count_documents({}) == 2
+
+
+def test_cpm_deduct_spend_lowers_remaining_budget(db, campaign):
+    assert deduct_spend(db.campaigns.find_one(), 5.0)
+
+    doc = db.campaigns.find_one()
+    assert doc["budget"] == pytest.approx(0.0)
+    assert doc["spend"] == pytest.approx(100.0)
+    assert funded_campaigns([doc]) == []
+    assert sweep_exhausted_campaigns() == 1
+
+    # Nothing left to deduct from
+    assert not deduct_spend(doc, 1.0)
+
+
+def test_wallet_page_pauses_instead_of_ending(db, campaign):
+    db.campaigns.update_one({"_id": campaign}, {"$set": {"budget": 0}})
+    enforce_campaign_budget_limits("u1")
+
+    doc = db.campaigns.find_one()
+    assert doc["status"] == "paused"
+    assert doc["paused_reason"] == "budget_exhausted"
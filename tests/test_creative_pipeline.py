@@ -0,0 +1,88 @@
+"""Every slot size renders from the blob's master; the master lives as long as the blob."""
+
+import os
+
+import pytest
+from bson import ObjectId
+from PIL import Image
+
+from config.settings import settings
+from services.ads import creative_pipeline
+from services.ads.creative_pipeline import creative_fields, process_creative
+from services.ads.creative_store import release, store_file, url_to_path
+
+
+@pytest.fixture
+def upload(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CREATIVE_STORE_FOLDER", str(tmp_path / "store"))
+
+    # A photo with EXIF metadata
+    exif = Image.Exif()
+    exif[0x010F] = "SecretCam"
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (2000, 2000), "red").save(path, "JPEG", exif=exif)
+
+    return store_file(str(path))
+
+
+def add_creative(db, blob, slot_id):
+    campaign_id = str(db.campaigns.insert_one({"slot_id": slot_id}).inserted_id)
+    fields = creative_fields(blob, slot_id)
+    db.campaigns.update_one({"_id": ObjectId(campaign_id)}, {"$set": {"image_url": fields["image_url"]}})
+    db.ad_creatives.insert_one({"campaign_id": campaign_id, "slot_id": slot_id, "status": "pending", **fields})
+    return campaign_id
+
+
+def served_path(db, campaign_id):
+    return url_to_path(db.ad_creatives.find_one({"campaign_id": campaign_id})["image_url"])
+
+
+def test_master_replaces_original_and_feeds_every_size(db, upload, monkeypatch):
+    banner = add_creative(db, upload, "home_banner")
+    card = add_creative(db, upload, "card_small")  # pending, not processed yet
+
+    process_creative(upload["_id"], "home_banner", banner)
+
+    blob = db.creative_blobs.find_one()
+    master = url_to_path(blob["master"])
+    assert not os.path.exists(url_to_path(upload["url"]))
+    with Image.open(master) as img:
+        assert img.format == "PNG" and img.size == (2000, 2000)
+        assert not img.getexif() and "icc_profile" not in img.info
+
+    # The pending creative no longer points at the deleted original
+    assert os.path.exists(served_path(db, card))
+    assert db.campaigns.find_one({"_id": ObjectId(card)})["image_url"] == blob["master"]
+
+    sources = []
+    render = creative_pipeline.render_variants
+    monkeypatch.setattr(
+        creative_pipeline, "render_variants", lambda src, *a: sources.append(src) or render(src, *a)
+    )
+    variants = process_creative(upload["_id"], "card_small", card)
+
+    assert sources == [master]
+    assert (variants[0]["width"], variants[0]["height"]) == (1000, 1000)
+    assert os.path.exists(served_path(db, card))
+
+
+def test_master_is_deleted_with_the_last_reference(db, upload):
+    banner = add_creative(db, upload, "home_banner")
+    store_file(url_to_path(upload["url"]))  # second reference
+    process_creative(upload["_id"], "home_banner", banner)
+    master = url_to_path(db.creative_blobs.find_one()["master"])
+
+    release(upload["_id"])
+    assert os.path.exists(master)
+
+    release(upload["_id"])
+    assert not os.path.exists(master)
+    assert db.creative_blobs.count_documents({}) == 0
+
+
+def test_reupload_after_processing_is_not_stored_again(db, upload, tmp_path):
+    banner = add_creative(db, upload, "home_banner")
+    process_creative(upload["_id"], "home_banner", banner)
+
+    assert store_file(str(tmp_path / "photo.jpg"))["refs"] == 2
+    assert not os.path.exists(url_to_path(upload["url"]))
@@ -0,0 +1,103 @@
+"""Edge-cache decisions under the default settings (FREQ_CAP_IMPRESSIONS=3)."""
+
+from bson import ObjectId
+
+from config.settings import settings
+
+SLOT = "home_banner"
+
+
+def seed_slot(db, campaigns=2):
+    ids = []
+    for i in range(campaigns):
+        oid = ObjectId()
+        db.campaigns.insert_one({
+            "_id": oid,
+            "user_id": "u1",
+            "slot_id": SLOT,
+            "bidding_type": "CPC",
+            "bid_amount": 1.0 + i,
+            "budget": 100.0,
+            "spend": 0.0,
+            "impressions": 0,
+            "clicks": 0,
+            "status": "approved",
+            "creative_status": "approved",
+        })
+        db.ad_creatives.insert_one({
+            "campaign_id": str(oid),
+            "slot_id": SLOT,
+            "image_url": f"/static/creatives/{oid}.jpg",
+            "redirect_url": "https://example.com/",
+            "status": "approved",
+        })
+        ids.append(str(oid))
+    return ids
+
+
+def get_slot(client, **kwargs):
+    # First request builds the slot snapshot; the second is the one measured
+    client.get(f"/api/ads/slot/{SLOT}", **kwargs)
+    return client.get(f"/api/ads/slot/{SLOT}", **kwargs)
+
+
+def test_defaults_cap_every_campaign():
+    assert settings.FREQ_CAP_IMPRESSIONS > 0
+    assert settings.EDGE_CACHE_TTL_SECONDS > 0
+
+
+def test_anonymous_request_is_edge_cacheable(db, client):
+    seed_slot(db)
+
+    res = get_slot(client, headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0)"})
+
+    assert res.status_code == 200
+    assert res.headers["Cache-Control"].startswith("public")
+    assert res.headers["X-Accel-Expires"] == str(settings.EDGE_CACHE_TTL_SECONDS)
+    assert res.headers.get("ETag")
+
+    ad = res.get_json()["ad"]
+    assert "tracking_url" in ad
+    assert "impression_url" not in ad and "click_url" not in ad
+
+
+def test_anonymous_decision_ignores_frequency_cap(db, client):
+    seed_slot(db, campaigns=1)
+
+    # Far more serves than the cap: the shared decision never runs dry
+    for _ in range(settings.FREQ_CAP_IMPRESSIONS + 3):
+        res = client.get(f"/api/ads/slot/{SLOT}")
+        assert res.get_json()["ad"] is not None
+
+
+def test_identified_viewer_is_private_and_capped(db, client):
+    seed_slot(db, campaigns=1)
+
+    headers = {"X-Viewer-ID": "viewer-1"}
+    res = get_slot(client, headers=headers)
+    assert res.headers["Cache-Control"] == "private, no-store"
+    assert "impression_url" in res.get_json()["ad"]
+
+    served = 2  # both get_slot() requests
+    while served < settings.FREQ_CAP_IMPRESSIONS:
+        client.get(f"/api/ads/slot/{SLOT}", headers=headers)
+        served += 1
+
+    assert client.get(f"/api/ads/slot/{SLOT}", headers=headers).get_json()["ad"] is None
+
+
+def test_viewer_id_query_param_is_private(db, client):
+    seed_slot(db)
+
+    res = get_slot(client, query_string={"viewer_id": "viewer-2"})
+
+    assert res.headers["Cache-Control"] == "private, no-store"
+
+
+def test_if_none_match_revalidates(db, client):
+    seed_slot(db)
+
+    etag = get_slot(client).headers["ETag"]
+    res = client.get(f"/api/ads/slot/{SLOT}", headers={"If-None-Match": etag})
+
+    assert res.status_code == 304
@@ -0,0 +1,165 @@
+"""Retried tracking posts are stored, counted and billed once."""
+
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+
+from services.ads.event_filter import event_filter
+from services.ads.tracking_service import (
+    MAX_CLIENT_EVENT_ID,
+    click_token,
+    impression_token,
+    record_click_steps,
+    run_steps_async,
+)
+
+
+@pytest.fixture
+def campaign(db, monkeypatch):
+    # Only event ids deduplicate here: the per-process filter keeps state across tests
+    monkeypatch.setattr(event_filter, "enabled", False)
+
+    # Same unique partial indexes as scripts/migrate_db.py
+    for name in ("ads_impressions", "ads_clicks", "ads_conversions"):
+        db[name].create_index(
+            [("event_id", 1)], unique=True, partialFilterExpression={"event_id": {"$exists": True}},
+        )
+
+    oid = ObjectId()
+    db.campaigns.insert_one({
+        "_id": oid, "user_id": "u1", "slot_id": "home_banner",
+        "bidding_type": "CPC", "bid_amount": 2.0, "budget": 100.0, "spend": 0.0,
+        "impressions": 0, "clicks": 0, "status": "approved",
+    })
+    return str(oid)
+
+
+def post(client, kind, body, n):
+    return client.post(f"/api/ads/track/{kind}", json=body, headers={"User-Agent": f"test/{n}"})
+
+
+def test_legacy_impression_retry_counts_once(db, client, campaign):
+    body = {"campaign_id": campaign, "slot_id": "home_banner", "event_id": "imp-1"}
+
+    for n in range(3):
+        assert post(client, "impression", body, n).status_code == 200
+
+    assert db.ads_impressions.count_documents({}) == 1
+    assert db.campaigns.find_one()["impressions"] == 1
+
+
+def test_legacy_click_retry_bills_once(db, client, campaign):
+    body = {"campaign_id": campaign, "slot_id": "home_banner", "event_id": "click-1"}
+
+    for n in range(3):
+        assert post(client, "click", body, n).status_code == 200
+
+    doc = db.campaigns.find_one()
+    assert doc["clicks"] == 1
+    assert doc["budget"] == pytest.approx(98.0)
+    assert db.transactions.count_documents({}) == 1
+
+
+def test_legacy_event_id_is_scoped_to_campaign(db, client, campaign):
+    other = str(db.campaigns.insert_one({**db.campaigns.find_one(), "_id": ObjectId()}).inserted_id)
+
+    post(client, "impression", {"campaign_id": campaign, "event_id": "same"}, 1)
+    post(client, "impression", {"campaign_id": other, "event_id": "same"}, 2)
+
+    assert db.ads_impressions.count_documents({}) == 2
+
+
+def test_legacy_post_without_event_id_is_still_accepted(db, client, campaign):
+    for n in range(2):
+        post(client, "impression", {"campaign_id": campaign}, n)
+
+    assert db.campaigns.find_one()["impressions"] == 2
+
+
+def test_oversized_event_id_is_rejected(client, campaign):
+    body = {"campaign_id": campaign, "event_id": "x" * (MAX_CLIENT_EVENT_ID + 1)}
+
+    assert post(client, "impression", body, 0).status_code == 400
+
+
+def test_signed_click_ignores_client_event_id(db, client, campaign):
+    token = click_token(campaign, "home_banner", "https://example.com/")
+
+    for n in range(3):
+        post(client, "click", {"t": token, "event_id": f"fresh-{n}"}, n)
+
+    assert db.campaigns.find_one()["clicks"] == 1
+    assert db.transactions.count_documents({}) == 1
+
+
+def test_signed_impression_pixel_retry_counts_once(db, client, campaign):
+    token = impression_token(campaign, "home_banner")
+
+    for n in range(3):
+        client.get("/api/ads/track/impression.gif", query_string={"t": token}, headers={"User-Agent": f"test/{n}"})
+
+    assert db.campaigns.find_one()["impressions"] == 1
+
+
+def test_batch_retry_counts_and_bills_once(db, client, campaign):
+    events = [
+        {"type": "impression", "t": impression_token(campaign, "home_banner")},
+        {"type": "click", "t": click_token(campaign, "home_banner", "https://example.com/")},
+    ]
+    body = "\n".join(json.dumps(e) for e in events)
+
+    first = client.post("/api/ads/track/batch", data=body, content_type="application/x-ndjson")
+    retry = client.post("/api/ads/track/batch", data=body, content_type="application/x-ndjson")
+
+    assert first.get_json()["duplicates"] == 0
+    assert retry.get_json()["duplicates"] == 2
+
+    doc = db.campaigns.find_one()
+    assert (doc["impressions"], doc["clicks"]) == (1, 1)
+    assert db.transactions.count_documents({}) == 1
+
+
+class AsyncCollection:
+    """motor-shaped wrapper over a mongomock collection."""
+
+    def __init__(self, col):
+        self._col = col
+
+    def find(self, *args, **kwargs):
+        docs = list(self._col.find(*args, **kwargs))
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return docs
+
+        return Cursor()
+
+    def __getattr__(self, name):
+        method = getattr(self._col, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+def test_async_runner_shares_the_click_steps(db, campaign):
+    def get_async_collection(name, profile=None):
+        return AsyncCollection(db[name])
+
+    cid = ObjectId(campaign)
+
+    async def click():
+        return await run_steps_async(
+            record_click_steps(campaign, cid, "home_banner", "10.0.0.1", "test", None, "async-1"),
+            get_async_collection,
+        )
+
+    assert asyncio.run(click()) is True
+    assert asyncio.run(click()) is True  # retry: DuplicateKeyError thrown back into the steps
+
+    doc = db.campaigns.find_one()
+    assert doc["clicks"] == 1
+    assert db.transactions.count_documents({}) == 1